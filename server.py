@@ -3,21 +3,100 @@ Two-Room Memory Demo Server
 Runs the triviality gate classifier separately from Claude conversation
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 import pickle
+import atexit
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+from cascade_gate import CascadeGate
+from categories import categorize
+from context_packing import CONTEXT_TOKENS, MAX_CONTEXT_TOKENS, build_context
+from embedding_store import EmbeddingCache, dedupe_labeled
+from embedding_wire import from_base64, pack, requested_dtype, response_fields
+from encoders import get_encoder
+from gate_workers import GateFrontend, SocketQueue
+from long_input import aggregate, chunk_messages, mean_by_owner
+from room2_dedup import BucketIndex, DedupIndex
+from room2_maintenance import RUN_INTERVAL, MaintenanceJob
+import room2_store
+from room2_retrieval import (LATENCY_BUDGET_MS, MAX_LATENCY_BUDGET_MS, MAX_RETRIEVE_K, RETRIEVE_K,
+                             retrieval_order, retrieve)
+from room1_session import CHARS_PER_TOKEN, SessionStore
+from room2_vectors import QuantizedBuckets
+from syntactic_profile import PROFILE_DIR, store_for
+from threshold_sweep import FALLBACK_THRESHOLD, load_threshold
+import tracing
+from volatility import state_path, tracker_for
 
 app = Flask(__name__)
 CORS(app)  # Allow browser requests
 
 # Load or train classifier
 MODEL_PATH = Path(__file__).parent / "src" / "classifier.pkl"
-EMBED_MODEL = None
-CLASSIFIER = None
+EMBED_MODEL_NAME = 'all-MiniLM-L6-v2'
+ENCODER = None
+
+# Streaming per-user statistics behind the tier / volatility returned for persists,
+# saved next to Room 2 and shared with classifier_gate in this process
+VOLATILITY = tracker_for(state_path(room2_store.ROOM2_PATH))
+
+# Per-user syntactic profiles, fed by what /turn and /session/turn persist for a user
+PROFILES = store_for(PROFILE_DIR)
+
+# Room 1 working memory per conversation for /session/turn; a message may
+# be at most one full session budget long
+SESSIONS = SessionStore()
+MAX_SESSION_TEXT = SESSIONS.token_budget * CHARS_PER_TOKEN
+
+# Room 2 vectors for /turn: dedup on persist and retrieval share one index.
+# Indexing the existing store goes through the on-disk embedding cache.
+# ROOM2_QUANTIZED=binary or int8 keeps compact codes in RAM instead of floats.
+ROOM2_QUANTIZED = os.environ.get('ROOM2_QUANTIZED')
+ROOM2_INDEX = DedupIndex(
+    lambda texts: encode_texts(texts),
+    bucket_factory=QuantizedBuckets(ROOM2_QUANTIZED) if ROOM2_QUANTIZED else BucketIndex)
+
+# Seconds between checks of MODEL_PATH for a new classifier artifact
+RELOAD_INTERVAL = 5.0
+
+# With GATE_QUEUE set (address of a gate_workers.py broker), every decision
+# and embedding comes from the inference workers and this process loads no model
+GATE_QUEUE = os.environ.get('GATE_QUEUE')
+FRONTEND = None
+MODEL_LOCK = threading.Lock()
+
+# GATE_CASCADE=1 settles clear cases with the TF-IDF shortcuts of
+# cascade_gate.py (band from cascade_band.json) before the encoder; off by default
+CASCADE = CascadeGate() if os.environ.get('GATE_CASCADE') == '1' else None
+
+# Seconds between background Room 2 decay/pruning passes; 0 turns them off
+MAINTENANCE_INTERVAL = float(os.environ.get('ROOM2_MAINTENANCE_INTERVAL', RUN_INTERVAL))
+
+# Largest request to /classify_batch
+MAX_BATCH_TEXTS = 256
+
+
+class ActiveClassifier(NamedTuple):
+    classifier: object
+    version: str
+    threshold: float
+    stamp: tuple  # (mtime_ns, size) of the artifact it was loaded from
+
+
+# Swapped as a whole by the reload thread. Requests read it once, so an
+# in-flight request keeps the classifier it started with.
+ACTIVE = None
 
 # Training data from classifier_gate.py
 TRAINING_DATA = [
@@ -310,81 +389,519 @@ TRAINING_DATA = [
 ]
 
 
+def artifact_stamp(path: Path) -> tuple:
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_artifact(path: Path) -> ActiveClassifier:
+    """Unpickle a classifier artifact; version is a hash of its bytes"""
+    stamp = artifact_stamp(path)
+    blob = path.read_bytes()
+    classifier = pickle.loads(blob)
+    if not hasattr(classifier, 'predict_proba'):
+        raise TypeError(f"{path} does not contain a probabilistic classifier")
+    version = hashlib.sha1(blob).hexdigest()[:12]
+    return ActiveClassifier(classifier, version, load_threshold(version), stamp)
+
+
 def load_classifier():
     """Load or train the classifier"""
-    global EMBED_MODEL, CLASSIFIER
+    global ENCODER, ACTIVE
 
-    print("Loading embedding model...")
-    EMBED_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-    print("Model loaded.")
+    # Shared with any gate module imported into this process
+    ENCODER = get_encoder(EMBED_MODEL_NAME)
 
     # Try to load saved classifier
     if MODEL_PATH.exists():
         print(f"Loading classifier from {MODEL_PATH}")
-        with open(MODEL_PATH, 'rb') as f:
-            CLASSIFIER = pickle.load(f)
+        ACTIVE = load_artifact(MODEL_PATH)
     else:
         print("Training classifier...")
-        texts = [t[0] for t in TRAINING_DATA]
-        labels = np.array([t[1] for t in TRAINING_DATA])
-        embeddings = EMBED_MODEL.encode(texts)
+        dataset = dedupe_labeled(TRAINING_DATA)
+        texts = [t[0] for t in dataset]
+        labels = np.array([t[1] for t in dataset])
+        embeddings = ENCODER.encode_cached(texts)
 
-        CLASSIFIER = LogisticRegression(max_iter=1000, class_weight='balanced')
-        CLASSIFIER.fit(embeddings, labels)
+        classifier = LogisticRegression(max_iter=1000, class_weight='balanced')
+        classifier.fit(embeddings, labels)
+        ACTIVE = ActiveClassifier(classifier, 'trained-in-process', FALLBACK_THRESHOLD, None)
         print("Classifier trained.")
+    print(f"Classifier version: {ACTIVE.version} (threshold {ACTIVE.threshold:.2f})")
+
+
+def watch_classifier(interval: float = RELOAD_INTERVAL):
+    """
+    Poll MODEL_PATH and hot-swap a new artifact in the background.
+    The embedding model is kept; only the classifier head is reloaded.
+    A broken artifact is reported and skipped until the file changes again.
+    """
+    global ACTIVE
+    failed_stamp = None
+    while True:
+        time.sleep(interval)
+        try:
+            stamp = artifact_stamp(MODEL_PATH)
+        except FileNotFoundError:
+            continue
+        if stamp == ACTIVE.stamp or stamp == failed_stamp:
+            continue
+        try:
+            candidate = load_artifact(MODEL_PATH)
+        except Exception as e:
+            print(f"Reload of {MODEL_PATH} failed, keeping {ACTIVE.version}: {e}")
+            failed_stamp = stamp
+            continue
+        if candidate.version != ACTIVE.version:
+            print(f"Classifier reloaded: {ACTIVE.version} -> {candidate.version}")
+        ACTIVE = candidate
+
+
+def start_reload_thread(interval: float = RELOAD_INTERVAL) -> threading.Thread:
+    thread = threading.Thread(target=watch_classifier, args=(interval,), daemon=True)
+    thread.start()
+    return thread
+
+
+def ensure_local_model():
+    """Load the model on first use (queue-mode front ends start without one)"""
+    if ACTIVE is None:
+        with MODEL_LOCK:
+            if ACTIVE is None:
+                load_classifier()
+                start_reload_thread()
+
+
+@app.after_request
+def add_version_header(response):
+    """Report the classifier version that served (or would serve) the request"""
+    version = getattr(g, 'model_version', None) or (ACTIVE.version if ACTIVE else None)
+    if version:
+        response.headers['X-Model-Version'] = version
+    return response
+
+
+def traced(name: str):
+    """Make each request to a view the root span of a trace"""
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with tracing.span(name):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Classified(NamedTuple):
+    decisions: list          # [(decision, confidence)]
+    embeddings: object       # np.ndarray, or None unless asked for
+    version: str
+    scores: np.ndarray       # raw persist probability per text
+    thresholds: np.ndarray   # threshold each text was decided at
+    chunked: list = None     # long_input only: per-text {chunks, trigger}
+    routes: list = None      # with CASCADE: 'tfidf' or 'neural' per text
+
+
+def classify_texts(texts: list, dtype=None) -> Classified:
+    """
+    classify_encoded, with CASCADE first when it is on: texts the TF-IDF
+    shortcuts settle score 0.0 / 1.0 and are only encoded if dtype asks
+    for embeddings.
+    """
+    if CASCADE is None:
+        return classify_encoded(texts, dtype)
+    with tracing.span('cascade', texts=len(texts)):
+        flush, persist = CASCADE.shortcuts(texts)
+    shortcut = flush | persist
+    decisions = [('PERSIST' if p else 'FLUSH', 1.0) for p in persist]
+    scores = persist.astype(np.float64)
+    routes = ['tfidf' if s else 'neural' for s in shortcut]
+    encode = np.ones(len(texts), dtype=bool) if dtype else ~shortcut
+    if not encode.any():
+        active = ACTIVE
+        return Classified(decisions, None, active.version if active else None, scores,
+                          np.full(len(texts), active.threshold if active else FALLBACK_THRESHOLD),
+                          routes=routes)
+    result = classify_encoded([t for t, e in zip(texts, encode) if e], dtype)
+    thresholds = np.full(len(texts), result.thresholds[0])
+    for j, i in enumerate(np.flatnonzero(encode)):
+        if not shortcut[i]:
+            decisions[i], scores[i], thresholds[i] = result.decisions[j], result.scores[j], result.thresholds[j]
+    return Classified(decisions, result.embeddings, result.version, scores, thresholds, routes=routes)
+
+
+def classify_encoded(texts: list, dtype=None) -> Classified:
+    """
+    Gate decisions for texts in one encoder pass, locally or through the
+    gate workers. Embeddings are only kept when dtype asks for them.
+    """
+    if FRONTEND is not None:
+        results = FRONTEND.classify_many(texts, embedding=dtype)
+        decisions = [(r['decision'], r['confidence']) for r in results]
+        embeddings = None
+        if dtype:
+            embeddings = np.concatenate([from_base64(r['embedding'], r['embedding_dim'], dtype) for r in results])
+        return Classified(decisions, embeddings, results[0]['model_version'],
+                          np.array([r['score'] for r in results]), np.array([r['threshold'] for r in results]))
+
+    ensure_local_model()
+    active = ACTIVE
+    if len(texts) == 1:
+        embeddings = ENCODER.encode(texts)
+    else:
+        with tracing.span('encode', texts=len(texts)):
+            embeddings = ENCODER.encode_bulk(texts)  # length-bucketed
+    with tracing.span('classify'):
+        proba = active.classifier.predict_proba(embeddings)
+    decisions = [('PERSIST' if p[1] > active.threshold else 'FLUSH', float(max(p))) for p in proba]
+    return Classified(decisions, embeddings if dtype else None, active.version,
+                      proba[:, 1], np.full(len(texts), active.threshold))
+
+
+def classify_long(texts: list, dtype=None) -> Classified:
+    """
+    classify_texts for long inputs: every sentence chunk of every text in one
+    pass, folded per text as long_input.gate_long does. Embeddings are mean
+    chunk embeddings; chunked has each text's chunk count and trigger.
+    """
+    chunks, spans, owners = chunk_messages(texts)
+    result = classify_texts(chunks, dtype)
+    persists = np.array([decision == 'PERSIST' for decision, _ in result.decisions])
+    # signed distance past the threshold, positive toward persist
+    margins = np.where(persists, 1, -1) * np.abs(result.scores - result.thresholds)
+    chunked = aggregate(texts, spans, owners, persists, result.scores, margins)
+    decisions = [(r['decision'], max(r['score'], 1 - r['score'])) for r in chunked]
+    embeddings = mean_by_owner(result.embeddings, owners, len(texts)) if dtype else None
+    scores = np.array([r['score'] for r in chunked])
+    first = np.searchsorted(owners, np.arange(len(texts)))
+    return Classified(decisions, embeddings, result.version, scores, result.thresholds[first],
+                      [{'chunks': r['chunks'], 'trigger': r['trigger']} for r in chunked])
+
+
+def bounded(data: dict, name: str, default, cast, low, high):
+    """data[name] converted with cast; ValueError unless it is within [low, high]"""
+    try:
+        value = cast(data.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number') from None
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
+
+
+def gate_fields(text: str, user, decision: str, confidence: float) -> dict:
+    """
+    Every message feeds the user's volatility statistics; persisted items
+    get a category and a tier assignment from the precomputed table
+    """
+    with tracing.span('categorize'):
+        category = categorize(text)
+        VOLATILITY.observe(user, text, category)
+        assignment = VOLATILITY.assign(user, category) if decision == 'PERSIST' else {}
+    return {
+        'decision': decision,
+        'confidence': confidence,
+        'category': category if decision == 'PERSIST' else None,
+        'tier': assignment.get('tier'),
+        'volatility': assignment.get('volatility'),
+    }
+
+
+def encode_remote(texts: list) -> np.ndarray:
+    """Embeddings from the gate workers, MAX_BATCH_TEXTS texts per request"""
+    parts = []
+    for start in range(0, len(texts), MAX_BATCH_TEXTS):
+        results = FRONTEND.classify_many(texts[start:start + MAX_BATCH_TEXTS], embedding='float32')
+        parts += [from_base64(r['embedding'], r['embedding_dim'], 'float32') for r in results]
+    return np.concatenate(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def remote_cache() -> EmbeddingCache:
+    return EmbeddingCache(EMBED_MODEL_NAME)
+
+
+def encode_texts(texts: list) -> np.ndarray:
+    """
+    Embeddings through the on-disk cache, encoded by the gate workers in
+    queue mode and by the local model otherwise
+    """
+    if FRONTEND is None:
+        return get_encoder(EMBED_MODEL_NAME).encode_cached(texts)
+    return remote_cache().encode(texts, encode_remote)
+
+
+def promote(text: str, embedding, category: str, user, **extra) -> dict:
+    """
+    Dedup-aware Room 2 persist with the user's tier assignment; encodes the
+    text if no embedding is given
+    """
+    metadata = {**({'user': user} if user else {}), **extra, **VOLATILITY.assign(user, category)}
+    if embedding is None:
+        embedding = encode_texts([text])[0]
+    with tracing.span('persist', dedup=True):
+        entry, merged = ROOM2_INDEX.persist(text, embedding, category, metadata)
+    if user:
+        PROFILES.update(user, text, category)
+    return {'id': entry['id'], 'merged': merged, 'tier': entry.get('tier')}
 
 
 @app.route('/classify', methods=['POST'])
+@traced('server.classify')
 def classify():
-    """Classify a message as FLUSH or PERSIST"""
+    """
+    Classify a message as FLUSH or PERSIST.
+    return_embedding (true, "float16" or "float32") adds the message's
+    embedding, base64-encoded, so callers need not encode it again.
+    long_input gates the message sentence by sentence instead of truncating
+    it, and adds 'chunks' and the 'trigger' span that decided it.
+    With GATE_CASCADE=1, 'route' says whether the TF-IDF shortcut ('tfidf')
+    or the classifier ('neural') decided.
+    """
     data = request.json
     text = data.get('text', '')
 
     if not text:
         return jsonify({'error': 'No text provided'}), 400
+    try:
+        dtype = requested_dtype(data.get('return_embedding'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        classify_fn = classify_long if data.get('long_input') else classify_texts
+        result = classify_fn([text], dtype)
+    except (TimeoutError, RuntimeError, ConnectionError) as e:
+        return jsonify({'error': f'Gate workers unavailable: {e}'}), 503
+    g.model_version = result.version
+    [(decision, confidence)] = result.decisions
+
+    response = {**gate_fields(text, data.get('user'), decision, confidence), **(result.chunked or [{}])[0],
+                'model_version': result.version}
+    if result.routes:
+        response['route'] = result.routes[0]
+    if dtype:
+        response.update(response_fields(result.embeddings[0], dtype))
+    return jsonify(response)
+
+
+@app.route('/classify_batch', methods=['POST'])
+@traced('server.classify_batch')
+def classify_batch():
+    """
+    Classify up to MAX_BATCH_TEXTS messages in one encoder pass (long_input
+    as for /classify).
+    With return_embedding, 'embeddings' is one base64 (n, dim) matrix; send
+    Accept: application/octet-stream to get the raw matrix as the body, with
+    decisions and confidences in the X-Decisions / X-Confidences headers.
+    """
+    data = request.json
+    texts = data.get('texts') or []
+
+    if not texts or not all(isinstance(t, str) and t for t in texts):
+        return jsonify({'error': 'texts must be a non-empty list of non-empty strings'}), 400
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({'error': f'At most {MAX_BATCH_TEXTS} texts per batch'}), 400
+    try:
+        dtype = requested_dtype(data.get('return_embedding'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        classify_fn = classify_long if data.get('long_input') else classify_texts
+        result = classify_fn(texts, dtype)
+    except (TimeoutError, RuntimeError, ConnectionError) as e:
+        return jsonify({'error': f'Gate workers unavailable: {e}'}), 503
+    g.model_version = version = result.version
+    embeddings = result.embeddings
+
+    user = data.get('user')
+    results = [{**gate_fields(text, user, decision, confidence), **extra}
+               for text, (decision, confidence), extra in zip(texts, result.decisions,
+                                                               result.chunked or [{}] * len(texts))]
+    for r, route in zip(results, result.routes or []):
+        r['route'] = route
+
+    if dtype and request.accept_mimetypes.best == 'application/octet-stream':
+        return Response(pack(embeddings, dtype), mimetype='application/octet-stream', headers={
+            'X-Embedding-Dtype': dtype,
+            'X-Embedding-Shape': f'{embeddings.shape[0]},{embeddings.shape[1]}',
+            'X-Decisions': ','.join(r['decision'] for r in results),
+            'X-Confidences': ','.join(f"{r['confidence']:.6f}" for r in results),
+        })
+
+    response = {'results': results, 'model_version': version}
+    if dtype:
+        response.update(response_fields(embeddings, dtype, key='embeddings'))
+    return jsonify(response)
+
+
+@app.route('/turn', methods=['POST'])
+@traced('server.turn')
+def turn():
+    """
+    Gate a message and retrieve Room 2 memories for it from one encoder pass,
+    local or on a gate worker in queue mode.
+    Optional body fields: user, k (at most MAX_RETRIEVE_K), budget_ms,
+    context_tokens (at most MAX_CONTEXT_TOKENS), persist (default true),
+    return_embedding (as for /classify). Out-of-range values are a 400.
+    'context' is the retrieved memories packed into a prompt-ready block.
+    """
+    start = time.perf_counter()
+    data = request.json
+    text = data.get('text', '')
 
-    # Get embedding and predict
-    embedding = EMBED_MODEL.encode([text])
-    proba = CLASSIFIER.predict_proba(embedding)[0]
-
-    decision = 'PERSIST' if proba[1] > 0.5 else 'FLUSH'
-    confidence = float(max(proba))
-
-    # Determine category for persisted items (simple heuristic)
-    category = None
-    if decision == 'PERSIST':
-        text_lower = text.lower()
-        if any(w in text_lower for w in ['died', 'death', 'passed', 'grief', 'miss', 'lost', 'sad', 'cry', 'tears']):
-            category = 'EMPATHY'
-        elif any(w in text_lower for w in ['adhd', 'autism', 'anxiety', 'depression', 'neurodivergent', 'disability']):
-            category = 'UNDERSTANDING'
-        elif any(w in text_lower for w in ['degree', 'phd', 'lawyer', 'doctor', 'engineer', 'expert', 'professional']):
-            category = 'RESPECT'
-        elif any(w in text_lower for w in ['prefer', 'direct', 'patient', 'explain', 'style']):
-            category = 'COMMUNICATION'
-        elif any(w in text_lower for w in ['shipping', 'launching', 'deadline', 'project', 'goal']):
-            category = 'VOLATILE'
-        else:
-            category = 'CONTEXT'
-
-    return jsonify({
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    try:
+        dtype = requested_dtype(data.get('return_embedding'))
+        budget_ms = bounded(data, 'budget_ms', LATENCY_BUDGET_MS, float, 0, MAX_LATENCY_BUDGET_MS)
+        k = bounded(data, 'k', RETRIEVE_K, int, 1, MAX_RETRIEVE_K)
+        token_budget = bounded(data, 'context_tokens', CONTEXT_TOKENS, int, 0, MAX_CONTEXT_TOKENS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    deadline = start + budget_ms / 1000
+    try:
+        # Retrieval needs the embedding whichever route decided
+        result = classify_texts([text], 'float32')
+    except (TimeoutError, RuntimeError, ConnectionError) as e:
+        return jsonify({'error': f'Gate workers unavailable: {e}'}), 503
+    g.model_version = result.version
+    [(decision, confidence)] = result.decisions
+    embedding = result.embeddings[0]
+    route = result.routes[0] if result.routes else None
+
+    user = data.get('user')
+    with tracing.span('categorize'):
+        category = categorize(text)
+        VOLATILITY.observe(user, text, category)
+
+    # Retrieve before persisting so the message doesn't come back as its own memory
+    with tracing.span('retrieve'):
+        memories, complete = retrieve(ROOM2_INDEX, user, embedding, retrieval_order(category),
+                                      k=k, deadline=deadline)
+    with tracing.span('pack'):
+        context, context_tokens, _ = build_context(memories, token_budget)
+
+    persisted = None
+    if decision == 'PERSIST' and data.get('persist', True):
+        persisted = promote(text, embedding, category, user)
+
+    response = {
         'decision': decision,
         'confidence': confidence,
-        'category': category
-    })
+        'category': category if decision == 'PERSIST' else None,
+        'persisted': persisted,
+        'memories': memories,
+        'complete': complete,
+        'context': context,
+        'context_tokens': context_tokens,
+        'model_version': result.version
+    }
+    if route:
+        response['route'] = route
+    if dtype:
+        response.update(response_fields(embedding, dtype))
+    response['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return jsonify(response)
+
+
+@app.route('/session/turn', methods=['POST'])
+@traced('server.session_turn')
+def session_turn():
+    """
+    Gate a message into its conversation's Room 1 buffer. Body: session,
+    text (at most MAX_SESSION_TEXT characters), optional user and persist
+    (default true). PERSIST messages are
+    promoted to Room 2 before the buffer may evict them. 'context' is the
+    turns the next LLM call should carry, within the session token budget.
+    """
+    data = request.json
+    text = data.get('text', '')
+    session_id = data.get('session')
+
+    if not text or not isinstance(text, str) or not isinstance(session_id, str) or not session_id:
+        return jsonify({'error': 'text and session are required'}), 400
+    try:
+        bounded({'text length': len(text)}, 'text length', 0, int, 1, MAX_SESSION_TEXT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = classify_texts([text])
+    except (TimeoutError, RuntimeError, ConnectionError) as e:
+        return jsonify({'error': f'Gate workers unavailable: {e}'}), 503
+    g.model_version = result.version
+    [(decision, confidence)] = result.decisions
+
+    user = data.get('user')
+    fields = gate_fields(text, user, decision, confidence)
+    persisted = None
+    if decision == 'PERSIST' and data.get('persist', True):
+        persisted = promote(text, None, fields['category'], user, session=session_id)
+
+    response = SESSIONS.add(session_id, text, decision, confidence)
+    response.update(category=fields['category'], persisted=persisted, model_version=result.version)
+    return jsonify(response)
+
+
+@app.route('/session/end', methods=['POST'])
+def session_end():
+    """Drop a conversation's Room 1 buffer (body: session)"""
+    session_id = (request.json or {}).get('session')
+    if not isinstance(session_id, str) or not session_id:
+        return jsonify({'error': 'No session provided'}), 400
+    SESSIONS.end(session_id)
+    return jsonify({'session': session_id, 'ended': True})
+
+
+@app.route('/room2', methods=['GET'])
+def room2_entries():
+    """
+    Page through Room 2. Query parameters: limit (default 100, at most
+    1000), cursor (from the previous page), since, until (ISO timestamps),
+    category, tier, user.
+    """
+    args = request.args
+    try:
+        limit = min(int(args.get('limit', 100)), 1000)
+        tier = int(args['tier']) if 'tier' in args else None
+        entries, cursor = room2_store.read_page(
+            ROOM2_INDEX.path, limit, args.get('cursor'), since=args.get('since'), until=args.get('until'),
+            category=args.get('category'), tier=tier, user=args.get('user'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'entries': entries, 'cursor': cursor})
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'model_version': ACTIVE.version if ACTIVE else None})
+
+
+def start_maintenance(interval: float = MAINTENANCE_INTERVAL):
+    """Run Room 2 maintenance in the background until the server exits"""
+    if interval <= 0:
+        return None
+    job = MaintenanceJob(interval, path=ROOM2_INDEX.path)
+    job.start()
+    atexit.register(job.stop, 5.0)
+    return job
 
 
 if __name__ == '__main__':
-    load_classifier()
+    tracing.configure_from_env()
+    if GATE_QUEUE:
+        FRONTEND = GateFrontend(SocketQueue(GATE_QUEUE))
+        print(f"Classifying through gate workers at {GATE_QUEUE}")
+    else:
+        ensure_local_model()
+    start_maintenance()
     print("\n" + "="*50)
     print("Two-Room Memory Server")
     print("="*50)
-    print("Classifier ready. Starting server on http://localhost:5000")
+    port = int(os.environ.get('PORT', 5000))
+    print(f"Classifier ready. Starting server on http://localhost:{port}")
     print("="*50 + "\n")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -1,14 +1,23 @@
 # Two-Room Memory Architecture
 # Efficient LLM memory management via triviality gating
 
-from .classifier_gate import (
+# Modules in src/ import each other by flat name (they are also run as
+# scripts from this directory), so make that work for package imports too.
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from classifier_gate import (
+    ClassifierGate,
     process_exchange,
+    process_conversation,
     predict,
     should_persist,
     persist,
     get_room2_contents,
     clear_room2,
 )
+from encoders import get_encoder
 
 __version__ = "0.1.0"
 __author__ = "Zachary Epstein and Claude (Anthropic)"
@@ -0,0 +1,86 @@
+"""
+Two-Room Memory Architecture - Length-Bucketed Batching
+Group inputs of similar token length before encoding, restore order after
+
+Every item in a batch is padded to the longest one, so a two-word greeting
+batched with a Reddit-length post costs as much as the post. Sorting by
+token length and cutting batches on a padded-token budget keeps padding
+small: short messages travel in large batches, long ones in small batches.
+"""
+
+import numpy as np
+from typing import Callable, Optional
+
+# Padded tokens per batch (batch size x longest item). 256 x 64 fits MiniLM
+# comfortably on CPU.
+MAX_BATCH_TOKENS = 16384
+MAX_BATCH_SIZE = 256
+
+
+def token_lengths(texts: list[str], tokenizer=None, max_length: Optional[int] = None) -> np.ndarray:
+    """
+    Token count per text, including special tokens and capped at the
+    encoder's max_length. Without a tokenizer, estimate from word count.
+    """
+    if tokenizer is not None:
+        ids = tokenizer(texts, add_special_tokens=True, truncation=max_length is not None,
+                        max_length=max_length)["input_ids"]
+        lengths = np.fromiter((len(i) for i in ids), dtype=np.int64, count=len(texts))
+    else:
+        # WordPiece averages ~1.3 tokens per English word, plus [CLS]/[SEP]
+        lengths = np.fromiter((int(len(t.split()) * 1.3) + 2 for t in texts), dtype=np.int64, count=len(texts))
+    if max_length is not None:
+        lengths = np.minimum(lengths, max_length)
+    return lengths
+
+
+def length_buckets(lengths: np.ndarray, max_tokens: int = MAX_BATCH_TOKENS,
+                   max_batch_size: int = MAX_BATCH_SIZE) -> list[np.ndarray]:
+    """
+    Split indices into batches of similar length. Indices are visited in
+    ascending length order, so a batch's padded size is count x last length.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    start = 0
+    for i, idx in enumerate(order):
+        count = i - start + 1
+        if count > 1 and (count > max_batch_size or count * lengths[idx] > max_tokens):
+            batches.append(order[start:i])
+            start = i
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
+
+
+def padded_tokens(lengths: np.ndarray, batches: list[np.ndarray]) -> int:
+    """Total tokens the encoder processes, padding included"""
+    return int(sum(len(b) * lengths[b].max() for b in batches if len(b)))
+
+
+def bucketed_encode(encode_fn: Callable, texts: list[str], lengths: Optional[np.ndarray] = None,
+                    max_tokens: int = MAX_BATCH_TOKENS, max_batch_size: int = MAX_BATCH_SIZE) -> np.ndarray:
+    """
+    Encode texts in length buckets and return embeddings in the input order.
+    encode_fn is called once per bucket as encode_fn(batch, batch_size=len(batch)).
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if lengths is None:
+        lengths = token_lengths(texts)
+    out = None
+    for batch in length_buckets(lengths, max_tokens, max_batch_size):
+        vectors = np.asarray(encode_fn([texts[i] for i in batch], batch_size=len(batch)))
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        out[batch] = vectors
+    return out
+
+
+def bucketed_encoder(model, max_tokens: int = MAX_BATCH_TOKENS,
+                     max_batch_size: int = MAX_BATCH_SIZE) -> Callable:
+    """encode(texts) for a SentenceTransformer, bucketed on its own tokenizer"""
+    def encode(texts: list[str]) -> np.ndarray:
+        lengths = token_lengths(texts, model.tokenizer, model.max_seq_length)
+        return bucketed_encode(model.encode, texts, lengths, max_tokens, max_batch_size)
+    return encode
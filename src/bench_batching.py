@@ -0,0 +1,93 @@
+"""
+Benchmark: length-bucketed vs arrival-order batching on a mixed-length corpus
+Run with: python bench_batching.py [n_messages]
+
+The corpus mixes greetings and one-liners from the massive stress test with
+multi-paragraph posts stitched from its meaningful sentences. The baseline
+encodes fixed-size batches in arrival order, the way a batched gate path
+receives them.
+"""
+
+import numpy as np
+import random
+import sys
+import time
+
+from batching import bucketed_encode, length_buckets, padded_tokens, token_lengths
+
+BASELINE_BATCH_SIZE = 32
+
+
+def mixed_corpus(n: int = 2000, seed: int = 0) -> list[str]:
+    """Roughly 60% short messages, 30% medium, 10% long posts"""
+    import massive_stress_test as m
+
+    rng = random.Random(seed)
+    short = m.trivial_greetings + m.trivial_preferences
+    medium = [t for t, _ in m.MASSIVE_TEST_CASES]
+    sentences = m.meaningful_emotional + m.meaningful_family + m.meaningful_struggles + m.meaningful_health
+
+    corpus = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.6:
+            corpus.append(rng.choice(short))
+        elif r < 0.9:
+            corpus.append(rng.choice(medium))
+        else:
+            paragraphs = [". ".join(rng.sample(sentences, rng.randint(4, 8))) + "."
+                          for _ in range(rng.randint(2, 4))]
+            corpus.append("\n\n".join(paragraphs))
+    return corpus
+
+
+def arrival_batches(n: int, size: int = BASELINE_BATCH_SIZE) -> list[np.ndarray]:
+    return [np.arange(i, min(i + size, n)) for i in range(0, n, size)]
+
+
+def run_benchmark(n: int = 2000):
+    corpus = mixed_corpus(n)
+
+    try:
+        from encoders import get_encoder
+        model = get_encoder().model
+        lengths = token_lengths(corpus, model.tokenizer, model.max_seq_length)
+    except ImportError:
+        model = None
+        lengths = token_lengths(corpus)
+
+    baseline = arrival_batches(len(corpus))
+    bucketed = length_buckets(lengths)
+    real = int(lengths.sum())
+
+    print("=" * 70)
+    print(f"BATCHING BENCHMARK: {len(corpus)} messages, {real} real tokens")
+    print(f"Token length: min {lengths.min()}, median {int(np.median(lengths))}, max {lengths.max()}")
+    print("=" * 70)
+    for name, batches in [("arrival order", baseline), ("length-bucketed", bucketed)]:
+        padded = padded_tokens(lengths, batches)
+        print(f"{name:<16} {len(batches):>5} batches  {padded:>9} padded tokens  "
+              f"({real / padded:.0%} useful)")
+
+    if model is None:
+        print("\nsentence-transformers not installed: padding figures only")
+        return
+
+    model.encode(corpus[:64])  # warm up
+
+    start = time.perf_counter()
+    for batch in baseline:
+        model.encode([corpus[i] for i in batch], batch_size=len(batch))
+    baseline_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bucketed_encode(model.encode, corpus, lengths)
+    bucketed_seconds = time.perf_counter() - start
+
+    print(f"\narrival order:   {len(corpus) / baseline_seconds:8.1f} msg/s")
+    print(f"length-bucketed: {len(corpus) / bucketed_seconds:8.1f} msg/s "
+          f"({baseline_seconds / bucketed_seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,82 @@
+"""
+Benchmark: concurrent Room 2 writers, group commit vs one write per persist
+Run with: python bench_writers.py [writers] [persists_per_writer] [processes]
+
+Each writer thread persists one entry at a time, as a gate thread does. The
+baseline gives every persist its own locked read-modify-write and fsync,
+the way the store wrote before group commit. Writers are split across
+processes so the cross-process lock is exercised too. Every run checks
+that no entry was lost or written twice.
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import room2_store
+
+
+def write_alone(entry: dict, path: Path):
+    with room2_store.locked(path):
+        room2_store.write_entries(room2_store.load_entries(path) + [entry], path)
+
+
+def group_commit(entry: dict, path: Path):
+    room2_store.append_entries([entry], path)
+
+
+MODES = {"one write per persist": write_alone, "group commit": group_commit}
+
+
+def run_writers(mode: str, path: Path, writers: int, persists: int, tag: str):
+    write = MODES[mode]
+
+    def writer(w: int):
+        for i in range(persists):
+            write(room2_store.make_entry(f"{tag} writer {w} persist {i}"), path)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_mode(mode: str, writers: int, persists: int, processes: int) -> tuple[float, int, int]:
+    """(seconds, distinct entries in the store, entries in the store)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "room2_bench.json"
+        per_process = [writers // processes + (p < writers % processes) for p in range(processes)]
+        start = time.perf_counter()
+        if processes == 1:
+            run_writers(mode, path, writers, persists, "p0")
+        else:
+            jobs = [multiprocessing.Process(target=run_writers, args=(mode, path, n, persists, f"p{p}"))
+                    for p, n in enumerate(per_process) if n]
+            for job in jobs:
+                job.start()
+            for job in jobs:
+                job.join()
+        elapsed = time.perf_counter() - start
+        entries = room2_store.load_entries(path)
+        return elapsed, len({e["text"] for e in entries}), len(entries)
+
+
+def run_benchmark(writers: int = 16, persists: int = 20, processes: int = 2):
+    print("=" * 70)
+    print(f"ROOM 2 WRITERS: {writers} threads over {processes} process(es), {persists} persists each")
+    print("=" * 70)
+    for threads in sorted({1, max(1, writers // 4), writers}):
+        for mode in MODES:
+            elapsed, found, stored = run_mode(mode, threads, persists, min(processes, threads))
+            expected = threads * persists
+            status = "ok" if found == stored == expected else f"LOST {expected - found}, DUPLICATED {stored - found}"
+            print(f"{threads:>3} writers  {mode:<22} {expected / elapsed:>8,.0f} persists/s  "
+                  f"({elapsed:.2f}s, {found}/{expected} {status})")
+
+
+if __name__ == "__main__":
+    run_benchmark(*(int(a) for a in sys.argv[1:4]))
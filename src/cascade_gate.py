@@ -0,0 +1,194 @@
+"""
+Two-Room Memory Architecture - Cascade Gate
+Cheap TF-IDF triviality score first, neural classifier only when uncertain
+
+The TF-IDF gate settles the clear cases on its own: a high triviality score
+flushes, a low one persists. Only messages inside the band (lo, hi) are
+sent to the MiniLM classifier. The band is calibrated on the stress suites
+so that the shortcuts stay within a budget of lost memories (should
+persist, got flushed) and noise persisted (should flush, got persisted).
+
+Serving paths use the shortcuts when enabled: ClassifierGate(cascade=True),
+gate_workers.py --cascade, or GATE_CASCADE=1 for server.py. A flush
+shortcut skips the encoder; a persist shortcut still encodes when the
+embedding is needed (dedup, retrieval, return_embedding).
+
+Run with: python cascade_gate.py [--max-lost-rate 0.01] [--max-noise-rate 0.05] [--write]
+"""
+
+import numpy as np
+import json
+from pathlib import Path
+from typing import Optional
+
+from eval_harness import LogisticGate, TfidfGate, cached_scores, load_suites, _digest
+from threshold_sweep import CALIBRATION_SUITES  # "validation" is held out for reporting
+
+BAND_PATH = Path(__file__).parent / "cascade_band.json"
+
+
+def calibrate_band(trivial_scores: np.ndarray, labels: np.ndarray,
+                   max_lost_rate: float = 0.01, max_noise_rate: float = 0.05) -> tuple[float, float]:
+    """
+    Widest band edges whose shortcut errors stay within budget.
+    Flush shortcut: score >= hi. Persist shortcut: score <= lo.
+    labels: True = persist.
+    """
+    scores = np.asarray(trivial_scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+
+    # hi: allow at most k persist examples at or above it
+    pos_desc = np.sort(scores[labels])[::-1]
+    k = int(np.floor(max_lost_rate * len(pos_desc)))
+    if k < len(pos_desc):
+        hi = np.nextafter(pos_desc[k], np.inf)
+    else:
+        hi = np.inf if len(pos_desc) == 0 else -np.inf
+
+    # lo: allow at most k flush examples at or below it
+    neg_asc = np.sort(scores[~labels])
+    k = int(np.floor(max_noise_rate * len(neg_asc)))
+    if k < len(neg_asc):
+        lo = np.nextafter(neg_asc[k], -np.inf)
+    else:
+        lo = -np.inf if len(neg_asc) == 0 else np.inf
+
+    # With loose budgets the shortcuts can overlap; the flush edge wins
+    lo = min(lo, np.nextafter(hi, -np.inf))
+    return float(lo), float(hi)
+
+
+class CascadeGate:
+    """TF-IDF shortcut with neural fallback; usable as an eval_harness gate"""
+    name = "cascade"
+
+    def __init__(self, band: Optional[tuple[float, float]] = None,
+                 sparse: Optional[TfidfGate] = None, neural: Optional[LogisticGate] = None):
+        self.sparse = sparse or TfidfGate()
+        self._neural = neural
+        self.band = band or load_band()
+        self.routed = {"flush": 0, "persist": 0, "neural": 0}
+
+    @property
+    def neural(self):
+        """Loaded on first use: serving paths only need the shortcuts"""
+        if self._neural is None:
+            self._neural = LogisticGate()
+        return self._neural
+
+    @property
+    def threshold(self) -> float:
+        return self.neural.threshold
+
+    @property
+    def version(self) -> str:
+        return _digest(self.sparse.version, self.neural.version, self.band)
+
+    def route(self, trivial_scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Masks of messages short-circuited to FLUSH and to PERSIST"""
+        lo, hi = self.band
+        return trivial_scores >= hi, trivial_scores <= lo
+
+    def shortcuts(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        route() for texts, counted in routed: masks of texts settled as
+        FLUSH and as PERSIST without the encoder
+        """
+        flush, persist = self.route(self.sparse.score(texts))
+        self.routed["flush"] += int(flush.sum())
+        self.routed["persist"] += int(persist.sum())
+        self.routed["neural"] += int((~(flush | persist)).sum())
+        return flush, persist
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """Persist score: 0.0 / 1.0 on a shortcut, neural probability otherwise"""
+        flush, persist = self.shortcuts(texts)
+        scores = np.where(persist, 1.0, 0.0)
+        uncertain = ~(flush | persist)
+        if uncertain.any():
+            scores[uncertain] = self.neural.score([t for t, u in zip(texts, uncertain) if u])
+        return scores
+
+    def persists(self, scores: np.ndarray) -> np.ndarray:
+        return scores > self.threshold
+
+    def predict(self, exchange: str) -> tuple[str, float, str]:
+        """Single-message decision: (prediction, confidence, route)"""
+        flush, persist = self.shortcuts([exchange])
+        if flush[0]:
+            return "FLUSH", 1.0, "tfidf"
+        if persist[0]:
+            return "PERSIST", 1.0, "tfidf"
+        proba = float(self.neural.score([exchange])[0])
+        prediction = "PERSIST" if proba > self.threshold else "FLUSH"
+        return prediction, max(proba, 1 - proba), "neural"
+
+
+def load_band() -> tuple[float, float]:
+    """Recorded band, or an empty band (everything goes to the neural gate)"""
+    if BAND_PATH.exists():
+        band = json.loads(BAND_PATH.read_text())
+        return band["lo"], band["hi"]
+    return -np.inf, np.inf
+
+
+def run_calibration(max_lost_rate: float = 0.01, max_noise_rate: float = 0.05, write: bool = False) -> dict:
+    suites = load_suites()
+    sparse, neural = TfidfGate(), LogisticGate()
+
+    per_suite = {}
+    for name, cases in suites.items():
+        texts = [t for t, _ in cases]
+        per_suite[name] = (
+            cached_scores(sparse, texts),
+            cached_scores(neural, texts),
+            np.array([e == "persist" for _, e in cases]),
+        )
+
+    fit = [per_suite[n] for n in CALIBRATION_SUITES]
+    lo, hi = calibrate_band(np.concatenate([f[0] for f in fit]),
+                            np.concatenate([f[2] for f in fit]),
+                            max_lost_rate, max_noise_rate)
+
+    print("=" * 70)
+    print("CASCADE CALIBRATION")
+    print("=" * 70)
+    print(f"Budget: lost <= {max_lost_rate:.1%}, noise <= {max_noise_rate:.1%} (fitted on {', '.join(CALIBRATION_SUITES)})")
+    print(f"Band: flush if tfidf >= {hi:.4f}, persist if tfidf <= {lo:.4f}, else neural")
+    print(f"\n{'suite':<12}{'n':>6}{'short-circ':>12}{'neural acc':>12}{'cascade acc':>13}{'lost':>10}{'noise':>10}")
+
+    totals = {"n": 0, "short": 0}
+    for name, (trivial, proba, labels) in per_suite.items():
+        flush, persist = trivial >= hi, trivial <= lo
+        neural_pred = proba > neural.threshold
+        cascade_pred = np.where(flush, False, np.where(persist, True, neural_pred))
+        neural_acc = np.mean(neural_pred == labels)
+        cascade_acc = np.mean(cascade_pred == labels)
+        lost = (int(np.sum(labels & ~neural_pred)), int(np.sum(labels & ~cascade_pred)))
+        noise = (int(np.sum(~labels & neural_pred)), int(np.sum(~labels & cascade_pred)))
+        short = int(np.sum(flush | persist))
+        totals["n"] += len(labels)
+        totals["short"] += short
+        print(f"{name:<12}{len(labels):>6}{short / len(labels):>12.1%}{neural_acc:>12.1%}{cascade_acc:>13.1%}"
+              f"{f'{lost[0]}->{lost[1]}':>10}{f'{noise[0]}->{noise[1]}':>10}")
+
+    fraction = totals["short"] / max(totals["n"], 1)
+    print(f"\nEncoder calls avoided: {fraction:.1%} of traffic")
+
+    band = {"lo": lo, "hi": hi, "max_lost_rate": max_lost_rate, "max_noise_rate": max_noise_rate,
+            "short_circuit_fraction": fraction}
+    if write:
+        BAND_PATH.write_text(json.dumps(band, indent=2))
+        print(f"Band saved to {BAND_PATH}")
+    return band
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-lost-rate", type=float, default=0.01)
+    parser.add_argument("--max-noise-rate", type=float, default=0.05)
+    parser.add_argument("--write", action="store_true", help="save to cascade_band.json")
+    args = parser.parse_args()
+    run_calibration(args.max_lost_rate, args.max_noise_rate, args.write)
@@ -0,0 +1,24 @@
+"""
+Two-Room Memory Architecture - Relational Categories
+Keyword heuristic assigning a persisted exchange to its Room 2 category
+"""
+
+CATEGORIES = ("EMPATHY", "UNDERSTANDING", "RESPECT", "COMMUNICATION", "CONTEXT", "VOLATILE")
+
+# Checked in order; the first category with a matching keyword wins
+CATEGORY_KEYWORDS = (
+    ("EMPATHY", ('died', 'death', 'passed', 'grief', 'miss', 'lost', 'sad', 'cry', 'tears')),
+    ("UNDERSTANDING", ('adhd', 'autism', 'anxiety', 'depression', 'neurodivergent', 'disability')),
+    ("RESPECT", ('degree', 'phd', 'lawyer', 'doctor', 'engineer', 'expert', 'professional')),
+    ("COMMUNICATION", ('prefer', 'direct', 'patient', 'explain', 'style')),
+    ("VOLATILE", ('shipping', 'launching', 'deadline', 'project', 'goal')),
+)
+
+
+def categorize(text: str) -> str:
+    """Relational category for a meaningful exchange (CONTEXT if nothing matches)"""
+    text_lower = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(w in text_lower for w in keywords):
+            return category
+    return 'CONTEXT'
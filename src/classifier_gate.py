@@ -4,16 +4,28 @@ Trained on labeled examples instead of archetype similarity
 """
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import cross_val_score, train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
-import json
+import os
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
 import pickle
 
+from cascade_gate import CascadeGate
+from categories import categorize
+from embedding_store import dedupe_labeled
+from encoders import Encoder
+from gate import Gate
+from long_input import gate_long
+import room2_store
+from room2_dedup import BucketIndex, DedupIndex
+from room2_vectors import QuantizedBuckets
+from syntactic_profile import ProfileStore, store_for
+from threshold_sweep import classifier_version, load_threshold
+import tracing
+from volatility import VolatilityTracker, state_path, tracker_for
+
 # Training data: (exchange, label)
 # 0 = flush (trivial), 1 = persist (meaningful)
 TRAINING_DATA = [
@@ -337,95 +349,331 @@ TRAINING_DATA = [
     ("Finally", 1),
 ]
 
-# Initialize
-print("Loading embedding model...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model loaded.")
+MODEL_NAME = 'all-MiniLM-L6-v2'
 
-# Prepare data
-print("Preparing training data...")
-texts = [t[0] for t in TRAINING_DATA]
-labels = np.array([t[1] for t in TRAINING_DATA])
-embeddings = model.encode(texts)
-print(f"Training data: {len(texts)} examples ({sum(labels)} persist, {len(labels) - sum(labels)} flush)")
+# Room 2 storage
+ROOM2_PATH = room2_store.ROOM2_PATH
+MODEL_PATH = Path(__file__).parent / "classifier.pkl"
 
-# Train classifier
-print("Training classifier...")
-classifier = LogisticRegression(max_iter=1000, class_weight='balanced')
-classifier.fit(embeddings, labels)
+# Retroactive linking: a persisted turn absorbs flushed turns this many turns
+# back whose embeddings are at least this similar to it
+LINK_WINDOW = 8
+LINK_SIMILARITY = 0.35
 
-# Cross-validation score
-cv_scores = cross_val_score(classifier, embeddings, labels, cv=5)
-print(f"Cross-validation accuracy: {cv_scores.mean():.1%} (+/- {cv_scores.std() * 2:.1%})")
 
-# Room 2 storage
-ROOM2_PATH = Path(__file__).parent / "room2.json"
-MODEL_PATH = Path(__file__).parent / "classifier.pkl"
+def train(encoder: Encoder, model_path: Path = MODEL_PATH) -> LogisticRegression:
+    """Fit the classifier on TRAINING_DATA and save it to model_path"""
+    # Prepare data (duplicates removed, embeddings served from the on-disk cache)
+    print("Preparing training data...")
+    dataset = dedupe_labeled(TRAINING_DATA)
+    texts = [t[0] for t in dataset]
+    labels = np.array([t[1] for t in dataset])
+    embeddings = encoder.encode_cached(texts)
+    print(f"Training data: {len(texts)} examples ({sum(labels)} persist, {len(labels) - sum(labels)} flush)")
+
+    print("Training classifier...")
+    classifier = LogisticRegression(max_iter=1000, class_weight='balanced')
+    classifier.fit(embeddings, labels)
+
+    cv_scores = cross_val_score(classifier, embeddings, labels, cv=5)
+    print(f"Cross-validation accuracy: {cv_scores.mean():.1%} (+/- {cv_scores.std() * 2:.1%})")
+
+    # Write-then-rename, so a watching server never picks up a half-written artifact
+    tmp_path = model_path.with_suffix(".pkl.tmp")
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(classifier, f)
+    os.replace(tmp_path, model_path)
+    print(f"Classifier saved to {model_path}")
+    return classifier
+
+
+def backward_links(embeddings: np.ndarray, persisted: np.ndarray, window: int = LINK_WINDOW,
+                   min_similarity: float = LINK_SIMILARITY) -> dict:
+    """
+    {persisted turn: [earlier flushed turns it absorbs]}. Each flushed turn
+    links to its most similar persisted turn within window turns after it.
+    """
+    n = len(embeddings)
+    if n == 0 or not persisted.any() or persisted.all():
+        return {}
+    unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    similarity = unit @ unit.T
+    later = np.arange(n)[None, :] - np.arange(n)[:, None]  # [flushed, persisted] distance
+    allowed = (~persisted)[:, None] & persisted[None, :] & (later > 0) & (later <= window)
+    similarity = np.where(allowed & (similarity >= min_similarity), similarity, -np.inf)
+    best = similarity.argmax(axis=1)
+    links = {}
+    for flushed in np.flatnonzero(np.isfinite(similarity[np.arange(n), best])):
+        links.setdefault(int(best[flushed]), []).append(int(flushed))
+    return links
+
+
+class ClassifierGate(Gate):
+    """Logistic regression over MiniLM embeddings, trained on first use"""
+    model_name = MODEL_NAME
+
+    def __init__(self, model_name: Optional[str] = None, threshold: Optional[float] = None,
+                 path: Path = ROOM2_PATH, model_path: Path = MODEL_PATH, quantized: Optional[str] = None,
+                 cascade: bool = False):
+        super().__init__(model_name, threshold, path)
+        self.model_path = model_path
+        # cascade: TF-IDF shortcuts (cascade_gate.py) settle clear cases before the encoder
+        self.use_cascade = cascade
+        self._cascade = None
+        # Near-duplicate check on the persist path, reusing the gate's embedding.
+        # quantized ("binary" or "int8") keeps its vectors as room2_vectors codes
+        buckets = QuantizedBuckets(quantized) if quantized else BucketIndex
+        self.dedup_index = DedupIndex(lambda texts: self.encoder.encode_cached(texts), path,
+                                      bucket_factory=buckets)
+        self._volatility = None
+        self._profiles = None
+
+    def build_head(self) -> LogisticRegression:
+        return train(self.encoder, self.model_path)
+
+    @property
+    def volatility(self) -> VolatilityTracker:
+        """Per-user volatility statistics; every exchange feeds them, persists read the tier table"""
+        if self._volatility is None:
+            self._volatility = tracker_for(state_path(self.path))
+        return self._volatility
+
+    @property
+    def profiles(self) -> ProfileStore:
+        """Per-user syntactic profiles, fed by the exchanges persisted for a user"""
+        if self._profiles is None:
+            self._profiles = store_for(Path(self.path).parent / "profiles")
+        return self._profiles
+
+    @property
+    def cascade(self) -> Optional[CascadeGate]:
+        """The TF-IDF front of the cascade, built on first use; None when off"""
+        if self.use_cascade and self._cascade is None:
+            self._cascade = CascadeGate(neural=self)
+        return self._cascade
+
+    def default_threshold(self) -> float:
+        # 0.50 = balanced (after training data expansion), unless threshold_sweep.py
+        # has recorded an operating point for this exact classifier
+        self.head  # trains and saves the artifact the threshold is keyed on
+        return load_threshold(classifier_version(self.model_path), default=0.50)
 
-# Save trained classifier
-with open(MODEL_PATH, 'wb') as f:
-    pickle.dump(classifier, f)
-print(f"Classifier saved to {MODEL_PATH}")
+    def score_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """Persist probability"""
+        return self.head.predict_proba(np.asarray(embeddings))[:, 1]
 
+    def persists(self, scores: np.ndarray, threshold: Optional[float] = None) -> np.ndarray:
+        return np.asarray(scores) > (self.threshold if threshold is None else threshold)
 
-# Threshold for persist decision
-# 0.50 = balanced (after training data expansion)
-DEFAULT_THRESHOLD = 0.50
+    def predict_embedding(self, embedding: np.ndarray, threshold: Optional[float] = None) -> tuple[str, float]:
+        """Predict flush/persist from an already-encoded exchange"""
+        threshold = self.threshold if threshold is None else threshold
+        proba = self.head.predict_proba(np.asarray(embedding).reshape(1, -1))[0]
+        prediction = "PERSIST" if proba[1] > threshold else "FLUSH"
+        confidence = max(proba)
+        return prediction, confidence
 
+    def predict(self, exchange: str, threshold: Optional[float] = None) -> tuple[str, float]:
+        """Predict flush/persist with confidence score"""
+        return self.predict_embedding(self.encode([exchange])[0], threshold)
 
-def predict(exchange: str, threshold: float = DEFAULT_THRESHOLD) -> tuple[str, float]:
+    def promote(self, exchange: str, category: str, metadata: dict, embedding: Optional[np.ndarray] = None,
+                dedup: bool = True) -> tuple[dict, bool]:
+        """
+        Write an exchange the gate kept to Room 2: (entry, merged). With dedup,
+        near-duplicates merge into the existing entry; the embedding is encoded
+        here if the caller has none. Feeds the profile of metadata["user"].
+        """
+        if dedup:
+            if embedding is None:
+                embedding = self.encoder.encode_cached([exchange])[0]
+            with tracing.span("persist", dedup=True) as span:
+                entry, merged = self.dedup_index.persist(exchange, embedding, category, metadata)
+                span.set(merged=merged)
+        else:
+            entry, merged = self.persist(exchange, category, metadata), False
+        if metadata.get("user"):
+            self.profiles.update(metadata["user"], exchange, category)
+        return entry, merged
+
+    def process_exchange(self, exchange: str, auto_persist: bool = True, dedup: bool = True,
+                         user: Optional[str] = None, long_input: bool = False,
+                         metadata: Optional[dict] = None) -> dict:
+        """
+        Main gate function. With long_input, the exchange is gated sentence by
+        sentence (see long_input.py) and the result names the triggering span.
+        metadata adds fields to the Room 2 entry if the exchange is persisted.
+        """
+        with tracing.span("process_exchange") as trace:
+            trigger = route = None
+            if long_input:
+                [chunked], embeddings = gate_long(self, [exchange])
+                embedding, prediction, trigger = embeddings[0], chunked["decision"], chunked["trigger"]
+                confidence = max(chunked["score"], 1 - chunked["score"])
+            elif self.cascade is not None:
+                with tracing.span("cascade") as span:
+                    flush, persist = self.cascade.shortcuts([exchange])
+                    route = "tfidf" if flush[0] or persist[0] else "neural"
+                    span.set(route=route)
+                if flush[0]:
+                    embedding, prediction, confidence = None, "FLUSH", 1.0
+                elif persist[0]:
+                    # promote() encodes only if the dedup persist needs it
+                    embedding, prediction, confidence = None, "PERSIST", 1.0
+                else:
+                    embedding = self.encode([exchange])[0]
+                    with tracing.span("classify"):
+                        prediction, confidence = self.predict_embedding(embedding)
+            else:
+                embedding = self.encode([exchange])[0]
+                with tracing.span("classify"):
+                    prediction, confidence = self.predict_embedding(embedding)
+            with tracing.span("categorize"):
+                category = categorize(exchange)
+                self.volatility.observe(user, exchange, category)
+            trace.set(decision=prediction)
+            result = {
+                "exchange": exchange,
+                "decision": prediction,
+                "confidence": round(confidence, 3)
+            }
+            if long_input:
+                result["trigger"] = trigger
+            if route:
+                result["route"] = route
+            if prediction == "PERSIST" and auto_persist:
+                metadata = {**(metadata or {}), **({"user": user} if user else {}),
+                            **self.volatility.assign(user, category)}
+                entry, merged = self.promote(exchange, category, metadata, embedding, dedup)
+                if dedup:
+                    result["merged"] = merged
+                    if merged:
+                        result["hits"] = entry["hits"]
+                result["persisted"] = True
+                result["category"] = category
+                result["tier"] = metadata["tier"]
+        return result
+
+    def process_conversation(self, turns: list[str], auto_persist: bool = True, dedup: bool = True,
+                             user: Optional[str] = None) -> list[dict]:
+        """
+        process_exchange for a whole conversation: one encoder pass, one gate
+        pass, retroactive linking of flushed turns into the persisted turns
+        that follow them, and a single Room 2 write. One result per turn.
+        """
+        with tracing.span("process_conversation", turns=len(turns)):
+            if not turns:
+                return []
+            with tracing.span("encode", texts=len(turns)):
+                embeddings = np.asarray(self.encoder.encode_bulk(turns))
+            with tracing.span("classify"):
+                scores = self.score_embeddings(embeddings)
+                persisted = self.persists(scores)
+            links = backward_links(embeddings, persisted)
+
+            results, items = [], []
+            with tracing.span("categorize"):
+                for i, (turn, score, keep) in enumerate(zip(turns, scores, persisted)):
+                    category = categorize(turn)
+                    self.volatility.observe(user, turn, category)
+                    results.append({
+                        "exchange": turn,
+                        "decision": "PERSIST" if keep else "FLUSH",
+                        "confidence": round(float(max(score, 1 - score)), 3)
+                    })
+                    if keep:
+                        metadata = {**({"user": user} if user else {}), **self.volatility.assign(user, category)}
+                        if i in links:
+                            metadata["linked"] = [turns[j] for j in links[i]]
+                        items.append((i, turn, embeddings[i], category, metadata))
+            for i, flushed in links.items():
+                for j in flushed:
+                    results[j]["linked_to"] = i
+
+            if auto_persist and items:
+                with tracing.span("persist", dedup=dedup, entries=len(items)):
+                    if dedup:
+                        outcomes = self.dedup_index.persist_many([item[1:] for item in items])
+                    else:
+                        entries = [room2_store.make_entry(turn, category, metadata)
+                                   for _, turn, _, category, metadata in items]
+                        room2_store.append_entries(entries, self.path)
+                        outcomes = [(entry, False) for entry in entries]
+                for (i, turn, _, category, metadata), (entry, merged) in zip(items, outcomes):
+                    results[i].update(persisted=True, category=category, tier=metadata["tier"])
+                    if user:
+                        self.profiles.update(user, turn, category)
+                    if dedup:
+                        results[i]["merged"] = merged
+                        if merged:
+                            results[i]["hits"] = entry["hits"]
+        return results
+
+    def clear_room2(self):
+        super().clear_room2()
+        self.dedup_index.reset()
+
+
+# Process-wide default gate; the functions below are thin wrappers around it
+GATE = ClassifierGate()
+dedup_index = GATE.dedup_index
+
+# Built on first access rather than at import
+_LAZY = {
+    "model": lambda: GATE.encoder.model,
+    "volatility_tracker": lambda: GATE.volatility,
+    "embedding_cache": lambda: GATE.encoder.cache,
+    "encode_bulk": lambda: GATE.encoder.encode_bulk,
+    "classifier": lambda: GATE.head,
+    "DEFAULT_THRESHOLD": lambda: GATE.threshold,
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def predict_embedding(embedding: np.ndarray, threshold: Optional[float] = None) -> tuple[str, float]:
+    """Predict flush/persist from an already-encoded exchange"""
+    return GATE.predict_embedding(embedding, threshold)
+
+
+def predict(exchange: str, threshold: Optional[float] = None) -> tuple[str, float]:
     """Predict flush/persist with confidence score"""
-    embedding = model.encode([exchange])
-    proba = classifier.predict_proba(embedding)[0]
-    prediction = "PERSIST" if proba[1] > threshold else "FLUSH"
-    confidence = max(proba)
-    return prediction, confidence
+    return GATE.predict(exchange, threshold)
 
 
-def should_persist(exchange: str, confidence_threshold: float = DEFAULT_THRESHOLD) -> bool:
+def should_persist(exchange: str, confidence_threshold: Optional[float] = None) -> bool:
     """Gate decision: persist to Room 2 if classified as meaningful"""
-    embedding = model.encode([exchange])
-    proba = classifier.predict_proba(embedding)[0]
-    return proba[1] > confidence_threshold
+    return GATE.should_persist(exchange, confidence_threshold)
 
 
 def persist(exchange: str, category: Optional[str] = None, metadata: Optional[dict] = None):
     """Write exchange to Room 2"""
-    room2 = json.loads(ROOM2_PATH.read_text()) if ROOM2_PATH.exists() else []
-    entry = {
-        "text": exchange,
-        "timestamp": datetime.now().isoformat(),
-        "category": category,
-        **(metadata or {})
-    }
-    room2.append(entry)
-    ROOM2_PATH.write_text(json.dumps(room2, indent=2))
-    return entry
-
-
-def process_exchange(exchange: str, auto_persist: bool = True) -> dict:
+    return GATE.persist(exchange, category, metadata)
+
+
+def process_exchange(exchange: str, auto_persist: bool = True, dedup: bool = True,
+                     user: Optional[str] = None, long_input: bool = False,
+                     metadata: Optional[dict] = None) -> dict:
     """Main gate function"""
-    prediction, confidence = predict(exchange)
-    result = {
-        "exchange": exchange,
-        "decision": prediction,
-        "confidence": round(confidence, 3)
-    }
-    if prediction == "PERSIST" and auto_persist:
-        persist(exchange)
-        result["persisted"] = True
-    return result
+    return GATE.process_exchange(exchange, auto_persist, dedup, user, long_input, metadata)
+
+
+def process_conversation(turns: list[str], auto_persist: bool = True, dedup: bool = True,
+                         user: Optional[str] = None) -> list[dict]:
+    """Gate a whole conversation in one pass"""
+    return GATE.process_conversation(turns, auto_persist, dedup, user)
 
 
 def get_room2_contents() -> list:
-    if ROOM2_PATH.exists():
-        return json.loads(ROOM2_PATH.read_text())
-    return []
+    return GATE.get_room2_contents()
 
 
 def clear_room2():
-    if ROOM2_PATH.exists():
-        ROOM2_PATH.unlink()
+    GATE.clear_room2()
 
 
 # Test
@@ -0,0 +1,141 @@
+"""
+Two-Room Memory Architecture - Context Packing
+Fit retrieved Room 2 memories into a prompt under a token budget
+
+Each candidate's value combines
+
+    category priority   what the memory demands of the response (EMPATHY first)
+    weight band         high / medium / low, as maintenance assigns them
+    recency             halved every band half-life since the memory was last seen
+    similarity          to the current message, from retrieval
+
+and the highest-value set that fits the budget is chosen exactly (0/1
+knapsack over token cost, one NumPy row update per candidate). Token costs
+are cached per memory id, so a memory is only counted the first time it is
+retrieved.
+"""
+
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from room1_session import estimate_tokens
+from room2_maintenance import entry_time, weight_band, weight_of
+
+CONTEXT_TOKENS = 512
+MAX_CONTEXT_TOKENS = 8192  # the knapsack table is candidates x budget
+
+CATEGORY_PRIORITY = {
+    "EMPATHY": 1.0,
+    "UNDERSTANDING": 0.9,
+    "COMMUNICATION": 0.85,
+    "RESPECT": 0.7,
+    "VOLATILE": 0.6,
+    "CONTEXT": 0.4,
+}
+DEFAULT_PRIORITY = 0.4
+BAND_SCORE = {"high": 1.0, "medium": 0.6, "low": 0.3}
+
+# Relative weight of each value component
+VALUE_WEIGHTS = {"category": 0.35, "band": 0.15, "recency": 0.15, "similarity": 0.35}
+
+HEADER = "[CONTEXT ABOUT THIS USER:]"
+FOOTER = "[Use this context to inform your responses when relevant.]"
+LINE_OVERHEAD = 4  # "- [CATEGORY] " prefix and newline, in tokens
+MAX_CACHED_TOKENS = 100000
+
+
+class TokenCountCache:
+    """Token cost per memory id (Room 2 text never changes under an id)"""
+
+    def __init__(self, count: Callable[[str], int] = estimate_tokens, max_size: int = MAX_CACHED_TOKENS):
+        self.count = count
+        self.max_size = max_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tokens(self, entry: dict) -> int:
+        key = entry.get("id") or entry["text"]
+        with self._lock:
+            cost = self._counts.get(key)
+            if cost is not None:
+                self._counts.move_to_end(key)
+                return cost
+        cost = self.count(entry["text"]) + LINE_OVERHEAD
+        with self._lock:
+            self._counts[key] = cost
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+        return cost
+
+
+TOKEN_COUNTS = TokenCountCache()
+
+
+def memory_value(entry: dict, now: Optional[float] = None) -> float:
+    now = time.time() if now is None else now
+    band, half_life = weight_band(weight_of(entry))
+    if entry.get("tier") == 1:
+        recency = 1.0  # immutable facts don't go stale
+    else:
+        seen = entry.get("last_seen")
+        age_days = (now - entry_time({"timestamp": seen} if seen else entry)) / 86400
+        recency = 0.5 ** (max(age_days, 0.0) / half_life)
+    w = VALUE_WEIGHTS
+    return (w["category"] * CATEGORY_PRIORITY.get(entry.get("category"), DEFAULT_PRIORITY)
+            + w["band"] * BAND_SCORE[band]
+            + w["recency"] * recency
+            + w["similarity"] * max(entry.get("similarity", 0.0), 0.0))
+
+
+def pack(candidates: list, budget: int = CONTEXT_TOKENS, now: Optional[float] = None,
+         token_counts: TokenCountCache = TOKEN_COUNTS) -> list:
+    """
+    Highest-value subset of candidates whose token costs fit the budget
+    (at most MAX_CONTEXT_TOKENS), best first
+    """
+    budget = min(budget, MAX_CONTEXT_TOKENS) - token_counts.count(HEADER) - token_counts.count(FOOTER)
+    if budget <= 0 or not candidates:
+        return []
+    values = np.array([memory_value(e, now) for e in candidates])
+    costs = np.array([token_counts.tokens(e) for e in candidates])
+    budget = min(budget, int(costs.sum()))  # no table wider than everything together
+
+    # best[b] = highest value using at most b tokens; keep[i, b] = item i taken at b
+    best = np.zeros(budget + 1)
+    keep = np.zeros((len(candidates), budget + 1), dtype=bool)
+    for i, (value, cost) in enumerate(zip(values, costs)):
+        if cost > budget:
+            continue
+        with_item = best[:budget + 1 - cost] + value
+        take = with_item > best[cost:]
+        keep[i, cost:] = take
+        best[cost:] = np.where(take, with_item, best[cost:])
+
+    chosen = []
+    b = budget
+    for i in range(len(candidates) - 1, -1, -1):
+        if keep[i, b]:
+            chosen.append(i)
+            b -= costs[i]
+    chosen.sort(key=lambda i: -values[i])
+    return [candidates[i] for i in chosen]
+
+
+def render(memories: list) -> str:
+    if not memories:
+        return ""
+    lines = [f"- [{m.get('category') or 'CONTEXT'}] {m['text']}" for m in memories]
+    return "\n".join([HEADER, *lines, FOOTER])
+
+
+def build_context(candidates: list, budget: int = CONTEXT_TOKENS, now: Optional[float] = None,
+                  token_counts: TokenCountCache = TOKEN_COUNTS) -> tuple[str, int, list]:
+    """(prompt text, token cost, memories used)"""
+    chosen = pack(candidates, budget, now, token_counts)
+    if not chosen:
+        return "", 0, []
+    cost = token_counts.count(HEADER) + token_counts.count(FOOTER) + sum(token_counts.tokens(m) for m in chosen)
+    return render(chosen), cost, chosen
@@ -0,0 +1,199 @@
+"""
+Two-Room Memory Architecture - Embedding Store
+Deduplicated labeled data and a content-addressed on-disk embedding cache
+
+Embeddings live in one memory-mapped .npy per model, with a sidecar key
+file mapping sha1(text) to row: one 40-hex-char key per line, line i for
+row i. Only strings the cache has never seen are sent to the encoder.
+
+The array keeps spare rows. An append writes its rows into the spare
+capacity and then appends their keys, so it costs only the new rows; when
+the array is full it is copied into one twice the size. Appends hold a
+thread lock and an flock on <model>.lock, so server threads and other
+processes can share one cache.
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): appends are only safe within one process
+    fcntl = None
+
+CACHE_DIR = Path(__file__).parent / "embedding_cache"
+KEY_LINE = 41        # 40 hex chars of sha1 and a newline
+MIN_CAPACITY = 1024  # rows in a new array
+COPY_CHUNK = 4096    # rows copied at a time when the array grows
+
+
+def text_key(text: str) -> str:
+    """Content address for a string"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def dedupe_labeled(pairs: Iterable[tuple]) -> list[tuple]:
+    """
+    Drop repeated (text, label) pairs, keeping first-seen order.
+    If the same text appears with two different labels, the first label wins
+    and the conflict is reported.
+    """
+    seen = {}
+    unique = []
+    for text, label in pairs:
+        if text in seen:
+            if seen[text] != label:
+                print(f"Conflicting labels for {text!r}: keeping {seen[text]}, ignoring {label}")
+            continue
+        seen[text] = label
+        unique.append((text, label))
+    return unique
+
+
+class EmbeddingCache:
+    """Memory-mapped embedding cache keyed by text hash and model id"""
+
+    def __init__(self, model_id: str, cache_dir: Path = CACHE_DIR):
+        self.model_id = model_id
+        slug = model_id.replace("/", "__")
+        self.array_path = Path(cache_dir) / f"{slug}.npy"
+        self.keys_path = Path(cache_dir) / f"{slug}.keys"
+        self.lock_path = Path(cache_dir) / f"{slug}.lock"
+        self._rows = {}
+        self._count = 0            # keys (and so rows) consumed from keys_path
+        self._array = None         # the whole memory-mapped array, spare rows included
+        self._array_stamp = None
+        self._matrix = None        # the rows in use
+        self._lock = threading.Lock()
+        legacy = Path(cache_dir) / f"{slug}.keys.json"
+        if legacy.exists() and not self.keys_path.exists():
+            with self._locked():
+                self._migrate(legacy)
+        self._refresh()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the files, for threads and processes alike"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _migrate(self, legacy: Path):
+        """Key list from the earlier .keys.json layout"""
+        if self.keys_path.exists() or not self.array_path.exists():
+            return
+        keys = json.loads(legacy.read_text())[:len(np.load(self.array_path, mmap_mode="r"))]
+        self.keys_path.write_text("".join(key + "\n" for key in keys))
+        legacy.unlink()
+
+    def _refresh(self):
+        """Pick up rows appended since the last look, by this or another process"""
+        try:
+            stat = self.array_path.stat()
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_size) != self._array_stamp:
+            self._array = np.load(self.array_path, mmap_mode="r")
+            self._array_stamp = (stat.st_ino, stat.st_size)
+        try:
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._count * KEY_LINE)
+                # a key is only trusted once its row exists: rows are written first
+                data = f.read((len(self._array) - self._count) * KEY_LINE)
+        except FileNotFoundError:
+            data = b""
+        rows = self._rows
+        if len(data) >= KEY_LINE:
+            rows = dict(rows)
+            for i in range(len(data) // KEY_LINE):
+                rows.setdefault(data[i * KEY_LINE:(i + 1) * KEY_LINE - 1].decode("ascii"), self._count)
+                self._count += 1
+        # readers take _rows then _matrix, so publish the matrix first
+        self._matrix = self._array[:self._count]
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, text: str) -> bool:
+        return text_key(text) in self._rows
+
+    def _grow(self, rows: int, dim: int):
+        """Replace the array with one of at least rows rows, doubling capacity"""
+        old = 0 if self._array is None else len(self._array)
+        capacity = max(rows, 2 * old, MIN_CAPACITY)
+        self.array_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=self.array_path.stem + ".", suffix=".tmp.npy",
+                                   dir=self.array_path.parent)
+        os.close(fd)
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        for start in range(0, self._count, COPY_CHUNK):
+            end = min(start + COPY_CHUNK, self._count)
+            out[start:end] = self._array[start:end]
+        out.flush()
+        del out
+        os.replace(tmp, self.array_path)
+        self._refresh()
+
+    def _append(self, keys: list[str], vectors: np.ndarray):
+        """
+        Add rows in the spare capacity of the on-disk array (growing it
+        geometrically when full), then append their keys. Rows already added
+        by another thread or process are skipped.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            self._refresh()
+            fresh = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not fresh:
+                return
+            vectors = vectors[fresh]
+            keys = [keys[i] for i in fresh]
+            if self._array is not None and self._array.shape[1] != vectors.shape[1]:
+                raise ValueError(f"{self.array_path} holds {self._array.shape[1]}-d embeddings, "
+                                 f"got {vectors.shape[1]}-d")
+            start, end = self._count, self._count + len(keys)
+            if self._array is None or end > len(self._array):
+                self._grow(end, vectors.shape[1])
+            out = np.load(self.array_path, mmap_mode="r+")
+            out[start:end] = vectors
+            out.flush()
+            del out
+            with open(self.keys_path, "ab") as f:
+                f.truncate(start * KEY_LINE)  # drop a key line torn by a crash
+                f.write("".join(key + "\n" for key in keys).encode("ascii"))
+            self._refresh()
+
+    def encode(self, texts: list[str], encode_fn: Callable) -> np.ndarray:
+        """
+        Return embeddings for texts, in order.
+        encode_fn (e.g. model.encode) is called once, on the unseen strings only.
+        """
+        keys = [text_key(t) for t in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = encode_fn(list(missing.values()))
+            self._append(list(missing.keys()), vectors)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        index = self._rows
+        rows = [index[key] for key in keys]
+        return np.asarray(self._matrix[rows])
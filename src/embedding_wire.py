@@ -0,0 +1,58 @@
+"""
+Two-Room Memory Architecture - Embedding Wire Format
+Compact encoding for embeddings returned by the server
+
+An embedding, or a batch of them, travels as its raw row-major little-endian
+bytes: 768 bytes per all-MiniLM-L6-v2 vector as float16, 1536 as float32.
+JSON responses carry those bytes base64-encoded; octet-stream responses carry
+them as the body. float16 keeps about three significant digits, which moves
+cosine similarities between MiniLM vectors by well under 0.001.
+
+Decode on the client with:
+
+    vectors = from_base64(response["embeddings"], response["embedding_dim"],
+                          response["embedding_dtype"])
+"""
+
+import base64
+import numpy as np
+
+DTYPES = {"float16": "<f2", "float32": "<f4"}
+DEFAULT_DTYPE = "float16"
+
+
+def requested_dtype(value):
+    """
+    dtype asked for by a request option: None for no embedding, true for the
+    default dtype, or a dtype name. Raises ValueError for anything else.
+    """
+    if value is None or value is False:
+        return None
+    if value is True:
+        return DEFAULT_DTYPE
+    if value in DTYPES:
+        return value
+    raise ValueError(f"return_embedding must be true, false or one of {', '.join(DTYPES)}")
+
+
+def pack(embeddings: np.ndarray, dtype: str = DEFAULT_DTYPE) -> bytes:
+    return np.ascontiguousarray(embeddings, dtype=DTYPES[dtype]).tobytes()
+
+
+def unpack(data: bytes, dim: int, dtype: str = DEFAULT_DTYPE) -> np.ndarray:
+    """(n, dim) float32 array; n is 1 for a single embedding"""
+    return np.frombuffer(data, dtype=DTYPES[dtype]).astype(np.float32).reshape(-1, dim)
+
+
+def to_base64(embeddings: np.ndarray, dtype: str = DEFAULT_DTYPE) -> str:
+    return base64.b64encode(pack(embeddings, dtype)).decode("ascii")
+
+
+def from_base64(text: str, dim: int, dtype: str = DEFAULT_DTYPE) -> np.ndarray:
+    return unpack(base64.b64decode(text), dim, dtype)
+
+
+def response_fields(embedding: np.ndarray, dtype: str, key: str = "embedding") -> dict:
+    """The embedding fields added to a JSON response"""
+    embedding = np.asarray(embedding)
+    return {key: to_base64(embedding, dtype), "embedding_dtype": dtype, "embedding_dim": int(embedding.shape[-1])}
@@ -0,0 +1,62 @@
+"""
+Two-Room Memory Architecture - Encoder Registry
+One embedding model per name per process, loaded on first use
+
+Every gate, the server and the benchmarks ask the registry for their model,
+so importing several of them loads all-MiniLM-L6-v2 once.
+"""
+
+import numpy as np
+import logging
+import threading
+
+import tracing
+from batching import bucketed_encoder
+from embedding_store import EmbeddingCache
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+logger = logging.getLogger(__name__)
+
+_ENCODERS = {}
+_LOCK = threading.Lock()
+
+
+class Encoder:
+    """A loaded SentenceTransformer with its embedding cache and bulk encoder"""
+
+    def __init__(self, name: str):
+        from sentence_transformers import SentenceTransformer
+        logger.info("Loading embedding model %s", name)
+        self.name = name
+        self.model = SentenceTransformer(name)
+        self.cache = EmbeddingCache(name)
+        self.encode_bulk = bucketed_encoder(self.model)  # for many texts at once
+        logger.info("Loaded embedding model %s", name)
+
+    def encode(self, texts) -> np.ndarray:
+        with tracing.span("encode", texts=1 if isinstance(texts, str) else len(texts)):
+            if tracing.recording():
+                # encode() tokenizes internally; in sampled traces only, time
+                # a separate tokenizer pass so the two costs can be told apart
+                with tracing.span("tokenize"):
+                    self.model.tokenize([texts] if isinstance(texts, str) else list(texts))
+            return self.model.encode(texts)
+
+    def encode_cached(self, texts: list[str]) -> np.ndarray:
+        """Bulk encode through the on-disk cache (for texts that recur)"""
+        return self.cache.encode(texts, self.encode_bulk)
+
+
+def get_encoder(name: str = DEFAULT_MODEL) -> Encoder:
+    encoder = _ENCODERS.get(name)
+    if encoder is None:
+        with _LOCK:
+            encoder = _ENCODERS.get(name)
+            if encoder is None:
+                encoder = _ENCODERS[name] = Encoder(name)
+    return encoder
+
+
+def loaded() -> list[str]:
+    return list(_ENCODERS)
@@ -0,0 +1,209 @@
+"""
+Two-Room Memory Architecture - Evaluation Harness
+Run the massive, stress and validation suites against any gate implementation
+
+Per-example scores are cached on disk keyed on the gate's version, so a
+re-run with an unchanged model only scores examples it has not seen.
+
+Run with: python eval_harness.py [logistic|tfidf|archetype|cascade ...]
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from embedding_store import text_key
+
+SCORE_CACHE_DIR = Path(__file__).parent / "eval_cache"
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=repr).encode("utf-8")).hexdigest()[:12]
+
+
+class LogisticGate:
+    """classifier_gate: logistic regression over MiniLM embeddings"""
+    name = "logistic"
+
+    def __init__(self):
+        import classifier_gate
+        from threshold_sweep import classifier_version
+        self._gate = classifier_gate.GATE
+        self.threshold = self._gate.threshold
+        self.version = _digest(self._gate.model_name, classifier_version(self._gate.model_path))
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """Persist probability"""
+        return self._gate.score(texts)
+
+    def persists(self, scores: np.ndarray) -> np.ndarray:
+        return scores > self.threshold
+
+
+class TfidfGate:
+    """room1_gate: cosine similarity to the TF-IDF triviality archetype"""
+    name = "tfidf"
+    threshold = 0.72
+
+    def __init__(self):
+        import room1_gate
+        self._gate = room1_gate
+        self.version = _digest(room1_gate.TRIVIAL_EXAMPLES, room1_gate.vectorizer.get_params(deep=False))
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """Triviality score (lower = more likely to persist)"""
+        gate = self._gate
+        matrix = gate.vectorizer.transform(texts)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+        dots = np.asarray(matrix @ gate.A_t).ravel()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = dots / (norms * np.linalg.norm(gate.A_t))
+        # Zero vector (no overlap with trivial vocabulary) scores 0.0
+        return np.where(norms > 0, scores, 0.0)
+
+    def persists(self, scores: np.ndarray) -> np.ndarray:
+        return scores < self.threshold
+
+
+class ArchetypeGate:
+    """room1_gate_neural: cosine similarity to the MiniLM triviality archetype"""
+    name = "archetype"
+    threshold = 0.72
+
+    def __init__(self):
+        import room1_gate_neural
+        self._gate = room1_gate_neural.GATE
+        self.version = _digest(self._gate.model_name, room1_gate_neural.TRIVIAL_EXAMPLES)
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """Triviality score (lower = more likely to persist)"""
+        return self._gate.score(texts)
+
+    def persists(self, scores: np.ndarray) -> np.ndarray:
+        return scores < self.threshold
+
+
+def _cascade_gate():
+    from cascade_gate import CascadeGate
+    return CascadeGate()
+
+
+GATES = {
+    "logistic": LogisticGate,
+    "tfidf": TfidfGate,
+    "archetype": ArchetypeGate,
+    "cascade": _cascade_gate,
+}
+
+
+def register_gate(name: str, factory: Callable):
+    """
+    Add a backend. factory() must return an object with name, version,
+    threshold, score(texts) -> np.ndarray and persists(scores) -> bool array.
+    """
+    GATES[name] = factory
+
+
+class ScoreCache:
+    """Per-example scores for one gate version, stored as {text_key: score}"""
+
+    def __init__(self, gate, cache_dir: Path = SCORE_CACHE_DIR):
+        self.path = Path(cache_dir) / f"{gate.name}-{gate.version}.json"
+        self.scores = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.hits = 0
+
+    def scores_for(self, gate, texts: list[str]) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.scores and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        if missing:
+            fresh = gate.score(list(missing.values()))
+            self.scores.update(zip(missing.keys(), (float(s) for s in fresh)))
+            self.save()
+        return np.array([self.scores[k] for k in keys], dtype=np.float64)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.scores))
+        os.replace(tmp, self.path)
+
+
+def load_suites() -> dict:
+    from threshold_sweep import load_suites as _load_suites
+    return _load_suites()
+
+
+def cached_scores(gate, texts: list[str]) -> np.ndarray:
+    """Scores for texts from the gate's score cache, computing only what is missing"""
+    return ScoreCache(gate).scores_for(gate, texts)
+
+
+def evaluate(gate, suites: dict = None) -> dict:
+    """Score every suite in one batch and report per-suite results"""
+    suites = suites or load_suites()
+    cache = ScoreCache(gate)
+    texts = [text for cases in suites.values() for text, _ in cases]
+
+    start = time.perf_counter()
+    scores = cache.scores_for(gate, texts)
+    elapsed = time.perf_counter() - start
+    persisted = gate.persists(scores)
+
+    results = {}
+    offset = 0
+    for name, cases in suites.items():
+        predicted = persisted[offset:offset + len(cases)]
+        expected = np.array([e == "persist" for _, e in cases])
+        results[name] = {
+            "total": len(cases),
+            "correct": int(np.sum(predicted == expected)),
+            "accuracy": float(np.mean(predicted == expected)) if cases else 0.0,
+            # Repo convention: lost memories are the critical error
+            "lost": [t for (t, _), p, e in zip(cases, predicted, expected) if e and not p],
+            "noise": [t for (t, _), p, e in zip(cases, predicted, expected) if p and not e],
+        }
+        offset += len(cases)
+
+    return {
+        "gate": gate.name,
+        "version": gate.version,
+        "suites": results,
+        "seconds": elapsed,
+        "cache_hits": cache.hits,
+        "examples": len(texts),
+    }
+
+
+def print_report(reports: list[dict]):
+    print("=" * 70)
+    print("EVALUATION HARNESS")
+    print("=" * 70)
+    print(f"{'gate':<11}{'suite':<12}{'n':>6}{'accuracy':>10}{'lost':>7}{'noise':>7}")
+    for report in reports:
+        for name, r in report["suites"].items():
+            print(f"{report['gate']:<11}{name:<12}{r['total']:>6}{r['accuracy']:>10.1%}"
+                  f"{len(r['lost']):>7}{len(r['noise']):>7}")
+        print(f"{'':<11}scored {report['examples']} examples in {report['seconds']:.2f}s "
+              f"({report['cache_hits']} cached, version {report['version']})")
+
+
+if __name__ == "__main__":
+    import sys
+
+    names = sys.argv[1:] or list(GATES)
+    suites = load_suites()
+    reports = []
+    for name in names:
+        start = time.perf_counter()
+        gate = GATES[name]()
+        print(f"{name}: gate ready in {time.perf_counter() - start:.2f}s")
+        reports.append(evaluate(gate, suites))
+    print_report(reports)
@@ -0,0 +1,93 @@
+"""
+Two-Room Memory Architecture - Gate
+Encoder, decision head, threshold and Room 2 store behind one object
+
+Nothing is loaded when a gate is constructed: the encoder comes from the
+shared registry and the head is built on first use. Subclasses supply
+build_head(), default_threshold(), score_embeddings() and persists().
+"""
+
+import numpy as np
+import threading
+from pathlib import Path
+from typing import Optional
+
+import room2_store
+import tracing
+from encoders import DEFAULT_MODEL, Encoder, get_encoder
+
+
+class Gate:
+    model_name = DEFAULT_MODEL
+
+    def __init__(self, model_name: Optional[str] = None, threshold: Optional[float] = None,
+                 path: Path = room2_store.ROOM2_PATH):
+        self.model_name = model_name or self.model_name
+        self.path = path
+        self._threshold = threshold
+        self._head = None
+        self._lock = threading.Lock()
+
+    @property
+    def encoder(self) -> Encoder:
+        return get_encoder(self.model_name)
+
+    @property
+    def head(self):
+        if self._head is None:
+            with self._lock:
+                if self._head is None:
+                    self._head = self.build_head()
+        return self._head
+
+    @property
+    def threshold(self) -> float:
+        if self._threshold is None:
+            self._threshold = self.default_threshold()
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value: float):
+        self._threshold = value
+
+    def build_head(self):
+        raise NotImplementedError
+
+    def default_threshold(self) -> float:
+        raise NotImplementedError
+
+    def score_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def persists(self, scores: np.ndarray, threshold: Optional[float] = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, texts) -> np.ndarray:
+        return self.encoder.encode(texts)
+
+    def score(self, texts: list[str]) -> np.ndarray:
+        """Scores for many texts, encoded through the embedding cache"""
+        return self.score_embeddings(self.encoder.encode_cached(texts))
+
+    def should_persist(self, exchange: str, threshold: Optional[float] = None) -> bool:
+        return bool(self.persists(self.score_embeddings(self.encode([exchange])), threshold)[0])
+
+    def persist(self, exchange: str, category: Optional[str] = None, metadata: Optional[dict] = None) -> dict:
+        """Write exchange to Room 2"""
+        with tracing.span("persist"):
+            entry = room2_store.make_entry(exchange, category, metadata)
+            room2_store.append_entries([entry], self.path)
+        return entry
+
+    def get_room2_contents(self) -> list:
+        return room2_store.load_entries(self.path)
+
+    def iter_room2(self, **filters):
+        """Stream Room 2 entries (filters: since, until, category, tier, user)"""
+        return room2_store.iter_entries(self.path, **filters)
+
+    def room2_page(self, limit: int = 100, cursor: Optional[str] = None, **filters) -> tuple[list, Optional[str]]:
+        return room2_store.read_page(self.path, limit, cursor, **filters)
+
+    def clear_room2(self):
+        room2_store.clear(self.path)
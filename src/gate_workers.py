@@ -0,0 +1,460 @@
+"""
+Two-Room Memory Architecture - Gate Workers
+Thin front ends enqueue texts; a pool of inference workers pulls batches
+
+    front end  --submit-->  queue  --take(batch)-->  worker (encoder + head)
+               <--result--         <--complete----
+
+Only workers hold a model, so worker count is independent of front-end count
+and a burst waits in the queue instead of piling up in request threads. A
+worker takes whatever is queued, up to max_batch, and encodes it as one batch.
+
+Two queues implement the same interface (submit, take, complete, fail,
+discard):
+
+    LocalQueue    in-process, for tests and single-node setups
+    SocketQueue   client of a QueueBroker on a local socket (host:port or a
+                  Unix socket path), so front ends and workers can be
+                  separate processes
+
+Jobs taken by a worker whose connection drops are put back on the queue.
+
+Run a broker and some workers, then point the server at the broker:
+
+    python gate_workers.py broker --address 127.0.0.1:5070
+    python gate_workers.py worker --address 127.0.0.1:5070   (one per core/node)
+    GATE_QUEUE=127.0.0.1:5070 python ../server.py
+
+Workers started with --cascade settle clear cases with the TF-IDF shortcuts
+of cascade_gate.py and only encode the rest.
+"""
+
+import numpy as np
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import uuid
+from concurrent.futures import Future, wait
+from typing import Optional
+
+import tracing
+from embedding_wire import response_fields
+
+DEFAULT_ADDRESS = "127.0.0.1:5070"
+MAX_BATCH = 64
+TAKE_TIMEOUT = 1.0     # seconds a worker waits for the first job of a batch
+LINGER = 0.002         # seconds it then waits for the batch to fill
+REQUEST_TIMEOUT = 10.0
+
+
+class LocalQueue:
+    """In-process job queue; results come back as futures tagged with job_id"""
+
+    def __init__(self):
+        self._jobs = collections.deque()
+        self._pending = {}  # job id -> (future, payload)
+        self._cond = threading.Condition()
+
+    def submit(self, payloads: list, ids: Optional[list] = None) -> list[Future]:
+        ids = ids or [uuid.uuid4().hex for _ in payloads]
+        futures = []
+        with self._cond:
+            for job_id, payload in zip(ids, payloads):
+                future = Future()
+                future.job_id = job_id
+                self._pending[job_id] = (future, payload)
+                self._jobs.append(job_id)
+                futures.append(future)
+            self._cond.notify_all()
+        return futures
+
+    def take(self, max_batch: int = MAX_BATCH, timeout: float = TAKE_TIMEOUT,
+             linger: float = LINGER) -> list[tuple[str, dict]]:
+        """Up to max_batch (id, payload) jobs; empty if none arrived within timeout"""
+        with self._cond:
+            if not self._jobs:
+                self._cond.wait_for(lambda: self._jobs, timeout)
+            if self._jobs and len(self._jobs) < max_batch and linger > 0:
+                self._cond.wait_for(lambda: len(self._jobs) >= max_batch, linger)
+            jobs = []
+            while self._jobs and len(jobs) < max_batch:
+                job_id = self._jobs.popleft()
+                if job_id in self._pending:  # skip discarded jobs
+                    jobs.append((job_id, self._pending[job_id][1]))
+            return jobs
+
+    def complete(self, results: list[tuple[str, dict]]):
+        with self._cond:
+            futures = [(self._pending.pop(job_id, (None, None))[0], result) for job_id, result in results]
+        for future, result in futures:
+            if future is not None:
+                future.set_result(result)
+
+    def fail(self, ids: list[str], error: str):
+        with self._cond:
+            futures = [self._pending.pop(job_id, (None, None))[0] for job_id in ids]
+        for future in futures:
+            if future is not None:
+                future.set_exception(RuntimeError(error))
+
+    def discard(self, ids: list[str]):
+        """Forget jobs whose caller has given up; queued copies are skipped"""
+        with self._cond:
+            for job_id in ids:
+                self._pending.pop(job_id, None)
+
+    def requeue(self, ids: list[str]):
+        """Put taken but unfinished jobs back at the front of the queue"""
+        with self._cond:
+            self._jobs.extendleft(reversed([job_id for job_id in ids if job_id in self._pending]))
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+
+def parse_address(address: str):
+    """'host:port' for TCP, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def _send(wfile, lock: threading.Lock, message: dict):
+    line = (json.dumps(message) + "\n").encode("utf-8")
+    with lock:
+        wfile.write(line)
+        wfile.flush()
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    """One connection: newline-delimited JSON messages in both directions"""
+
+    def handle(self):
+        jobs = self.server.jobs
+        lock = threading.Lock()
+        submitted = set()  # ids this connection is waiting on
+        taken = set()      # ids this connection is working on
+
+        def reply(job_id):
+            def done(future):
+                submitted.discard(job_id)
+                try:
+                    message = {"op": "result", "id": job_id, "result": future.result()}
+                except Exception as e:
+                    message = {"op": "error", "id": job_id, "error": str(e)}
+                try:
+                    _send(self.wfile, lock, message)
+                except (OSError, ValueError):
+                    pass  # submitter went away
+            return done
+
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                op = message["op"]
+                if op == "submit":
+                    ids = [job_id for job_id, _ in message["jobs"]]
+                    submitted.update(ids)
+                    futures = jobs.submit([payload for _, payload in message["jobs"]], ids)
+                    for job_id, future in zip(ids, futures):
+                        future.add_done_callback(reply(job_id))
+                elif op == "take":
+                    batch = jobs.take(message.get("max", MAX_BATCH), message.get("timeout", TAKE_TIMEOUT),
+                                      message.get("linger", LINGER))
+                    taken.update(job_id for job_id, _ in batch)
+                    _send(self.wfile, lock, {"op": "jobs", "jobs": batch})
+                elif op == "complete":
+                    taken.difference_update(job_id for job_id, _ in message["results"])
+                    jobs.complete(message["results"])
+                elif op == "fail":
+                    taken.difference_update(message["ids"])
+                    jobs.fail(message["ids"], message["error"])
+                elif op == "discard":
+                    jobs.discard(message["ids"])
+        except (OSError, ValueError):
+            pass
+        finally:
+            # A dead worker's jobs go back on the queue; a dead front end's are dropped
+            jobs.requeue(list(taken))
+            jobs.discard(list(submitted))
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class QueueBroker:
+    """Serves a LocalQueue to front ends and workers over a local socket"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        family, bind = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(bind):
+            os.unlink(bind)  # stale socket from a previous broker
+        server_class = _UnixServer if family == socket.AF_UNIX else _TCPServer
+        self.server = server_class(bind, _BrokerHandler)
+        self.server.jobs = LocalQueue()
+        self.address = address if family == socket.AF_UNIX else "%s:%d" % self.server.server_address[:2]
+
+    @property
+    def jobs(self) -> LocalQueue:
+        return self.server.jobs
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SocketQueue:
+    """The LocalQueue interface, backed by a QueueBroker"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        family, target = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(target)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._rfile = self.sock.makefile("rb")
+        self._wfile = self.sock.makefile("wb")
+        self._lock = threading.Lock()
+        self._take_lock = threading.Lock()  # one take in flight per connection
+        self._pending = {}
+        self._batches = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        try:
+            for line in self._rfile:
+                message = json.loads(line)
+                if message["op"] == "jobs":
+                    self._batches.put([tuple(job) for job in message["jobs"]])
+                    continue
+                future = self._pending.pop(message["id"], None)
+                if future is None:
+                    continue
+                if message["op"] == "result":
+                    future.set_result(message["result"])
+                else:
+                    future.set_exception(RuntimeError(message["error"]))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._batches.put(None)
+            for future in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(ConnectionError("queue broker connection closed"))
+
+    def _send(self, message: dict):
+        _send(self._wfile, self._lock, message)
+
+    def submit(self, payloads: list) -> list[Future]:
+        ids = [uuid.uuid4().hex for _ in payloads]
+        futures = [Future() for _ in payloads]
+        for job_id, future in zip(ids, futures):
+            future.job_id = job_id
+        self._pending.update(zip(ids, futures))
+        self._send({"op": "submit", "jobs": list(zip(ids, payloads))})
+        return futures
+
+    def take(self, max_batch: int = MAX_BATCH, timeout: float = TAKE_TIMEOUT,
+             linger: float = LINGER) -> list[tuple[str, dict]]:
+        with self._take_lock:
+            self._send({"op": "take", "max": max_batch, "timeout": timeout, "linger": linger})
+            batch = self._batches.get()
+        if batch is None:
+            raise ConnectionError("queue broker connection closed")
+        return batch
+
+    def complete(self, results: list[tuple[str, dict]]):
+        self._send({"op": "complete", "results": results})
+
+    def fail(self, ids: list[str], error: str):
+        self._send({"op": "fail", "ids": ids, "error": error})
+
+    def discard(self, ids: list[str]):
+        self._send({"op": "discard", "ids": ids})
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def connect(address: Optional[str] = None):
+    """A SocketQueue for address, or a fresh LocalQueue when there is none"""
+    return SocketQueue(address) if address else LocalQueue()
+
+
+class GateFrontend:
+    """Classify by enqueueing; holds no model"""
+
+    def __init__(self, jobs, timeout: float = REQUEST_TIMEOUT):
+        self.jobs = jobs
+        self.timeout = timeout
+
+    def classify_many(self, texts: list[str], timeout: Optional[float] = None,
+                      embedding: Optional[str] = None) -> list[dict]:
+        """
+        One result dict (decision, confidence, score, threshold, model_version)
+        per text; score is the raw persist score. Workers started with
+        --cascade add route ("tfidf" or "neural"). With
+        embedding set to a dtype name, results also carry the text's embedding
+        in embedding_wire form.
+        """
+        extra = {"embedding": embedding} if embedding else {}
+        futures = self.jobs.submit([{"text": text, **extra} for text in texts])
+        with tracing.span("queue.wait", texts=len(texts)):
+            done, not_done = wait(futures, self.timeout if timeout is None else timeout)
+        if not_done:
+            self.jobs.discard([future.job_id for future in not_done])
+            raise TimeoutError(f"{len(not_done)} of {len(texts)} texts not classified in time")
+        return [future.result() for future in futures]
+
+    def classify(self, text: str, timeout: Optional[float] = None, embedding: Optional[str] = None) -> dict:
+        return self.classify_many([text], timeout, embedding)[0]
+
+
+class GateWorker:
+    """Pulls batches off a queue and answers them with one encoder pass each"""
+
+    def __init__(self, jobs, gate=None, max_batch: int = MAX_BATCH, linger: float = LINGER):
+        if gate is None:
+            from classifier_gate import ClassifierGate
+            gate = ClassifierGate()
+        self.jobs = jobs
+        self.gate = gate
+        self.max_batch = max_batch
+        self.linger = linger
+        self.version = None
+        self._stop = threading.Event()
+
+    def model_version(self) -> Optional[str]:
+        if self.version is None and hasattr(self.gate, "model_path"):
+            from threshold_sweep import classifier_version
+            self.gate.head  # trains and saves the artifact when there is none
+            self.version = classifier_version(self.gate.model_path)
+        return self.version
+
+    def handle(self, jobs: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        texts = [payload["text"] for _, payload in jobs]
+        cascade = getattr(self.gate, "cascade", None)
+        with tracing.span("worker.batch", texts=len(texts)):
+            # With a cascade, TF-IDF shortcuts score 0.0 / 1.0 and skip the
+            # encoder unless the caller asked for the embedding
+            shortcut = np.zeros(len(texts), dtype=bool)
+            scores = np.zeros(len(texts))
+            if cascade is not None:
+                flush, persist = cascade.shortcuts(texts)
+                shortcut = flush | persist
+                scores[persist] = 1.0
+            encode = ~shortcut | np.array([bool(p.get("embedding")) for _, p in jobs])
+            embeddings = [None] * len(texts)
+            if encode.any():
+                encoded = self.gate.encoder.encode_bulk([t for t, e in zip(texts, encode) if e])
+                for i, vector in zip(np.flatnonzero(encode), encoded):
+                    embeddings[i] = vector
+            if not shortcut.all():
+                with tracing.span("classify"):
+                    scores[~shortcut] = self.gate.score_embeddings(
+                        np.asarray([v for v, s in zip(embeddings, shortcut) if not s]))
+            keep = self.gate.persists(scores)
+        version = self.model_version()
+        results = []
+        for (job_id, payload), vector, score, persist, short in zip(jobs, embeddings, scores, keep, shortcut):
+            result = {
+                "decision": "PERSIST" if persist else "FLUSH",
+                "confidence": float(max(score, 1 - score)),
+                "score": float(score),
+                "threshold": float(self.gate.threshold),
+                "model_version": version,
+            }
+            if cascade is not None:
+                result["route"] = "tfidf" if short else "neural"
+            if payload.get("embedding"):
+                result.update(response_fields(vector, payload["embedding"]))
+            results.append((job_id, result))
+        return results
+
+    def run(self):
+        self.model_version()  # load before the first job, not during it
+        while not self._stop.is_set():
+            try:
+                batch = self.jobs.take(self.max_batch, TAKE_TIMEOUT, self.linger)
+            except ConnectionError:
+                break
+            if not batch:
+                continue
+            try:
+                results = self.handle(batch)
+            except Exception as e:
+                self.jobs.fail([job_id for job_id, _ in batch], f"{type(e).__name__}: {e}")
+                continue
+            self.jobs.complete(results)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_workers(jobs, count: int = 1, gate=None, max_batch: int = MAX_BATCH) -> list[GateWorker]:
+    """count worker threads in this process, sharing one gate (and so one model)"""
+    if gate is None:
+        from classifier_gate import ClassifierGate
+        gate = ClassifierGate()
+    workers = [GateWorker(jobs, gate, max_batch) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Queue broker and gate inference workers")
+    parser.add_argument("role", choices=["broker", "worker"])
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or a Unix socket path")
+    parser.add_argument("--threads", type=int, default=1, help="worker threads sharing one model")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--cascade", action="store_true", help="TF-IDF shortcuts before the encoder")
+    args = parser.parse_args()
+
+    tracing.configure_from_env()
+    if args.role == "broker":
+        broker = QueueBroker(args.address)
+        print(f"Queue broker listening on {broker.address}")
+        broker.serve_forever()
+    else:
+        connections = [SocketQueue(args.address) for _ in range(args.threads)]
+        from classifier_gate import ClassifierGate
+        workers = [GateWorker(connections[0], ClassifierGate(cascade=args.cascade), args.max_batch)]
+        workers += [GateWorker(c, workers[0].gate, args.max_batch) for c in connections[1:]]
+        print(f"{len(workers)} gate worker(s) pulling from {args.address}")
+        threads = [w.start() for w in workers]
+        for thread in threads:
+            thread.join()
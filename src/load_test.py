@@ -0,0 +1,293 @@
+"""
+Two-Room Memory Architecture - Load Test
+Drive the classify server at stepped load and check it against an SLO
+
+Two kinds of step:
+
+    closed loop   N workers, each sending its next request when the last returns
+    open loop     Poisson arrivals at R requests/s, whatever the server does;
+                  latency is measured from the scheduled arrival, so queueing
+                  behind a slow server is counted rather than hidden
+
+Messages follow the paper's real-world distribution (section 5): 95% obviously
+trivial and 4% obviously meaningful from MASSIVE_TEST_CASES, 1% adversarial
+edge cases from STRESS_TEST_CASES.
+
+Pass --workload to replay a file from workload.py instead, in its order
+(looping at the end); the user field is sent along with each message.
+
+By default a local server.py is started on --port and stopped afterwards; pass
+--url to target one that is already running. The run exits non-zero when a step
+breaks the SLO, or regresses against a --baseline saved with --save.
+
+Run with: python load_test.py --concurrency 1,4,16 --rates 20,50,100
+"""
+
+import numpy as np
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+SERVER_PATH = Path(__file__).parent.parent / "server.py"
+DEFAULT_PORT = 5055
+STEP_SECONDS = 10.0
+REQUEST_TIMEOUT = 10.0
+MAX_IN_FLIGHT = 256    # open-loop client threads
+STARTUP_TIMEOUT = 300.0
+
+MIX = {"trivial": 0.95, "meaningful": 0.04, "adversarial": 0.01}
+
+SLO_P99_MS = 250.0
+SLO_ERROR_RATE = 0.01
+MAX_REGRESSION = 0.20  # allowed relative p99 increase / throughput drop vs baseline
+
+
+def message_pools() -> dict:
+    from massive_stress_test import MASSIVE_TEST_CASES
+    from stress_test import STRESS_TEST_CASES
+    return {
+        "trivial": [t for t, label in MASSIVE_TEST_CASES if label == "flush"],
+        "meaningful": [t for t, label in MASSIVE_TEST_CASES if label == "persist"],
+        "adversarial": [t for t, _ in STRESS_TEST_CASES],
+    }
+
+
+class MessageMix:
+    def __init__(self, seed: int = 0, mix: dict = MIX):
+        self.pools = message_pools()
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            return self.rng.choice(self.pools[kind])
+
+
+class WorkloadMix:
+    """Messages replayed from a workload.py file, streamed and looped"""
+
+    def __init__(self, path: Path):
+        from workload import read_workload
+        self.path = path
+        self._read = read_workload
+        self._records = read_workload(path)
+        self._lock = threading.Lock()
+
+    def next(self) -> dict:
+        with self._lock:
+            record = next(self._records, None)
+            if record is None:
+                self._records = self._read(self.path)
+                record = next(self._records)
+        return {"text": record["text"], "user": record["user"]}
+
+
+def post_classify(url: str, text, timeout: float = REQUEST_TIMEOUT) -> bool:
+    """text is a message, or a request body dict"""
+    body = text if isinstance(text, dict) else {"text": text}
+    request = urllib.request.Request(f"{url}/classify", data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            json.loads(response.read())
+            return response.status == 200
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def summarize(name: str, latencies: list, errors: int, elapsed: float) -> dict:
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    total = len(latencies) + errors
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99]) if len(ms) else (np.nan,) * 3
+    return {
+        "step": name,
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()) if len(ms) else float("nan"),
+    }
+
+
+def closed_loop(url: str, mix: MessageMix, concurrency: int, seconds: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker():
+        while time.perf_counter() < stop:
+            text = mix.next()
+            start = time.perf_counter()
+            ok = post_classify(url, text)
+            took = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(took)
+                else:
+                    errors[0] += 1
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(f"closed c={concurrency}", latencies, errors[0], time.perf_counter() - began)
+
+
+def open_loop(url: str, mix: MessageMix, rate: float, seconds: float, seed: int = 0,
+              max_in_flight: int = MAX_IN_FLIGHT) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    rng = np.random.default_rng(seed)
+    # Poisson process: exponential gaps, scheduled up front
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=int(rate * seconds * 1.5) + 10))
+    arrivals = arrivals[arrivals < seconds]
+
+    def send(scheduled: float, text: str):
+        ok = post_classify(url, text)
+        took = time.perf_counter() - scheduled
+        with lock:
+            if ok:
+                latencies.append(took)
+            else:
+                errors[0] += 1
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for offset in arrivals:
+            scheduled = began + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, scheduled, mix.next())
+    return summarize(f"open r={rate:g}/s", latencies, errors[0], time.perf_counter() - began)
+
+
+def check_slo(results: list, p99_ms: float = SLO_P99_MS, error_rate: float = SLO_ERROR_RATE,
+              baseline: Optional[list] = None, max_regression: float = MAX_REGRESSION) -> list:
+    """Human-readable violations; empty when the run passes"""
+    violations = []
+    previous = {r["step"]: r for r in baseline or []}
+    for r in results:
+        if not r["p99_ms"] <= p99_ms:
+            violations.append(f"{r['step']}: p99 {r['p99_ms']:.1f} ms > {p99_ms:.1f} ms")
+        if r["error_rate"] > error_rate:
+            violations.append(f"{r['step']}: error rate {r['error_rate']:.2%} > {error_rate:.2%}")
+        old = previous.get(r["step"])
+        if old is None:
+            continue
+        if r["p99_ms"] > old["p99_ms"] * (1 + max_regression):
+            violations.append(f"{r['step']}: p99 regressed {old['p99_ms']:.1f} -> {r['p99_ms']:.1f} ms")
+        if r["throughput"] < old["throughput"] * (1 - max_regression):
+            violations.append(f"{r['step']}: throughput regressed "
+                              f"{old['throughput']:.1f} -> {r['throughput']:.1f} req/s")
+    return violations
+
+
+def wait_for_health(url: str, timeout: float = STARTUP_TIMEOUT, process=None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode} before becoming healthy")
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not healthy after {timeout:.0f}s")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {**os.environ, "PORT": str(port)}
+    return subprocess.Popen([sys.executable, str(SERVER_PATH)], cwd=SERVER_PATH.parent, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def print_report(results: list, violations: list):
+    print("=" * 70)
+    print("LOAD TEST: /classify")
+    print("=" * 70)
+    print(f"{'step':<16}{'reqs':>7}{'err%':>7}{'req/s':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for r in results:
+        print(f"{r['step']:<16}{r['requests']:>7}{r['error_rate']:>7.1%}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}")
+    print("(latencies in ms)")
+    if violations:
+        print("\nSLO FAILED:")
+        for v in violations:
+            print(f"  - {v}")
+    else:
+        print("\nSLO passed")
+
+
+def run_load_test(concurrency: list, rates: list, seconds: float = STEP_SECONDS,
+                  url: Optional[str] = None, port: int = DEFAULT_PORT, seed: int = 0,
+                  p99_ms: float = SLO_P99_MS, error_rate: float = SLO_ERROR_RATE,
+                  baseline_path: Optional[Path] = None, save_path: Optional[Path] = None,
+                  max_regression: float = MAX_REGRESSION, workload: Optional[Path] = None) -> bool:
+    process = None
+    if url is None:
+        url = f"http://127.0.0.1:{port}"
+        process = start_server(port)
+    try:
+        wait_for_health(url, process=process)
+        mix = WorkloadMix(workload) if workload else MessageMix(seed)
+        post_classify(url, mix.next())  # warm up
+        results = [closed_loop(url, mix, c, seconds) for c in concurrency]
+        results += [open_loop(url, mix, r, seconds, seed) for r in rates]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    baseline = json.loads(Path(baseline_path).read_text()) if baseline_path else None
+    violations = check_slo(results, p99_ms, error_rate, baseline, max_regression)
+    print_report(results, violations)
+    if save_path:
+        Path(save_path).write_text(json.dumps(results, indent=2))
+    return not violations
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def numbers(text: str) -> list:
+        return [float(x) for x in text.split(",") if x]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--concurrency", type=numbers, default=[1, 4, 16], help="closed-loop steps, e.g. 1,4,16")
+    parser.add_argument("--rates", type=numbers, default=[], help="open-loop steps in req/s, e.g. 20,50")
+    parser.add_argument("--seconds", type=float, default=STEP_SECONDS, help="duration of each step")
+    parser.add_argument("--url", default=None, help="use a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo-p99-ms", type=float, default=SLO_P99_MS)
+    parser.add_argument("--slo-error-rate", type=float, default=SLO_ERROR_RATE)
+    parser.add_argument("--baseline", type=Path, default=None, help="results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    parser.add_argument("--save", type=Path, default=None, help="write this run's results JSON")
+    parser.add_argument("--workload", type=Path, default=None, help="replay a workload.py file")
+    args = parser.parse_args()
+
+    passed = run_load_test([int(c) for c in args.concurrency], args.rates, args.seconds, args.url,
+                           args.port, args.seed, args.slo_p99_ms, args.slo_error_rate,
+                           args.baseline, args.save, args.max_regression, args.workload)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,161 @@
+"""
+Two-Room Memory Architecture - Long-Input Gating
+Gate long messages sentence by sentence instead of truncating them
+
+MiniLM reads at most max_seq_length tokens, so a disclosure at the end of a
+long post is never seen by the gate. In long-input mode a message is split
+into sentences (sentences that are themselves too long become overlapping
+word windows), every chunk of every message goes through the encoder in one
+length-bucketed call, and chunk decisions are folded back per message:
+
+    decision   PERSIST if any chunk persists
+    score      the score of the chunk leaning furthest toward persist
+    trigger    for a persist, that chunk, as character offsets into the
+               message
+    embedding  mean of the message's chunk embeddings
+
+Messages short enough to encode whole are a single chunk, so they get exactly
+the decision the normal path gives.
+
+Run with: python long_input.py
+"""
+
+import numpy as np
+import re
+
+import tracing
+
+MAX_CHUNK_TOKENS = 128  # MiniLM was trained on 128-token inputs
+OVERLAP_WORDS = 16      # shared by consecutive windows of an over-long sentence
+TOKENS_PER_WORD = 1.5   # WordPiece averages ~1.3 per English word; punctuation adds more
+
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|\n|$)")
+_WORD = re.compile(r"\S+")
+
+
+def _estimated_tokens(words: int) -> int:
+    return int(words * TOKENS_PER_WORD) + 2
+
+
+def _window_spans(text: str, start: int, end: int, max_words: int, overlap: int) -> list[tuple[int, int]]:
+    words = [(m.start() + start, m.end() + start) for m in _WORD.finditer(text, start, end)]
+    step = max(1, max_words - overlap)
+    spans = []
+    for i in range(0, len(words), step):
+        window = words[i:i + max_words]
+        spans.append((window[0][0], window[-1][1]))
+        if i + max_words >= len(words):
+            break
+    return spans
+
+
+def chunk_spans(text: str, max_tokens: int = MAX_CHUNK_TOKENS,
+                overlap: int = OVERLAP_WORDS) -> list[tuple[int, int]]:
+    """(start, end) character spans covering text, each within max_tokens"""
+    if _estimated_tokens(len(_WORD.findall(text))) <= max_tokens:
+        return [(0, len(text))]
+    max_words = max(1, int((max_tokens - 2) / TOKENS_PER_WORD))
+    spans = []
+    for m in _SENTENCE.finditer(text):
+        start, end = m.span()
+        words = len(_WORD.findall(text, start, end))
+        if words == 0:
+            continue
+        # trim surrounding whitespace so spans quote cleanly
+        start += len(m.group()) - len(m.group().lstrip())
+        end -= len(m.group()) - len(m.group().rstrip())
+        if _estimated_tokens(words) <= max_tokens:
+            spans.append((start, end))
+        else:
+            spans.extend(_window_spans(text, start, end, max_words, overlap))
+    return spans or [(0, len(text))]
+
+
+def chunk_messages(texts: list[str], max_tokens: int = MAX_CHUNK_TOKENS) -> tuple[list[str], list, np.ndarray]:
+    """All chunks of all texts, their spans, and the index of the text each came from"""
+    chunks, spans, owners = [], [], []
+    for i, text in enumerate(texts):
+        for start, end in chunk_spans(text, max_tokens):
+            chunks.append(text[start:end])
+            spans.append((start, end))
+            owners.append(i)
+    return chunks, spans, np.asarray(owners, dtype=np.int64)
+
+
+def aggregate(texts: list[str], spans: list, owners: np.ndarray, persists: np.ndarray,
+              scores: np.ndarray, margins: np.ndarray) -> list[dict]:
+    """
+    Fold chunk decisions into one result per text. margins says how far past
+    the threshold each chunk is, in the persist direction.
+    """
+    results = []
+    bounds = np.searchsorted(owners, np.arange(len(texts) + 1))
+    for i, text in enumerate(texts):
+        lo, hi = bounds[i], bounds[i + 1]
+        j = lo + int(np.argmax(margins[lo:hi]))
+        trigger = None
+        if persists[j]:
+            start, end = spans[j]
+            trigger = {"start": start, "end": end, "text": text[start:end], "score": float(scores[j])}
+        results.append({
+            "decision": "PERSIST" if persists[j] else "FLUSH",
+            "score": float(scores[j]),
+            "chunks": int(hi - lo),
+            "trigger": trigger,
+        })
+    return results
+
+
+def mean_by_owner(embeddings: np.ndarray, owners: np.ndarray, n: int) -> np.ndarray:
+    """One mean chunk embedding per text (owners is sorted, every text has a chunk)"""
+    counts = np.bincount(owners, minlength=n)
+    means = np.add.reduceat(embeddings, np.searchsorted(owners, np.arange(n)), axis=0)
+    return (means / counts[:, None]).astype(embeddings.dtype)
+
+
+def gate_long(gate, texts: list[str], threshold=None,
+              max_tokens: int = MAX_CHUNK_TOKENS) -> tuple[list[dict], np.ndarray]:
+    """
+    Long-input decisions for texts from one encoder call, plus one mean
+    chunk embedding per text. Works with any Gate.
+    """
+    chunks, spans, owners = chunk_messages(texts, max_tokens)
+    with tracing.span("encode_chunks", texts=len(texts), chunks=len(chunks)):
+        embeddings = np.asarray(gate.encoder.encode_bulk(chunks))
+    scores = np.asarray(gate.score_embeddings(embeddings))
+    persists = gate.persists(scores, threshold)
+    threshold = gate.threshold if threshold is None else threshold
+    # signed distance past the threshold, positive in whichever direction means persist
+    margins = np.where(persists, 1, -1) * np.abs(scores - threshold)
+
+    return aggregate(texts, spans, owners, persists, scores, margins), mean_by_owner(embeddings, owners, len(texts))
+
+
+def long_post(seed: int = 0, sentences: int = 60) -> str:
+    """Small talk with one disclosure buried past the encoder's window"""
+    import random
+    import massive_stress_test as m
+
+    rng = random.Random(seed)
+    filler = [s.rstrip(".!?") + "." for s in rng.sample(m.trivial_encyclopedic + m.trivial_weather, sentences)]
+    disclosure = rng.choice(m.meaningful_family).rstrip(".!?") + "."
+    return " ".join(filler + [disclosure])
+
+
+if __name__ == "__main__":
+    from classifier_gate import GATE
+
+    posts = [long_post(seed) for seed in range(5)]
+    whole = GATE.persists(GATE.score_embeddings(GATE.encode(posts)))
+    results, _ = gate_long(GATE, posts)
+
+    print("=" * 70)
+    print("LONG-INPUT GATING: disclosure after 60 small-talk sentences")
+    print("=" * 70)
+    for post, truncated, result in zip(posts, whole, results):
+        print(f"\nwhole message: {'PERSIST' if truncated else 'FLUSH':<8} "
+              f"chunked: {result['decision']:<8} ({result['chunks']} chunks, "
+              f"~{_estimated_tokens(len(post.split()))} tokens)")
+        if result["trigger"]:
+            t = result["trigger"]
+            print(f"  trigger [{t['start']}:{t['end']}] {t['score']:.2f}: {t['text']}")
@@ -6,16 +6,11 @@ Requires: pip install sentence-transformers
 """
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import json
+import logging
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
 
-# Initialize model (lightweight, fast, ~90MB)
-print("Loading embedding model...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model loaded.")
+from gate import Gate
 
 # Triviality archetype - canonical examples of non-relational exchanges
 TRIVIAL_EXAMPLES = [
@@ -55,77 +50,109 @@ TRIVIAL_EXAMPLES = [
     "What's trending today",
 ]
 
-# Build triviality archetype (centroid of trivial cluster)
-print("Building triviality archetype...")
-trivial_embeddings = model.encode(TRIVIAL_EXAMPLES)
-A_t = np.mean(trivial_embeddings, axis=0)
-print(f"Archetype built from {len(TRIVIAL_EXAMPLES)} examples")
+logger = logging.getLogger(__name__)
 
 # Room 2 storage path
 ROOM2_PATH = Path(__file__).parent / "room2.json"
 
+TRIVIALITY_THRESHOLD = 0.72
+
+
+class TrivialityGate(Gate):
+    """Cosine similarity to the triviality archetype A_t; persist when below threshold"""
+
+    def build_head(self) -> np.ndarray:
+        """A_t: centroid of the trivial cluster"""
+        A_t = np.mean(self.encode(TRIVIAL_EXAMPLES), axis=0)
+        logger.info("Archetype built from %d examples", len(TRIVIAL_EXAMPLES))
+        return A_t
+
+    def default_threshold(self) -> float:
+        return TRIVIALITY_THRESHOLD
+
+    def score_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """Triviality score (lower = more likely to persist)"""
+        A_t = self.head
+        embeddings = np.atleast_2d(embeddings)
+        return embeddings @ A_t / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(A_t))
+
+    def persists(self, scores: np.ndarray, threshold: Optional[float] = None) -> np.ndarray:
+        return np.asarray(scores) < (self.threshold if threshold is None else threshold)
+
+    def triviality_score(self, exchange: str) -> float:
+        """Compute cosine similarity between exchange and triviality archetype"""
+        return float(self.score_embeddings(self.encode(exchange))[0])
+
+    def process_exchange(self, exchange: str, threshold: Optional[float] = None, auto_persist: bool = True) -> dict:
+        """
+        Main gate function: evaluate exchange and route accordingly
+        Returns decision info for logging/debugging
+        """
+        threshold = self.threshold if threshold is None else threshold
+        score = self.triviality_score(exchange)
+        persist_decision = score < threshold
+
+        result = {
+            "exchange": exchange,
+            "score": round(score, 4),
+            "threshold": threshold,
+            "decision": "PERSIST" if persist_decision else "FLUSH"
+        }
+
+        if persist_decision and auto_persist:
+            self.persist(exchange)
+            result["persisted"] = True
+
+        return result
+
+
+# Process-wide default gate; the functions below are thin wrappers around it
+GATE = TrivialityGate(path=ROOM2_PATH)
+
+# Built on first access rather than at import
+_LAZY = {
+    "model": lambda: GATE.encoder.model,
+    "A_t": lambda: GATE.head,
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def triviality_score(exchange: str) -> float:
     """Compute cosine similarity between exchange and triviality archetype"""
-    embedding = model.encode(exchange)
-    similarity = np.dot(embedding, A_t) / (np.linalg.norm(embedding) * np.linalg.norm(A_t))
-    return float(similarity)
+    return GATE.triviality_score(exchange)
 
 
-def should_persist(exchange: str, threshold: float = 0.72) -> bool:
+def should_persist(exchange: str, threshold: float = TRIVIALITY_THRESHOLD) -> bool:
     """Gate decision: persist to Room 2 if NOT trivial"""
-    return triviality_score(exchange) < threshold
+    return GATE.should_persist(exchange, threshold)
 
 
 def persist(exchange: str, category: Optional[str] = None, metadata: Optional[dict] = None):
     """Write exchange to Room 2 (JSON store)"""
-    room2 = json.loads(ROOM2_PATH.read_text()) if ROOM2_PATH.exists() else []
-    
-    entry = {
-        "text": exchange,
-        "timestamp": datetime.now().isoformat(),
-        "category": category,
-        **(metadata or {})
-    }
-    
-    room2.append(entry)
-    ROOM2_PATH.write_text(json.dumps(room2, indent=2))
-    return entry
+    return GATE.persist(exchange, category, metadata)
 
 
-def process_exchange(exchange: str, threshold: float = 0.72, auto_persist: bool = True) -> dict:
+def process_exchange(exchange: str, threshold: float = TRIVIALITY_THRESHOLD, auto_persist: bool = True) -> dict:
     """
     Main gate function: evaluate exchange and route accordingly
     Returns decision info for logging/debugging
     """
-    score = triviality_score(exchange)
-    persist_decision = score < threshold
-    
-    result = {
-        "exchange": exchange,
-        "score": round(score, 4),
-        "threshold": threshold,
-        "decision": "PERSIST" if persist_decision else "FLUSH"
-    }
-    
-    if persist_decision and auto_persist:
-        persist(exchange)
-        result["persisted"] = True
-    
-    return result
+    return GATE.process_exchange(exchange, threshold, auto_persist)
 
 
 def get_room2_contents() -> list:
     """Retrieve all Room 2 entries"""
-    if ROOM2_PATH.exists():
-        return json.loads(ROOM2_PATH.read_text())
-    return []
+    return GATE.get_room2_contents()
 
 
 def clear_room2():
     """Reset Room 2 (for testing)"""
-    if ROOM2_PATH.exists():
-        ROOM2_PATH.unlink()
+    GATE.clear_room2()
 
 
 # Quick test
@@ -0,0 +1,168 @@
+"""
+Two-Room Memory Architecture - Room 1 Sessions
+Per-conversation working memory under a token budget
+
+Each session holds the turns its next LLM call should carry. Every turn is
+gated on arrival: PERSIST turns are promoted to Room 2 immediately, so when
+the buffer is over budget nothing is lost by evicting. FLUSH turns go
+first, oldest first; PERSIST turns (already safe in Room 2) go next.
+Eviction is O(1) per turn, and the session table is an LRU with a cap, so
+memory per node is bounded by max_sessions x token_budget: a turn longer
+than the whole budget is cut to it.
+
+By default turns are gated and promoted by classifier_gate in one encoder
+pass, through its dedup-aware persist, with the user and session recorded
+on the entry. The server's /session/turn gates itself and records turns
+with add().
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+DEFAULT_TOKEN_BUDGET = 2048
+DEFAULT_MAX_SESSIONS = 50000
+DEFAULT_IDLE_TTL = 3600.0  # seconds
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """LLM token estimate (~4 characters per token for English)"""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+class Turn:
+    __slots__ = ("seq", "text", "decision", "confidence", "tokens")
+
+    def __init__(self, seq: int, text: str, decision: str, confidence: float, tokens: int):
+        self.seq = seq
+        self.text = text
+        self.decision = decision
+        self.confidence = confidence
+        self.tokens = tokens
+
+
+class SessionBuffer:
+    """One conversation's Room 1 context"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.tokens = 0
+        self.turns = {}  # seq -> Turn, in arrival order
+        self._queues = {"FLUSH": deque(), "PERSIST": deque()}
+        self._next_seq = 0
+        self.last_seen = time.monotonic()
+
+    def add(self, text: str, decision: str, confidence: float, tokens: Optional[int] = None) -> list[Turn]:
+        """Append a gated turn, evict to fit the budget, return evicted turns"""
+        tokens = tokens if tokens is not None else estimate_tokens(text)
+        if tokens > self.token_budget:
+            # Keep the start of an oversized turn; the rest can't fit in any context
+            text = text[:self.token_budget * CHARS_PER_TOKEN]
+            tokens = self.token_budget
+        turn = Turn(self._next_seq, text, decision, confidence, tokens)
+        self._next_seq += 1
+        self.turns[turn.seq] = turn
+        self.tokens += turn.tokens
+        self.last_seen = time.monotonic()
+
+        # The new turn joins its queue only after eviction, so it is never
+        # evicted itself; it is at most the whole budget
+        evicted = []
+        flush, persist = self._queues["FLUSH"], self._queues["PERSIST"]
+        while self.tokens > self.token_budget and (flush or persist):
+            old = self.turns.pop((flush or persist).popleft())
+            self.tokens -= old.tokens
+            evicted.append(old)
+        self._queues[decision].append(turn.seq)
+        return evicted
+
+    def context(self) -> list[str]:
+        """Turns the next LLM call should carry, oldest first"""
+        return [turn.text for turn in self.turns.values()]
+
+
+class SessionStore:
+    """Bounded table of live sessions with LRU and idle-time expiry"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 idle_ttl: float = DEFAULT_IDLE_TTL, gate: Optional[Callable] = None,
+                 promote: Optional[Callable] = None):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._gate = gate
+        self._promote = promote
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _default_turn(self, session_id: str, text: str, user: Optional[str]) -> tuple[str, float]:
+        """Gate and promote in one pass through classifier_gate"""
+        from classifier_gate import process_exchange
+        result = process_exchange(text, user=user, metadata={"session": session_id})
+        return result["decision"], result["confidence"]
+
+    def _default_promote(self, session_id: str, text: str, confidence: float, user: Optional[str] = None):
+        from categories import categorize
+        from classifier_gate import GATE
+        category = categorize(text)
+        metadata = {**({"user": user} if user else {}), "session": session_id,
+                    "confidence": round(confidence, 3), **GATE.volatility.assign(user, category)}
+        GATE.promote(text, category, metadata)
+
+    def get(self, session_id: str) -> SessionBuffer:
+        """Session buffer, created on first use; expires idle sessions and enforces the cap"""
+        with self._lock:
+            now = time.monotonic()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SessionBuffer(self.token_budget)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            # Oldest first; the requested session is now last, so it survives
+            while len(self._sessions) > 1:
+                oldest = next(iter(self._sessions.values()))
+                if len(self._sessions) <= self.max_sessions and now - oldest.last_seen < self.idle_ttl:
+                    break
+                self._sessions.popitem(last=False)
+            return session
+
+    def end(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def turn(self, session_id: str, text: str, user: Optional[str] = None) -> dict:
+        """Gate a user turn, promote it if PERSIST, return the context to send"""
+        if self._gate is None:
+            decision, confidence = self._default_turn(session_id, text, user)
+        else:
+            decision, confidence = self._gate(text)
+            if decision == "PERSIST":
+                if self._promote:
+                    self._promote(session_id, text, confidence)
+                else:
+                    self._default_promote(session_id, text, confidence, user)
+        return self.add(session_id, text, decision, confidence)
+
+    def add(self, session_id: str, text: str, decision: str, confidence: float) -> dict:
+        """Record a turn that is already gated (and promoted), return the context to send"""
+        session = self.get(session_id)
+        with self._lock:
+            evicted = session.add(text, decision, confidence)
+            context = session.context()
+            tokens = session.tokens
+        return {
+            "session": session_id,
+            "decision": decision,
+            "confidence": round(float(confidence), 3),
+            "context": context,
+            "context_tokens": tokens,
+            "evicted": len(evicted),
+        }
@@ -0,0 +1,333 @@
+"""
+Two-Room Memory Architecture - Room 2 Binary Codec
+Compact, tier-aware block encoding for Room 2 records
+
+Records are grouped into blocks. Each block is stored column by column and
+zlib-compressed:
+
+    strings    every distinct text / user / extras string once (interned)
+    flags      u8 per record: tier 1 bit, has id, has user
+    category   u8 code per record (index into CATEGORIES, 255 = none)
+    text       u32 string ref per record
+    user       u32 string ref per record
+    id         8 raw bytes per record (16 hex chars)
+    extras     u32 string ref per record to a JSON object of fields the
+               columns can't hold (see below)
+    -- Tier 2 records only --
+    timestamp  i64 microseconds since 1970-01-01 (naive, as persist writes it)
+    volatility u16 fixed point, 65535 = unset
+
+Tier 1 (immutable) records keep only id, text, category and user: no
+timestamp or other metadata. An id, category or user that doesn't fit its
+column (not 16 hex chars, not in CATEGORIES, not a string) goes to extras
+as is, for either tier; Tier 2 extras also hold every other field. Entries
+without a "tier" field are Tier 2.
+
+File layout: MAGIC, then per block "<II" (compressed length, record count)
+followed by the compressed payload.
+
+Benchmark with: python room2_codec.py [n_records]
+"""
+
+import numpy as np
+import json
+import struct
+import zlib
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator, Optional
+
+from categories import CATEGORIES
+
+MAGIC = b"R2B2"
+BLOCK_SIZE = 512
+COMPRESSION_LEVEL = 6
+
+CATEGORY_CODE = {name: i for i, name in enumerate(CATEGORIES)}
+NO_CATEGORY = 255
+NO_REF = 0xFFFFFFFF
+NO_VOLATILITY = 65535
+
+FLAG_TIER1 = 1
+FLAG_ID = 2
+FLAG_USER = 4
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_HEADER = struct.Struct("<IIII")  # records, tier 2 records, strings, string bytes
+_BLOCK = struct.Struct("<II")     # compressed length, records
+
+# Fields with a dedicated column; other fields go to extras on Tier 2 records
+_COLUMN_FIELDS = {"id", "text", "category", "user", "tier", "timestamp", "volatility"}
+
+
+def _timestamp_micros(value) -> Optional[int]:
+    """Microseconds for an ISO timestamp, or None if it won't round-trip exactly"""
+    if not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != value:
+        return None
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def _id_bytes(value) -> Optional[bytes]:
+    if isinstance(value, str) and len(value) == 16:
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return None
+
+
+class _Strings:
+    def __init__(self):
+        self.index = {}
+
+    def ref(self, value: str) -> int:
+        ref = self.index.get(value)
+        if ref is None:
+            ref = self.index[value] = len(self.index)
+        return ref
+
+
+def encode_block(entries: list) -> bytes:
+    """Column-encode and compress one block of entries"""
+    n = len(entries)
+    strings = _Strings()
+    flags = np.zeros(n, dtype=np.uint8)
+    category = np.full(n, NO_CATEGORY, dtype=np.uint8)
+    text = np.zeros(n, dtype=np.uint32)
+    user = np.full(n, NO_REF, dtype=np.uint32)
+    ids = bytearray(8 * n)
+    timestamps, volatility, extras = [], [], []
+
+    for i, entry in enumerate(entries):
+        tier1 = entry.get("tier") == 1
+        text[i] = strings.ref(entry["text"])
+        code = CATEGORY_CODE.get(entry.get("category"))
+        rest = {k: v for k, v in entry.items() if k not in _COLUMN_FIELDS}
+        if code is not None:
+            category[i] = code
+        elif entry.get("category") is not None:
+            rest["category"] = entry["category"]
+        raw_id = _id_bytes(entry.get("id"))
+        if raw_id is not None:
+            flags[i] |= FLAG_ID
+            ids[8 * i:8 * i + 8] = raw_id
+        elif "id" in entry:
+            rest["id"] = entry["id"]
+        if isinstance(entry.get("user"), str):
+            flags[i] |= FLAG_USER
+            user[i] = strings.ref(entry["user"])
+        elif "user" in entry:
+            rest["user"] = entry["user"]
+
+        if tier1:
+            flags[i] |= FLAG_TIER1
+            # only what the columns could not hold; other metadata is dropped
+            rest = {k: rest[k] for k in ("id", "category", "user") if k in rest}
+            extras.append(strings.ref(json.dumps(rest, separators=(",", ":"))) if rest else NO_REF)
+            continue
+
+        micros = _timestamp_micros(entry.get("timestamp"))
+        if micros is None:
+            micros = np.iinfo(np.int64).min
+            if "timestamp" in entry:
+                rest["timestamp"] = entry["timestamp"]
+        vol = entry.get("volatility")
+        if isinstance(vol, (int, float)) and 0.0 <= vol <= 1.0 and round(vol * 65534) / 65534 == vol:
+            volatility.append(round(vol * 65534))
+        else:
+            volatility.append(NO_VOLATILITY)
+            if vol is not None:
+                rest["volatility"] = vol
+        if "tier" in entry:
+            rest["tier"] = entry["tier"]
+        timestamps.append(micros)
+        extras.append(strings.ref(json.dumps(rest, separators=(",", ":"))) if rest else NO_REF)
+
+    table = list(strings.index)
+    blob = "".join(table).encode("utf-8")
+    payload = b"".join([
+        _HEADER.pack(n, len(timestamps), len(table), len(blob)),
+        np.array([len(s) for s in table], dtype=np.uint32).tobytes(),
+        blob,
+        flags.tobytes(), category.tobytes(), text.tobytes(), user.tobytes(), bytes(ids),
+        np.array(extras, dtype=np.uint32).tobytes(),
+        np.array(timestamps, dtype=np.int64).tobytes(),
+        np.array(volatility, dtype=np.uint16).tobytes(),
+    ])
+    return zlib.compress(payload, COMPRESSION_LEVEL)
+
+
+def decode_block(data: bytes) -> list:
+    payload = zlib.decompress(data)
+    n, m, n_strings, blob_bytes = _HEADER.unpack_from(payload)
+    pos = _HEADER.size
+
+    def take(dtype, count):
+        nonlocal pos
+        array = np.frombuffer(payload, dtype=dtype, count=count, offset=pos)
+        pos += array.nbytes
+        return array
+
+    lengths = take(np.uint32, n_strings).tolist()
+    # String lengths are in characters, so decode the blob once and slice
+    decoded = payload[pos:pos + blob_bytes].decode("utf-8")
+    pos += blob_bytes
+    bounds = [0] + list(accumulate(lengths))
+    table = [decoded[bounds[i]:bounds[i + 1]] for i in range(n_strings)]
+
+    flags = take(np.uint8, n).tolist()
+    category = take(np.uint8, n).tolist()
+    text = take(np.uint32, n).tolist()
+    user = take(np.uint32, n).tolist()
+    ids = payload[pos:pos + 8 * n]
+    pos += 8 * n
+    extras = take(np.uint32, n).tolist()
+    micros = take(np.int64, m)
+    no_timestamp = np.iinfo(np.int64).min
+    # Vectorized isoformat; datetime.isoformat() omits a zero fraction
+    iso = np.datetime_as_string(np.where(micros == no_timestamp, 0, micros).astype("datetime64[us]"))
+    timestamps = np.where(micros % 1000000 == 0, np.char.replace(iso, ".000000", ""), iso).tolist()
+    has_timestamp = (micros != no_timestamp).tolist()
+    volatility = take(np.uint16, m).tolist()
+
+    entries = []
+    j = 0
+    for i in range(n):
+        f = flags[i]
+        entry = {}
+        if f & FLAG_ID:
+            entry["id"] = ids[8 * i:8 * i + 8].hex()
+        entry["text"] = table[text[i]]
+        if not f & FLAG_TIER1:
+            if has_timestamp[j]:
+                entry["timestamp"] = timestamps[j]
+        code = category[i]
+        entry["category"] = CATEGORIES[code] if code != NO_CATEGORY else None
+        if f & FLAG_USER:
+            entry["user"] = table[user[i]]
+        if f & FLAG_TIER1:
+            entry["tier"] = 1
+        else:
+            if volatility[j] != NO_VOLATILITY:
+                entry["volatility"] = volatility[j] / 65534
+            j += 1
+        if extras[i] != NO_REF:
+            entry.update(json.loads(table[extras[i]]))
+        entries.append(entry)
+    return entries
+
+
+def write_blocks(entries: list, path: Path, block_size: int = BLOCK_SIZE):
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for start in range(0, len(entries), block_size):
+            block = entries[start:start + block_size]
+            data = encode_block(block)
+            f.write(_BLOCK.pack(len(data), len(block)))
+            f.write(data)
+
+
+def iter_blocks(path: Path) -> Iterator[tuple[int, int, bytes]]:
+    """(file offset, record count, compressed payload) per block"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Room 2 block file")
+        while True:
+            offset = f.tell()
+            header = f.read(_BLOCK.size)
+            if len(header) < _BLOCK.size:
+                return
+            size, count = _BLOCK.unpack(header)
+            yield offset, count, f.read(size)
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Stream records one block at a time"""
+    for _, _, data in iter_blocks(path):
+        yield from decode_block(data)
+
+
+def read_records(path: Path) -> list:
+    return list(iter_records(path))
+
+
+def synthetic_entries(n: int, seed: int = 0) -> list:
+    """Room 2-shaped records drawn from the massive stress test's meaningful lists"""
+    import random
+    import room2_store
+    import massive_stress_test as m
+
+    rng = random.Random(seed)
+    texts = (m.meaningful_emotional + m.meaningful_family + m.meaningful_identity +
+             m.meaningful_health + m.meaningful_work + m.meaningful_struggles + m.meaningful_goals)
+    start = datetime(2025, 1, 1)
+    entries = []
+    for i in range(n):
+        entry = {
+            "id": room2_store.new_id(),
+            "text": rng.choice(texts),
+            "timestamp": (start + timedelta(seconds=rng.randint(0, 3e7), microseconds=rng.randint(0, 999999))).isoformat(),
+            "category": rng.choice(CATEGORIES),
+            "user": f"user-{rng.randint(0, 50)}",
+        }
+        if rng.random() < 0.3:
+            entry["tier"] = 1
+        else:
+            entry["volatility"] = round(rng.random() * 65534) / 65534
+        entries.append(entry)
+    return entries
+
+
+def _comparable(entry: dict) -> dict:
+    """What the codec promises to keep for an entry"""
+    if entry.get("tier") == 1:
+        return {k: entry.get(k) for k in ("id", "text", "category", "user", "tier") if k in entry or k == "category"}
+    return {**entry, "category": entry.get("category")}
+
+
+def run_benchmark(n: int = 20000):
+    import time
+
+    import room2_store
+
+    entries = room2_store.load_entries()
+    source = "room2.json"
+    if len(entries) < 100:
+        entries = synthetic_entries(n)
+        source = "synthetic"
+
+    json_bytes = json.dumps(entries, indent=2).encode("utf-8")
+    blocks = [encode_block(entries[i:i + BLOCK_SIZE]) for i in range(0, len(entries), BLOCK_SIZE)]
+    binary_size = len(MAGIC) + sum(len(b) + _BLOCK.size for b in blocks)
+
+    start = time.perf_counter()
+    json.loads(json_bytes)
+    json_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [e for b in blocks for e in decode_block(b)]
+    binary_seconds = time.perf_counter() - start
+
+    assert decoded == [_comparable(e) for e in entries], "round-trip mismatch"
+
+    print("=" * 70)
+    print(f"ROOM 2 CODEC: {len(entries)} records ({source})")
+    print("=" * 70)
+    print(f"{'format':<10}{'bytes/memory':>14}{'decode records/s':>20}")
+    print(f"{'json':<10}{len(json_bytes) / len(entries):>14.1f}{len(entries) / json_seconds:>20,.0f}")
+    print(f"{'binary':<10}{binary_size / len(entries):>14.1f}{len(entries) / binary_seconds:>20,.0f}")
+    print(f"\nSize: {len(json_bytes) / binary_size:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
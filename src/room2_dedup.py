@@ -0,0 +1,335 @@
+"""
+Two-Room Memory Architecture - Room 2 Near-Duplicate Suppression
+Merge repeats into the existing memory instead of appending them again
+
+Memories are bucketed by (user, category). Each bucket keeps a contiguous
+matrix of unit-length gate embeddings, so the duplicate check is a single
+matrix-vector product over one user's memories in one category. A hit bumps
+the existing entry's "hits" count and "last_seen" time.
+
+The same bucket matrices serve retrieval (search), so the index also keeps
+the entries it has indexed and catches up when another writer changes the
+store file. Catching up compares the store's offset index (room2_index)
+with the ids and sizes seen last time, then reads and encodes only the
+entries that are new. Entries that changed size are read again to refresh
+their metadata. An entry edited in place to the same size keeps stale
+metadata until it is next merged into or reloaded. Only removals, as when
+maintenance prunes, force a full reindex.
+
+Writes go through room2_store's group commit: the index lock covers only
+the duplicate check, so concurrent persists queue their changes and share
+one store write. The index follows its own writes from stamp to stamp and
+only reindexes when a write included someone else's changes.
+"""
+
+import numpy as np
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import room2_index
+import room2_store
+
+# Cosine similarity at or above which two memories count as the same fact
+DUPLICATE_SIMILARITY = 0.92
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class BucketIndex:
+    """Unit vectors for one (user, category) bucket, grown by doubling"""
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = []
+
+    def add(self, memory_id: str, unit_vector: np.ndarray):
+        n = len(self.ids)
+        if n == len(self.vectors):
+            grown = np.empty((2 * n, self.vectors.shape[1]), dtype=np.float32)
+            grown[:n] = self.vectors
+            self.vectors = grown
+        self.vectors[n] = unit_vector
+        self.ids.append(memory_id)
+
+    def nearest(self, unit_vector: np.ndarray) -> tuple[Optional[str], float]:
+        n = len(self.ids)
+        if n == 0:
+            return None, -1.0
+        similarities = self.vectors[:n] @ unit_vector
+        i = int(np.argmax(similarities))
+        return self.ids[i], float(similarities[i])
+
+    def search(self, unit_vector: np.ndarray, k: int) -> list[tuple[str, float]]:
+        """Top-k (id, similarity), best first"""
+        n = len(self.ids)
+        if n == 0:
+            return []
+        similarities = self.vectors[:n] @ unit_vector
+        if k < n:
+            top = np.argpartition(-similarities, k)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-similarities[top])]
+        return [(self.ids[i], float(similarities[i])) for i in top]
+
+
+class DedupIndex:
+    """Per-bucket vector indexes over the Room 2 store, built lazily"""
+
+    def __init__(self, encode: Callable, path: Path = room2_store.ROOM2_PATH,
+                 threshold: float = DUPLICATE_SIMILARITY, bucket_factory: Callable = BucketIndex):
+        self.encode = encode  # texts -> embeddings, used once to index the existing store
+        self.path = path
+        self.threshold = threshold
+        self.bucket_factory = bucket_factory  # dim -> bucket (e.g. room2_vectors.QuantizedBuckets())
+        self.buckets = {}
+        self.entries = {}  # id -> entry, for everything indexed
+        self._loaded = False
+        self._stamp = None
+        self._chain = {}      # store stamp before -> after each write of ours alone
+        self._unwritten = {}  # id -> (entry, unit vector) queued but not yet in the store
+        # id keys (room2_index id bytes as u64, sorted) and entry sizes as of the last read
+        self._seen_keys = np.zeros(0, dtype=np.uint64)
+        self._seen_lengths = np.zeros(0, dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def _bucket(self, user, category, dim: int) -> BucketIndex:
+        key = (user, category)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = self.bucket_factory(dim)
+        return bucket
+
+    @staticmethod
+    def _stamp_of(stat) -> Optional[tuple]:
+        # every rewrite renames a new file in, so the inode changes even when
+        # a coarse mtime and the size do not
+        return None if stat is None else (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _store_stamp(self) -> Optional[tuple]:
+        try:
+            return self._stamp_of(self.path.stat())
+        except FileNotFoundError:
+            return None
+
+    def _current(self) -> bool:
+        """Whether the store is as of the last load plus our own writes"""
+        stamp = self._stamp
+        while stamp in self._chain:
+            stamp = self._chain.pop(stamp)
+        self._stamp = stamp
+        return stamp == self._store_stamp()
+
+    def _ensure_loaded(self):
+        """(Re)index when first used or when someone else rewrote the store"""
+        if self._loaded and self._current():
+            return
+        with room2_store.locked(self.path):
+            # our own writes record their stamps under this lock
+            if self._loaded and self._current():
+                return
+            if self._loaded and self._catch_up():
+                return
+            if hasattr(self.bucket_factory, "reset"):
+                self.bucket_factory.reset()
+            self.buckets = {}
+            self.entries = {}
+            self._load()
+
+    def _remember(self, rows: np.ndarray):
+        keys = rows["id"].view("<u8")
+        order = np.argsort(keys)
+        self._seen_keys = np.asarray(keys[order])
+        self._seen_lengths = np.asarray(rows["length"][order])
+
+    def _add_entries(self, entries: list):
+        if not entries:
+            return
+        vectors = np.asarray(self.encode([e["text"] for e in entries]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+        for entry, vector in zip(entries, vectors):
+            self._bucket(entry.get("user"), entry.get("category"), len(vector)).add(entry["id"], vector)
+            self.entries[entry["id"]] = entry
+
+    def _catch_up(self) -> bool:
+        """
+        Index what another writer added, from the offset index; call under
+        locked(path). False when entries were removed and a full reload is due.
+        """
+        if not self.path.exists():
+            return False
+        f, rows = room2_store.open_indexed(self.path)
+        with f:
+            keys = rows["id"].view("<u8")
+            if not np.isin(self._seen_keys, keys).all():
+                return False
+            lengths = rows["length"]
+            at = np.minimum(np.searchsorted(self._seen_keys, keys), max(len(self._seen_keys) - 1, 0))
+            if len(self._seen_keys):
+                changed = (self._seen_keys[at] != keys) | (self._seen_lengths[at] != lengths)
+            else:
+                changed = np.ones(len(keys), dtype=bool)
+            changed &= keys != 0  # ids that aren't 16 hex chars are only picked up by a full reload
+            fresh = [room2_store.read_row(f, rows, int(i)) for i in np.flatnonzero(changed)]
+            stamp = self._stamp_of(os.fstat(f.fileno()))
+            self._remember(rows)
+        new = []
+        for entry in fresh:
+            if entry.get("id") in self.entries:
+                self.entries[entry["id"]] = entry  # metadata edits, or our own writes
+            elif "id" in entry:
+                new.append(entry)
+        self._add_entries(new)
+        self._stamp = stamp
+        self._chain.clear()
+        return True
+
+    def _load(self):
+        with room2_store.locked(self.path):
+            entries = [e for e in room2_store.load_entries(self.path) if "id" in e]
+            self._stamp = self._store_stamp()
+            self._chain.clear()
+            unwritten = list(self._unwritten.items())
+            if self.path.exists():
+                f, rows = room2_store.open_indexed(self.path)
+                f.close()
+                self._remember(rows)
+            else:
+                self._remember(np.zeros(0, dtype=room2_index.INDEX_DTYPE))
+        self._add_entries(entries)
+        # queued by us but not yet written
+        for memory_id, (entry, vector) in unwritten:
+            self._bucket(entry.get("user"), entry.get("category"), len(vector)).add(memory_id, vector)
+            self.entries[memory_id] = entry
+        self._loaded = True
+
+    def _committed(self, request: room2_store.CommitRequest):
+        """Runs in the writing thread, under the store lock, right after the write"""
+        for entry in request.new_entries:
+            self._unwritten.pop(entry["id"], None)
+        before, after = self._stamp_of(request.before), self._stamp_of(request.after)
+        if request.owners == {self} and before != after:
+            self._chain[before] = after
+
+    def _submit(self, new_entries: list, updates: dict) -> room2_store.CommitRequest:
+        return room2_store.submit(new_entries, updates, self.path, owner=self, on_commit=self._committed)
+
+    def _wait(self, request: room2_store.CommitRequest) -> list:
+        try:
+            return request.wait()
+        except BaseException:
+            # the buckets already hold what failed to write
+            with self._lock:
+                self._loaded = False
+            raise
+
+    def reset(self):
+        with self._lock:
+            if hasattr(self.bucket_factory, "reset"):
+                self.bucket_factory.reset()
+            self.buckets = {}
+            self.entries = {}
+            self._loaded = False
+
+    def persist(self, text: str, embedding, category: Optional[str] = None,
+                metadata: Optional[dict] = None) -> tuple[dict, bool]:
+        """
+        Persist text unless its bucket already holds a near-duplicate.
+        Returns (entry, merged). On a merge the existing entry is returned
+        with its hit count bumped.
+        """
+        vector = _unit(embedding)
+        user = (metadata or {}).get("user")
+        with self._lock:
+            self._ensure_loaded()
+            bucket = self._bucket(user, category, len(vector))
+            match_id, similarity = bucket.nearest(vector)
+            if match_id is not None and similarity >= self.threshold:
+                now = datetime.now().isoformat()
+
+                def bump(entry):
+                    entry["hits"] = entry.get("hits", 1) + 1
+                    entry["last_seen"] = now
+
+                request = self._submit([], {match_id: bump})
+            else:
+                match_id = None
+                entry = room2_store.make_entry(text, category, metadata)
+                bucket.add(entry["id"], vector)
+                self.entries[entry["id"]] = entry
+                self._unwritten[entry["id"]] = (entry, vector)
+                request = self._submit([entry], {})
+
+        # Wait without the index lock so concurrent persists share the write
+        updated = self._wait(request)
+        if match_id is None:
+            return entry, False
+        if not updated:
+            # the match was removed from the store since we indexed it
+            with self._lock:
+                self._loaded = False
+            return self.persist(text, embedding, category, metadata)
+        with self._lock:
+            self.entries[match_id] = updated[0]
+        return {**updated[0], "similarity": round(similarity, 3)}, True
+
+    def persist_many(self, items: list) -> list[tuple[dict, bool]]:
+        """
+        persist() for many (text, embedding, category, metadata) items with a
+        single store write. Items also merge into earlier items of the batch.
+        """
+        outcomes = []  # (id, similarity of the merge or None)
+        created = {}
+        hits = {}      # id -> hits to add
+        with self._lock:
+            self._ensure_loaded()
+            for text, embedding, category, metadata in items:
+                vector = _unit(embedding)
+                bucket = self._bucket((metadata or {}).get("user"), category, len(vector))
+                match_id, similarity = bucket.nearest(vector)
+                if match_id is not None and similarity >= self.threshold:
+                    hits[match_id] = hits.get(match_id, 0) + 1
+                    outcomes.append((match_id, similarity))
+                    continue
+                entry = room2_store.make_entry(text, category, metadata)
+                bucket.add(entry["id"], vector)
+                self.entries[entry["id"]] = created[entry["id"]] = entry
+                self._unwritten[entry["id"]] = (entry, vector)
+                outcomes.append((entry["id"], None))
+
+            now = datetime.now().isoformat()
+
+            def bump(entry):
+                entry["hits"] = entry.get("hits", 1) + hits[entry["id"]]
+                entry["last_seen"] = now
+
+            # Entries created by this batch are bumped before they are written
+            for memory_id in hits.keys() & created.keys():
+                bump(created[memory_id])
+            request = self._submit(list(created.values()), {m: bump for m in hits.keys() - created.keys()})
+
+        updated = self._wait(request)
+        with self._lock:
+            for entry in updated:
+                self.entries[entry["id"]] = entry
+            return [(self.entries[memory_id], False) if similarity is None
+                    else ({**self.entries[memory_id], "similarity": round(similarity, 3)}, True)
+                    for memory_id, similarity in outcomes]
+
+    def search(self, user, category: Optional[str], embedding, k: int) -> list[tuple[dict, float]]:
+        """Top-k (entry, similarity) in one (user, category) bucket"""
+        vector = _unit(embedding)
+        with self._lock:
+            self._ensure_loaded()
+            bucket = self.buckets.get((user, category))
+            if bucket is None:
+                return []
+            return [(self.entries[i], s) for i, s in bucket.search(vector, k)]
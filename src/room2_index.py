@@ -0,0 +1,204 @@
+"""
+Two-Room Memory Architecture - Room 2 Offset Index
+Fixed-width sidecar index over the Room 2 JSON store
+
+One 40-byte row per entry, in store order:
+
+    offset     u64 byte offset of the entry's JSON object in the store
+    length     u32 its length in bytes
+    category   u8 code (index into CATEGORIES, 254 = other, 255 = none)
+    tier       u8 (entries without a tier are Tier 2)
+    timestamp  i64 microseconds since 1970-01-01, NO_TIME if missing
+    user       u64 hash of the user id, 0 for none
+    id         8 raw bytes of the 16-hex-char id
+
+The header records the size and mtime of the store file the index was built
+for. room2_store writes the index alongside every store write; when the
+stamp no longer matches (another writer, an older store) it is rebuilt by
+streaming the store once, so neither building nor reading an index holds
+more than a block of rows in memory. Readers filter the memory-mapped rows
+and then seek to just the entries they return.
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import struct
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from categories import CATEGORIES
+
+MAGIC = b"R2X1"
+_HEADER = struct.Struct("<4sQqQ")  # magic, store size, store mtime_ns, rows
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"), ("length", "<u4"), ("category", "u1"), ("tier", "u1"), ("_pad", "<u2"),
+    ("timestamp", "<i8"), ("user", "<u8"), ("id", "V8"),
+])
+CATEGORY_CODE = {name: i for i, name in enumerate(CATEGORIES)}
+OTHER_CATEGORY = 254
+NO_CATEGORY = 255
+NO_TIME = np.iinfo(np.int64).min
+NO_ID = bytes(8)
+BLOCK_ROWS = 8192
+SCAN_CHUNK = 1 << 20
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def index_path(store_path: Path) -> Path:
+    return store_path.with_suffix(store_path.suffix + ".idx")
+
+
+def timestamp_micros(value) -> int:
+    """Microseconds since the epoch for a datetime or ISO string; NO_TIME if unparseable"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return NO_TIME
+    if not isinstance(value, datetime):
+        return NO_TIME
+    return (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+
+def user_hash(user) -> int:
+    if user is None:
+        return 0
+    return int.from_bytes(hashlib.blake2b(str(user).encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def category_code(category) -> int:
+    if category is None:
+        return NO_CATEGORY
+    return CATEGORY_CODE.get(category, OTHER_CATEGORY)
+
+
+def id_bytes(value) -> bytes:
+    if isinstance(value, str) and len(value) == 16:
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return NO_ID
+
+
+def rows_for(entries: list, offsets: list, lengths: list) -> np.ndarray:
+    rows = np.zeros(len(entries), dtype=INDEX_DTYPE)
+    rows["offset"] = offsets
+    rows["length"] = lengths
+    rows["category"] = [category_code(e.get("category")) for e in entries]
+    rows["tier"] = [e.get("tier", 2) if e.get("tier") in (1, 2) else 2 for e in entries]
+    rows["timestamp"] = [timestamp_micros(e.get("timestamp")) for e in entries]
+    rows["user"] = [user_hash(e.get("user")) for e in entries]
+    rows["id"] = [id_bytes(e.get("id")) for e in entries]
+    return rows
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_index(store_path: Path, blocks, stamp: tuple):
+    """Write row blocks (iterable of INDEX_DTYPE arrays) for a store with stamp (size, mtime_ns)"""
+    path = index_path(store_path)
+    tmp = _tmp_path(path)
+    count = 0
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, stamp[0], stamp[1], 0))
+        for rows in blocks:
+            f.write(rows.tobytes())
+            count += len(rows)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, stamp[0], stamp[1], count))
+    os.replace(tmp, path)
+
+
+def store_stamp(stat: os.stat_result) -> tuple:
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def load_index(store_path: Path, stamp: tuple) -> Optional[np.ndarray]:
+    """Memory-mapped rows, or None when missing or built for another version of the store"""
+    path = index_path(store_path)
+    try:
+        with open(path, "rb") as f:
+            magic, size, mtime_ns, count = _HEADER.unpack(f.read(_HEADER.size))
+    except (FileNotFoundError, struct.error):
+        return None
+    if magic != MAGIC or (size, mtime_ns) != stamp:
+        return None
+    if count == 0:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=_HEADER.size, shape=(count,))
+
+
+def scan(f) -> Iterator[tuple[int, int, dict]]:
+    """(byte offset, byte length, entry) for each entry of a JSON array file, streamed"""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, at, eof = "", 0, 0, False  # at: byte offset of buf[pos]
+
+    def more():
+        nonlocal buf, pos, eof
+        # drop what has been consumed so the buffer stays about one chunk
+        buf, pos = buf[pos:], 0
+        chunk = f.read(SCAN_CHUNK)
+        eof = not chunk
+        buf += text.decode(chunk, final=eof)
+
+    def skip(chars: str):
+        nonlocal pos, at
+        while True:
+            while pos < len(buf) and buf[pos] in chars:  # ASCII: one byte each
+                pos += 1
+                at += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    skip(" \t\r\n")
+    if pos >= len(buf):
+        return
+    if buf[pos] != "[":
+        raise ValueError("Room 2 store is not a JSON array")
+    pos += 1
+    at += 1
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buf) or buf[pos] == "]":
+            return
+        try:
+            entry, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more()
+            continue
+        length = len(buf[pos:end].encode("utf-8"))
+        yield at, length, entry
+        pos, at = end, at + length
+
+
+def build_index(store_path: Path, f, stamp: tuple):
+    """Index the open store file f (which has the given stamp) by streaming it"""
+    def blocks():
+        entries, offsets, lengths = [], [], []
+        for offset, length, entry in scan(f):
+            entries.append(entry)
+            offsets.append(offset)
+            lengths.append(length)
+            if len(entries) == BLOCK_ROWS:
+                yield rows_for(entries, offsets, lengths)
+                entries, offsets, lengths = [], [], []
+        if entries:
+            yield rows_for(entries, offsets, lengths)
+
+    f.seek(0)
+    write_index(store_path, blocks(), stamp)
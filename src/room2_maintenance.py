@@ -0,0 +1,280 @@
+"""
+Two-Room Memory Architecture - Room 2 Maintenance
+Background decay and pruning of low-access, low-weight entries
+
+Every entry gets a retention score from its weight band, how often it has
+been retrieved, and how long since it was last used. Tier 1 (immutable)
+entries never decay. Per user, low-band entries that have decayed below
+PRUNE_BELOW are dropped, and anything over the per-user cap is demoted to
+the archive file (kept, but no longer served). The store is then compacted.
+
+Scoring runs in small slices with a pause between them, and the final
+rewrite re-reads the store under the lock, so entries persisted while the
+job runs are kept.
+
+Accesses are recorded by the retrieval path and flushed to ACCESS_PATH
+every FLUSH_INTERVAL seconds. Each pass first merges in what other
+processes have flushed, so a run outside the server sees its accesses up
+to FLUSH_INTERVAL ago. The server runs the job in the background.
+
+Run once with: python room2_maintenance.py [--max-per-user 500]
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import room2_store
+
+ACCESS_PATH = Path(__file__).parent / "room2_access.json"
+ARCHIVE_PATH = Path(__file__).parent / "room2_archive.json"
+
+# Default weight per relational category (see docs/architecture.md)
+CATEGORY_WEIGHT = {
+    "EMPATHY": 1.0,
+    "UNDERSTANDING": 0.9,
+    "COMMUNICATION": 0.9,
+    "RESPECT": 0.8,
+    "CONTEXT": 0.5,
+    "VOLATILE": 0.3,
+}
+DEFAULT_WEIGHT = 0.5
+
+# Weight band -> half-life in days of an unused entry's score
+WEIGHT_BANDS = (
+    ("high", 0.75, 365.0),
+    ("medium", 0.4, 90.0),
+    ("low", 0.0, 30.0),
+)
+
+MAX_PER_USER = 500
+PRUNE_BELOW = 0.05
+SLICE_SIZE = 200       # entries scored per step
+SLICE_PAUSE = 0.01     # seconds between steps
+RUN_INTERVAL = 3600.0  # seconds between background runs
+FLUSH_INTERVAL = 30.0  # seconds between access log flushes from record_access
+
+
+class AccessLog:
+    """
+    Per-memory access counts and last-access times, shared through a file.
+    Each process merges what it recorded since its last flush into the file,
+    so the server and a maintenance run in another process see one log.
+    """
+
+    def __init__(self, path: Path = ACCESS_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._stats = self._read()
+        self._pending = {}       # recorded since the last flush: id -> [count, last]
+        self._forgotten = set()  # forgotten since the last flush
+        self._last_flush = time.monotonic()
+
+    def _read(self) -> dict:
+        return json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def record(self, ids, when: Optional[float] = None):
+        when = when or time.time()
+        with self._lock:
+            for memory_id in ids:
+                for stats in (self._stats.setdefault(memory_id, [0, when]),
+                              self._pending.setdefault(memory_id, [0, when])):
+                    stats[0] += 1
+                    stats[1] = when
+                self._forgotten.discard(memory_id)
+
+    def get(self, memory_id: str) -> tuple[int, Optional[float]]:
+        count, last = self._stats.get(memory_id, (0, None))
+        return count, last
+
+    def forget(self, ids):
+        with self._lock:
+            for memory_id in ids:
+                self._stats.pop(memory_id, None)
+                self._pending.pop(memory_id, None)
+                self._forgotten.add(memory_id)
+
+    def due(self) -> bool:
+        return bool(self._pending or self._forgotten) and \
+            time.monotonic() - self._last_flush >= self.flush_interval
+
+    def sync(self):
+        """Merge this process's changes into the file and reload the rest from it"""
+        with self._lock, room2_store.locked(self.path):
+            stats = self._read()
+            for memory_id in self._forgotten:
+                stats.pop(memory_id, None)
+            for memory_id, (count, last) in self._pending.items():
+                merged = stats.setdefault(memory_id, [0, last])
+                merged[0] += count
+                merged[1] = max(merged[1], last)
+            if self._pending or self._forgotten:
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(stats))
+                os.replace(tmp, self.path)
+            self._stats = stats
+            self._pending = {}
+            self._forgotten = set()
+            self._last_flush = time.monotonic()
+
+    def flush(self):
+        if self._pending or self._forgotten:
+            self.sync()
+
+
+ACCESS_LOG = AccessLog()
+
+
+def record_access(ids):
+    """Call from retrieval paths with the ids of memories served"""
+    ACCESS_LOG.record(ids)
+    if ACCESS_LOG.due():
+        ACCESS_LOG.flush()
+
+
+def weight_of(entry: dict) -> float:
+    if "weight" in entry:
+        return float(entry["weight"])
+    return CATEGORY_WEIGHT.get(entry.get("category"), DEFAULT_WEIGHT)
+
+
+def weight_band(weight: float) -> tuple[str, float]:
+    """(band name, half-life in days)"""
+    for name, floor, half_life in WEIGHT_BANDS:
+        if weight >= floor:
+            return name, half_life
+    return WEIGHT_BANDS[-1][0], WEIGHT_BANDS[-1][2]
+
+
+def entry_time(entry: dict) -> float:
+    try:
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def retention_score(entry: dict, access_count: int, last_access: Optional[float], now: float) -> float:
+    """Weight, boosted by use, decayed by days since last use"""
+    weight = weight_of(entry)
+    if entry.get("tier") == 1:
+        return weight * (1 + math.log1p(access_count))
+    _, half_life = weight_band(weight)
+    idle_days = (now - (last_access or entry_time(entry))) / 86400
+    decay = 0.5 ** (max(idle_days, 0.0) / half_life)
+    return weight * (1 + math.log1p(access_count)) * decay
+
+
+def plan(entries: list, access_log: AccessLog = ACCESS_LOG, max_per_user: int = MAX_PER_USER,
+         prune_below: float = PRUNE_BELOW, now: Optional[float] = None,
+         slice_size: int = SLICE_SIZE, pause: float = SLICE_PAUSE) -> tuple[set, set]:
+    """
+    Decide what to prune and what to demote. Returns (prune_ids, demote_ids).
+    Scores are computed slice by slice with a pause between slices.
+    """
+    now = now or time.time()
+    by_user = defaultdict(list)
+    for start in range(0, len(entries), slice_size):
+        for entry in entries[start:start + slice_size]:
+            count, last = access_log.get(entry["id"])
+            score = retention_score(entry, count, last, now)
+            by_user[entry.get("user")].append((score, entry))
+        if pause:
+            time.sleep(pause)
+
+    prune, demote = set(), set()
+    for scored in by_user.values():
+        kept = []
+        for score, entry in scored:
+            band, _ = weight_band(weight_of(entry))
+            if band == "low" and score < prune_below and entry.get("tier") != 1:
+                prune.add(entry["id"])
+            else:
+                kept.append((score, entry))
+        if len(kept) > max_per_user:
+            kept.sort(key=lambda pair: pair[0])
+            demote.update(entry["id"] for _, entry in kept[:len(kept) - max_per_user])
+    return prune, demote
+
+
+def run_once(max_per_user: int = MAX_PER_USER, prune_below: float = PRUNE_BELOW,
+             path: Path = room2_store.ROOM2_PATH, access_log: AccessLog = ACCESS_LOG,
+             pause: float = SLICE_PAUSE) -> dict:
+    """One maintenance pass: score, decide, compact"""
+    # Accesses recorded by other processes (the server) since our last pass
+    access_log.sync()
+    try:
+        return _compact(max_per_user, prune_below, path, access_log, pause)
+    finally:
+        access_log.flush()
+
+
+def _compact(max_per_user: int, prune_below: float, path: Path, access_log: AccessLog, pause: float) -> dict:
+    # Backfill ids on entries written before ids existed
+    with room2_store.locked(path):
+        entries = room2_store.load_entries(path)
+        if any("id" not in e for e in entries):
+            for entry in entries:
+                entry.setdefault("id", room2_store.new_id())
+            room2_store.write_entries(entries, path)
+
+    prune, demote = plan(entries, access_log, max_per_user, prune_below, pause=pause)
+    if not prune and not demote:
+        return {"scanned": len(entries), "pruned": 0, "demoted": 0, "remaining": len(entries)}
+
+    with room2_store.locked(path), room2_store.locked(ARCHIVE_PATH):
+        # Re-read: entries persisted during scoring are kept
+        current = room2_store.load_entries(path)
+        kept = [e for e in current if e.get("id") not in prune and e.get("id") not in demote]
+        demoted = [e for e in current if e.get("id") in demote]
+        if demoted:
+            archive = room2_store.load_entries(ARCHIVE_PATH)
+            archive.extend(demoted)
+            room2_store.write_entries(archive, ARCHIVE_PATH)
+        room2_store.write_entries(kept, path)
+
+    access_log.forget(prune | demote)
+    return {"scanned": len(entries), "pruned": len(prune), "demoted": len(demoted), "remaining": len(kept)}
+
+
+class MaintenanceJob(threading.Thread):
+    """Daemon thread running run_once every interval seconds"""
+
+    def __init__(self, interval: float = RUN_INTERVAL, **options):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.options = options
+        self._stop_event = threading.Event()
+        self.last_result = None
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.last_result = run_once(**self.options)
+            except Exception as e:
+                print(f"Room 2 maintenance failed: {e}")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the current pass, if any, then flush the access log"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.options.get("access_log", ACCESS_LOG).flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-per-user", type=int, default=MAX_PER_USER)
+    parser.add_argument("--prune-below", type=float, default=PRUNE_BELOW)
+    args = parser.parse_args()
+    result = run_once(args.max_per_user, args.prune_below)
+    print(f"Scanned {result['scanned']}, pruned {result['pruned']}, "
+          f"demoted {result['demoted']}, remaining {result['remaining']}")
@@ -0,0 +1,52 @@
+"""
+Two-Room Memory Architecture - Room 2 Retrieval
+Category-first similarity search, reusing the embedding the gate computed
+
+Per the architecture doc, retrieval goes to category rows rather than
+scanning the store: the message's own category is searched first, then the
+others from highest to lowest weight. Each row is one (user, category)
+bucket of the dedup index, i.e. one matrix-vector product. A deadline stops
+the walk early, so a turn stays inside its latency budget with whatever the
+most relevant rows produced.
+"""
+
+import time
+from typing import Optional
+
+from categories import CATEGORIES
+from room2_dedup import DedupIndex
+from room2_maintenance import CATEGORY_WEIGHT, record_access
+
+RETRIEVE_K = 8
+MAX_RETRIEVE_K = 64
+MIN_SIMILARITY = 0.30
+LATENCY_BUDGET_MS = 50.0  # whole turn: encode, gate and retrieval
+MAX_LATENCY_BUDGET_MS = 10000.0
+
+
+def retrieval_order(category: Optional[str]) -> list:
+    """The message's category, then the rest by descending weight"""
+    rest = sorted((c for c in CATEGORIES if c != category), key=lambda c: -CATEGORY_WEIGHT.get(c, 0.0))
+    return ([category] if category in CATEGORIES else []) + rest
+
+
+def retrieve(index: DedupIndex, user, embedding, categories: Optional[list] = None,
+             k: int = RETRIEVE_K, min_similarity: float = MIN_SIMILARITY,
+             deadline: Optional[float] = None, record: bool = True) -> tuple[list, bool]:
+    """
+    Top-k memories for an already-encoded message.
+    deadline is a time.perf_counter() value; returns (memories, complete),
+    complete False when it cut the category walk short.
+    """
+    found = []
+    complete = True
+    for category in categories or CATEGORIES:
+        if deadline is not None and time.perf_counter() > deadline:
+            complete = False
+            break
+        found.extend(hit for hit in index.search(user, category, embedding, k) if hit[1] >= min_similarity)
+    found.sort(key=lambda hit: -hit[1])
+    memories = [{**entry, "similarity": round(similarity, 3)} for entry, similarity in found[:k]]
+    if record and memories:
+        record_access([m["id"] for m in memories])
+    return memories, complete
@@ -0,0 +1,421 @@
+"""
+Two-Room Memory Architecture - Room 2 Store
+Shared read/write path for the Room 2 JSON store
+
+Writers hold locked(path) for the whole read-modify-write: STORE_LOCK
+within the process and an flock on <store>.lock across processes. A new
+store is written to a private temp file, fsync'd and renamed over the old
+one, so readers never see a half-written store and a crash leaves either
+the old or the new version.
+
+commit() is a group commit. Concurrent callers queue their changes; whoever
+finds no write in progress becomes the leader, takes everything queued and
+applies it in one read-modify-write with one fsync. The others wait for
+that write instead of each rewriting the store, so throughput grows with
+the number of concurrent writers. Within a process the parsed store is
+kept between writes while its file is unchanged.
+
+Every write also writes the offset index (room2_index.py) that iter_entries
+and read_page use to filter and page through the store without loading it.
+"""
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): writers are only safe within one process
+    fcntl = None
+
+import numpy as np
+
+import room2_index
+import tracing
+
+ROOM2_PATH = Path(__file__).parent / "room2.json"
+
+
+class _StoreLock:
+    """Reentrant lock that knows whether the current thread holds it"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, *args, **kwargs) -> bool:
+        acquired = self._lock.acquire(*args, **kwargs)
+        if acquired:
+            self._owner = threading.get_ident()
+            self._depth += 1
+        return acquired
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def held(self) -> bool:
+        return self._owner == threading.get_ident()
+
+
+STORE_LOCK = _StoreLock()
+_flocks = {}  # store path -> [lock file descriptor, depth], guarded by STORE_LOCK
+
+
+@contextmanager
+def locked(path: Path = ROOM2_PATH):
+    """Exclusive access to the store at path, for threads and processes alike"""
+    with STORE_LOCK:
+        key = str(path)
+        held = _flocks.get(key)
+        if held is None and fcntl is not None:
+            fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            held = _flocks[key] = [fd, 0]
+        if held is not None:
+            held[1] += 1
+        try:
+            yield
+        finally:
+            if held is not None:
+                held[1] -= 1
+                if held[1] == 0:
+                    del _flocks[key]
+                    fcntl.flock(held[0], fcntl.LOCK_UN)
+                    os.close(held[0])
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def make_entry(text: str, category: Optional[str] = None, metadata: Optional[dict] = None) -> dict:
+    return {
+        "id": new_id(),
+        "text": text,
+        "timestamp": datetime.now().isoformat(),
+        "category": category,
+        **(metadata or {})
+    }
+
+
+def load_entries(path: Path = ROOM2_PATH) -> list:
+    if path.exists():
+        return json.loads(path.read_text())
+    return []
+
+
+def serialize(entries: list) -> tuple[str, list, list]:
+    """
+    The store text (byte-for-byte json.dumps(entries, indent=2)) with each
+    entry's offset and length, which are in bytes since the output is ASCII
+    """
+    if not entries:
+        return "[]", [], []
+    parts = [json.dumps(entry, indent=2).replace("\n", "\n  ") for entry in entries]
+    lengths = [len(part) for part in parts]
+    offsets = np.cumsum([4] + [length + 4 for length in lengths[:-1]]).tolist()  # "[\n  ", ",\n  "
+    return "[\n  " + ",\n  ".join(parts) + "\n]", offsets, lengths
+
+
+def write_entries(entries: list, path: Path = ROOM2_PATH):
+    """Replace the store atomically and durably, then its offset index"""
+    text, offsets, lengths = serialize(entries)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, "O_DIRECTORY"):  # make the rename itself durable
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    room2_index.write_index(path, [room2_index.rows_for(entries, offsets, lengths)],
+                            room2_index.store_stamp(path.stat()))
+
+
+def _stat(path: Path) -> Optional[os.stat_result]:
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
+
+
+class CommitRequest:
+    """One caller's changes, queued for the next group write"""
+
+    def __init__(self, new_entries: list, updates: dict, owner=None, on_commit: Optional[Callable] = None):
+        self.new_entries = list(new_entries)
+        self.updates = updates
+        self.owner = owner          # who queued it, see owners
+        self.on_commit = on_commit  # called by the writing thread right after the write
+        self.updated = []
+        self.error = None
+        self.done = False
+        self.before = None          # os.stat_result of the store before / after the write
+        self.after = None
+        self.owners = set()         # owners of every request written in the same group
+        self._group = None
+
+    def wait(self) -> list:
+        """Block until written; returns the updated entries"""
+        if self._group is not None:
+            self._group.wait(self)
+        if self.error is not None:
+            raise self.error
+        return self.updated
+
+
+class _GroupCommit:
+    def __init__(self, path: Path):
+        self.path = path
+        self.pending = []
+        self.writing = False
+        self.cond = threading.Condition()
+        self._cache = None  # (stamp, entries) as of our last write
+
+    def submit(self, request: CommitRequest) -> CommitRequest:
+        request._group = self
+        with self.cond:
+            self.pending.append(request)
+        return request
+
+    def wait(self, request: CommitRequest):
+        with self.cond:
+            while not request.done and self.writing:
+                self.cond.wait()
+            if request.done:
+                return
+            self.writing = True
+            batch, self.pending = self.pending, []
+        try:
+            self.apply(batch)
+        except BaseException as e:
+            for r in batch:
+                r.error = e
+        finally:
+            with self.cond:
+                self.writing = False
+                for r in batch:
+                    r.done = True
+                self.cond.notify_all()
+
+    @staticmethod
+    def _stamp(stat) -> Optional[tuple]:
+        # every write renames a new file in, so the inode changes even when
+        # a coarse mtime and the size do not
+        return stat and (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _load(self) -> list:
+        stamp = self._stamp(_stat(self.path))
+        if self._cache is not None and self._cache[0] == stamp:
+            return self._cache[1]
+        return load_entries(self.path)
+
+    def apply(self, batch: list):
+        new = sum(len(r.new_entries) for r in batch)
+        updates = sum(len(r.updates) for r in batch)
+        with tracing.span("room2_write", requests=len(batch), entries=new, updates=updates), locked(self.path):
+            before = _stat(self.path)
+            entries = self._load()
+            self._cache = None  # modified in place below
+            by_id = {e["id"]: e for e in entries if "id" in e} if updates else {}
+            changed = False
+            for r in batch:
+                for memory_id, fn in r.updates.items():
+                    entry = by_id.get(memory_id)
+                    if entry is not None:
+                        fn(entry)
+                        r.updated.append(entry)
+                        changed = True
+                entries.extend(r.new_entries)
+                if updates:
+                    by_id.update((e["id"], e) for e in r.new_entries if "id" in e)
+                changed = changed or bool(r.new_entries)
+            if changed:
+                write_entries(entries, self.path)
+            after = _stat(self.path)
+            if after is not None:
+                self._cache = (self._stamp(after), entries)
+            owners = {r.owner for r in batch}
+            for r in batch:
+                r.before, r.after, r.owners = before, after, owners
+                if r.on_commit is not None:
+                    r.on_commit(r)
+
+
+_GROUPS = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def _group(path: Path) -> _GroupCommit:
+    key = str(Path(path).resolve())
+    with _GROUPS_LOCK:
+        group = _GROUPS.get(key)
+        if group is None:
+            group = _GROUPS[key] = _GroupCommit(Path(path))
+        return group
+
+
+def submit(new_entries: list = (), updates: Optional[dict] = None, path: Path = ROOM2_PATH,
+           owner=None, on_commit: Optional[Callable] = None) -> CommitRequest:
+    """
+    Queue changes for the next group write and return without waiting;
+    call wait() on the result. Requests are applied in the order queued.
+    """
+    request = CommitRequest(new_entries, updates or {}, owner, on_commit)
+    if STORE_LOCK.held():
+        # The group writer needs STORE_LOCK, so waiting for it here would
+        # deadlock: write this request alone, now
+        request.done = True
+        try:
+            _group(path).apply([request])
+        except BaseException as e:
+            request.error = e
+        return request
+    return _group(path).submit(request)
+
+
+def commit(new_entries: list = (), updates: Optional[dict] = None, path: Path = ROOM2_PATH) -> list:
+    """
+    Apply {id: fn(entry) -> None} updates and append new_entries, sharing
+    one write with any concurrent commits. Returns the updated entries.
+    """
+    return submit(new_entries, updates, path).wait()
+
+
+def append_entries(new_entries: list, path: Path = ROOM2_PATH) -> list:
+    commit(new_entries, None, path)
+    return new_entries
+
+
+def update_entries(updates: dict, path: Path = ROOM2_PATH) -> list:
+    """Apply {id: fn(entry) -> None} in place; returns the updated entries"""
+    return commit((), updates, path)
+
+
+def clear(path: Path = ROOM2_PATH):
+    with locked(path):
+        if path.exists():
+            path.unlink()
+        room2_index.index_path(path).unlink(missing_ok=True)
+
+
+def open_indexed(path: Path):
+    """
+    (open store file, its room2_index rows); the index is rebuilt if stale.
+    Hold locked(path) to keep the two consistent with the store.
+    """
+    f = open(path, "rb")
+    stamp = room2_index.store_stamp(os.fstat(f.fileno()))
+    rows = room2_index.load_index(path, stamp)
+    if rows is None:
+        with tracing.span("room2_index_rebuild"):
+            room2_index.build_index(path, f, stamp)
+        rows = room2_index.load_index(path, stamp)
+    return f, rows
+
+
+def read_row(f, rows: np.ndarray, i: int) -> dict:
+    """Entry i of a store opened with open_indexed"""
+    f.seek(int(rows["offset"][i]))
+    return json.loads(f.read(int(rows["length"][i])))
+
+
+def _filter_mask(rows: np.ndarray, since, until, category, tier, user) -> np.ndarray:
+    mask = np.ones(len(rows), dtype=bool)
+    if since is not None or until is not None:
+        times = rows["timestamp"]
+        mask &= times != room2_index.NO_TIME
+        if since is not None:
+            mask &= times >= room2_index.timestamp_micros(since)
+        if until is not None:
+            mask &= times < room2_index.timestamp_micros(until)
+    if category is not None:
+        mask &= rows["category"] == room2_index.category_code(category)
+    if tier is not None:
+        mask &= rows["tier"] == tier
+    if user is not None:
+        mask &= rows["user"] == room2_index.user_hash(user)
+    return mask
+
+
+def _scan(path: Path, start: int, since, until, category, tier, user) -> Iterator[tuple[int, dict]]:
+    """(row, entry) for matching entries from row start on, a block of index rows at a time"""
+    if not path.exists():
+        return
+    f, rows = open_indexed(path)
+    with f:
+        for block in range(start, len(rows), room2_index.BLOCK_ROWS):
+            chunk = rows[block:block + room2_index.BLOCK_ROWS]
+            for i in np.flatnonzero(_filter_mask(chunk, since, until, category, tier, user)):
+                entry = read_row(f, chunk, i)
+                # index codes can collide (user hashes, unlisted categories): confirm on the entry
+                if user is not None and entry.get("user") != user:
+                    continue
+                if category is not None and entry.get("category") != category:
+                    continue
+                yield block + int(i), entry
+
+
+def iter_entries(path: Path = ROOM2_PATH, since=None, until=None, category: Optional[str] = None,
+                 tier: Optional[int] = None, user: Optional[str] = None) -> Iterator[dict]:
+    """
+    Stream entries in store order, filtered on timestamp (since <= t < until,
+    datetimes or ISO strings), category, tier and user. Memory use does not
+    grow with the store.
+    """
+    for _, entry in _scan(path, 0, since, until, category, tier, user):
+        yield entry
+
+
+def _cursor_row(path: Path, cursor: str) -> int:
+    """Row to resume from; relocates by id if the store was rewritten since"""
+    row, _, last_id = cursor.partition(":")
+    row = int(row)
+    if not last_id or not path.exists():
+        return row
+    f, rows = open_indexed(path)
+    f.close()
+    wanted = room2_index.id_bytes(last_id)
+    if 0 < row <= len(rows) and rows["id"][row - 1].tobytes() == wanted:
+        return row
+    for block in range(0, len(rows), room2_index.BLOCK_ROWS):
+        hits = np.flatnonzero(rows["id"][block:block + room2_index.BLOCK_ROWS] == np.void(wanted))
+        if len(hits):
+            return block + int(hits[0]) + 1
+    raise ValueError(f"cursor {cursor!r} points at an entry that is no longer in the store")
+
+
+def read_page(path: Path = ROOM2_PATH, limit: int = 100, cursor: Optional[str] = None,
+              **filters) -> tuple[list, Optional[str]]:
+    """
+    One page of iter_entries: (entries, cursor for the next page or None at
+    the end). Filters must be the same on every page.
+    """
+    limit = max(1, limit)
+    start = _cursor_row(path, cursor) if cursor else 0
+    page = []
+    for row, entry in _scan(path, start, filters.get("since"), filters.get("until"), filters.get("category"),
+                            filters.get("tier"), filters.get("user")):
+        if len(page) == limit:
+            return page, f"{page_row}:{page[-1].get('id', '')}"
+        page.append(entry)
+        page_row = row + 1
+    return page, None
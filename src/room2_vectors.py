@@ -0,0 +1,314 @@
+"""
+Two-Room Memory Architecture - Quantized Room 2 Vectors
+Compact first-pass codes in RAM, exact float rerank of a shortlist
+
+A float32 MiniLM vector is 1536 bytes. This store keeps only a code per
+memory in RAM:
+
+    int8     384 bytes + a 4-byte scale; score = scale * (codes @ query)
+    binary   48 bytes of sign bits; score = query . (+-1 per bit), the query
+             staying float (asymmetric), via one 256-entry table per code byte
+
+A query scores every candidate row by its code, keeps the best
+k * rerank_factor, and reranks those with exact cosine similarity on the
+float vectors. The floats live in an append-only file that is memory-mapped
+for the rerank, so the operating system keeps only the rows in use resident.
+Each store creates its own file (room2_vectors.*.f32 in float_dir) and
+deletes it when closed or collected, since it is rebuilt on every load.
+
+QuantizedBuckets plugs the store into room2_dedup.DedupIndex as its bucket
+factory, so dedup and retrieval run on quantized buckets. It is opt-in:
+ClassifierGate(quantized="binary") or ROOM2_QUANTIZED=binary for the server.
+
+Benchmark with: python room2_vectors.py [n_vectors] [binary|int8]
+"""
+
+import numpy as np
+import os
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Optional
+
+VECTORS_DIR = Path(__file__).parent
+# Shortlist size as a multiple of k; binary codes are coarser and need more
+RERANK_FACTOR = {"binary": 100, "int8": 10}
+MODES = ("binary", "int8")
+SCORE_CHUNK = 4096  # int8 rows widened to float32 at a time (stays in cache)
+
+# +-1 for each bit of every byte value, most significant bit first (as packbits)
+_BYTE_SIGNS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32) * 2 - 1
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _remove_floats(file, path: Path):
+    file.close()
+    path.unlink(missing_ok=True)
+
+
+class QuantizedVectorStore:
+    """Rows of (id, code, scale) in RAM; float vectors in a private file in float_dir (or in RAM)"""
+
+    def __init__(self, dim: int, mode: str = "binary", float_dir: Optional[Path] = None,
+                 rerank_factor: Optional[int] = None, capacity: int = 1024):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.dim = dim
+        self.mode = mode
+        self.rerank_factor = rerank_factor or RERANK_FACTOR[mode]
+        self.ids = []
+        # Binary codes are stored byte-column-major so scoring reads one column at a time
+        self.width = (dim + 7) // 8 if mode == "binary" else dim
+        if mode == "binary":
+            self._codes = np.empty((self.width, capacity), dtype=np.uint8)
+        else:
+            self._codes = np.empty((capacity, self.width), dtype=np.int8)
+        self._scales = np.empty(capacity, dtype=np.float32) if mode == "int8" else None
+        self.float_path = None
+        self._floats = None
+        self._file = None
+        self._mmap = None
+        self._lock = threading.Lock()
+        if float_dir is None:
+            self._floats = np.empty((capacity, dim), dtype=np.float32)
+        else:
+            fd, name = tempfile.mkstemp(prefix="room2_vectors.", suffix=".f32", dir=float_dir)
+            self.float_path = Path(name)
+            self._file = os.fdopen(fd, "ab")
+            self._cleanup = weakref.finalize(self, _remove_floats, self._file, self.float_path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def code_bytes(self) -> int:
+        """RAM per vector for codes and scale"""
+        return self.width + (4 if self.mode == "int8" else 0)
+
+    @property
+    def capacity(self) -> int:
+        return self._codes.shape[1] if self.mode == "binary" else len(self._codes)
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        n = len(self.ids)
+        if self.mode == "binary":
+            codes = np.empty((self.width, capacity), dtype=np.uint8)
+            codes[:, :n] = self._codes[:, :n]
+        else:
+            codes = np.empty((capacity, self.width), dtype=np.int8)
+            codes[:n] = self._codes[:n]
+        self._codes = codes
+        if self._scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:n] = self._scales[:n]
+            self._scales = scales
+        if self._floats is not None:
+            floats = np.empty((capacity, self.dim), dtype=np.float32)
+            floats[:n] = self._floats[:n]
+            self._floats = floats
+
+    def encode(self, units: np.ndarray):
+        """(codes, scales) for unit row vectors"""
+        if self.mode == "binary":
+            return np.packbits(units > 0, axis=1), None
+        scales = np.abs(units).max(axis=1) / 127
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        return np.rint(units / scales[:, None]).astype(np.int8), scales
+
+    def add_many(self, ids: list, vectors) -> np.ndarray:
+        """Append vectors; returns their row numbers"""
+        units = _unit_rows(vectors)
+        codes, scales = self.encode(units)
+        with self._lock:
+            start = len(self.ids)
+            end = start + len(units)
+            self._grow(end)
+            if self.mode == "binary":
+                self._codes[:, start:end] = codes.T
+            else:
+                self._codes[start:end] = codes
+            if scales is not None:
+                self._scales[start:end] = scales
+            if self._floats is not None:
+                self._floats[start:end] = units
+            else:
+                self._file.write(units.tobytes())
+                self._file.flush()
+            self.ids.extend(ids)
+        return np.arange(start, end)
+
+    def add(self, memory_id: str, vector) -> int:
+        return int(self.add_many([memory_id], vector)[0])
+
+    def _float_rows(self, rows: np.ndarray) -> np.ndarray:
+        if self._floats is not None:
+            return self._floats[rows]
+        n = len(self.ids)
+        if self._mmap is None or len(self._mmap) < n:
+            self._mmap = np.memmap(self.float_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return np.asarray(self._mmap[rows])
+
+    def approximate(self, unit: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """First-pass scores (higher = closer) for the given rows (default: all)"""
+        n = len(self.ids)
+        if self.mode == "binary":
+            padded = np.zeros(self.width * 8, dtype=np.float32)
+            padded[:self.dim] = unit
+            tables = padded.reshape(self.width, 8) @ _BYTE_SIGNS.T  # (width, 256)
+            scores = np.zeros(n if rows is None else len(rows), dtype=np.float32)
+            for j in range(self.width):
+                column = self._codes[j, :n] if rows is None else self._codes[j, rows]
+                scores += tables[j].take(column)
+            return scores
+        codes = self._codes[:n] if rows is None else self._codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            scores[start:start + SCORE_CHUNK] = codes[start:start + SCORE_CHUNK].astype(np.float32) @ unit
+        return scores * (self._scales[:n] if rows is None else self._scales[rows])
+
+    def search(self, query, k: int, rows: Optional[np.ndarray] = None,
+               rerank_factor: Optional[int] = None) -> list[tuple[str, float]]:
+        """Top-k (id, cosine similarity) among rows (default: all), best first"""
+        unit = _unit_rows(query)[0]
+        scores = self.approximate(unit, rows)
+        rows = np.arange(len(self.ids)) if rows is None else np.asarray(rows)
+        if len(rows) == 0:
+            return []
+        shortlist = min(len(rows), k * (rerank_factor or self.rerank_factor))
+        if shortlist < len(rows):
+            rows = rows[np.argpartition(-scores, shortlist - 1)[:shortlist]]
+        rows = np.sort(rows)  # read the float file front to back
+        exact = self._float_rows(rows) @ unit
+        top = np.argsort(-exact)[:k]
+        return [(self.ids[rows[i]], float(exact[i])) for i in top]
+
+    def close(self):
+        """Drop the rows' float file; the store is unusable afterwards"""
+        self._mmap = None
+        if self.float_path is not None:
+            self._cleanup()
+
+
+class QuantizedBucket:
+    """room2_dedup.BucketIndex interface over rows of a shared quantized store"""
+
+    def __init__(self, store: QuantizedVectorStore):
+        self.store = store
+        self.ids = []
+        self._rows = np.empty(16, dtype=np.int64)
+
+    def add(self, memory_id: str, unit_vector: np.ndarray):
+        n = len(self.ids)
+        if n == len(self._rows):
+            rows = np.empty(2 * n, dtype=np.int64)
+            rows[:n] = self._rows
+            self._rows = rows
+        self._rows[n] = self.store.add(memory_id, unit_vector)
+        self.ids.append(memory_id)
+
+    def search(self, unit_vector: np.ndarray, k: int) -> list[tuple[str, float]]:
+        return self.store.search(unit_vector, k, self._rows[:len(self.ids)])
+
+    def nearest(self, unit_vector: np.ndarray) -> tuple[Optional[str], float]:
+        hits = self.search(unit_vector, 1)
+        return hits[0] if hits else (None, -1.0)
+
+
+class QuantizedBuckets:
+    """DedupIndex bucket factory: every bucket shares one quantized store"""
+
+    def __init__(self, mode: str = "binary", float_dir: Optional[Path] = VECTORS_DIR,
+                 rerank_factor: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.mode = mode
+        self.float_dir = float_dir
+        self.rerank_factor = rerank_factor
+        self.store = None
+
+    def __call__(self, dim: int) -> QuantizedBucket:
+        if self.store is None:
+            self.store = QuantizedVectorStore(dim, self.mode, self.float_dir, self.rerank_factor)
+        return QuantizedBucket(self.store)
+
+    def reset(self):
+        """Drop every row; the index is about to be rebuilt from the store"""
+        if self.store is not None:
+            self.store.close()
+        self.store = None
+
+
+def benchmark_vectors(n: int, dim: int = 384, seed: int = 0) -> np.ndarray:
+    """Cached MiniLM embeddings if there are enough, else topic/subtopic-clustered unit vectors"""
+    try:
+        from embedding_store import EmbeddingCache
+        from encoders import DEFAULT_MODEL
+        cached = EmbeddingCache(DEFAULT_MODEL)._matrix
+        if cached is not None and len(cached) >= n:
+            return _unit_rows(np.asarray(cached[:n]))
+    except Exception:
+        pass
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(50, dim)).astype(np.float32)
+    subtopics = topics[rng.integers(0, len(topics), max(n // 50, 1))]
+    subtopics += 0.7 * rng.normal(size=subtopics.shape).astype(np.float32)
+    vectors = subtopics[rng.integers(0, len(subtopics), n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return _unit_rows(vectors)
+
+
+def run_benchmark(n: int = 100000, modes=MODES, queries: int = 200, k: int = 10, seed: int = 0,
+                  rerank_factors=(10, 30, 100)):
+    import time
+
+    vectors = benchmark_vectors(n, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(vectors), queries)
+    query_set = _unit_rows(vectors[picks] + 0.3 * rng.normal(size=(queries, vectors.shape[1])).astype(np.float32))
+    ids = [str(i) for i in range(len(vectors))]
+
+    def timed(search) -> tuple[list, float]:
+        results, times = [], []
+        for q in query_set:
+            start = time.perf_counter()
+            results.append(search(q))
+            times.append(time.perf_counter() - start)
+        return results, float(np.median(times) * 1000)
+
+    exact, exact_ms = timed(lambda q: set(np.argpartition(-(vectors @ q), k)[:k].astype(str)))
+
+    print("=" * 70)
+    print(f"ROOM 2 VECTORS: {len(vectors)} x {vectors.shape[1]}, {queries} queries, recall@{k}")
+    print("=" * 70)
+    print(f"{'store':<22}{'RAM bytes/vector':>18}{'vs float32':>12}{'recall@k':>10}{'p50 ms':>10}")
+    print(f"{'float32 exact':<22}{vectors.shape[1] * 4:>18}{1.0:>11.1f}x{1.0:>10.3f}{exact_ms:>10.2f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in modes:
+            store = QuantizedVectorStore(vectors.shape[1], mode, tmp)
+            store.add_many(ids, vectors)
+            ratio = vectors.shape[1] * 4 / store.code_bytes
+            for factor in rerank_factors:
+                found, ms = timed(lambda q: {i for i, _ in store.search(q, k, rerank_factor=factor)})
+                recall = np.mean([len(f & e) / k for f, e in zip(found, exact)])
+                name = f"{mode} + rerank {factor}k"
+                print(f"{name:<22}{store.code_bytes:>18}{ratio:>11.1f}x{recall:>10.3f}{ms:>10.2f}")
+            store.close()
+    print("\nRerank reads the shortlist from the memory-mapped float file")
+
+
+if __name__ == "__main__":
+    import sys
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    modes = (sys.argv[2],) if len(sys.argv) > 2 else MODES
+    run_benchmark(n, modes)
@@ -0,0 +1,348 @@
+"""
+Two-Room Memory Architecture - Syntactic Profile
+Streaming syntactic_profile(user_corpus) from docs/architecture.md
+
+Instead of rescanning the corpus, each message updates constant-size
+counters and running statistics in O(message length):
+
+    word_freq            top-K content words (space-saving sketch)
+    hedge / absolutist / intensifier / self-reference counts
+    sentences, words per sentence, questions
+    tense_distribution   past / present / future cue counts
+    sentiment_by_topic   running mean and variance per relational category
+    people_reference     mentions and running sentiment per family/social role
+
+Profiles are persisted per user and read back as a snapshot whose size does
+not depend on how much the user has written. ClassifierGate and the server
+update a user's profile with every exchange they persist for that user,
+through one store per directory (store_for). Updates stay in memory; a
+background thread merges them into the files every FLUSH_INTERVAL seconds
+and at exit.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+import room2_store
+from categories import CATEGORIES, categorize
+
+PROFILE_DIR = Path(__file__).parent / "profiles"
+TOP_WORDS = 256
+MAX_PENDING_PROFILES = 10000  # users with unflushed messages before an early flush
+FLUSH_INTERVAL = 30.0         # seconds between background flushes
+
+HEDGES = frozenset("maybe perhaps possibly probably might guess think suppose seems sort kind somewhat unsure".split())
+ABSOLUTIST = frozenset("always never nothing everything completely totally entirely all none every constantly forever".split())
+INTENSIFIERS = frozenset("so very really extremely incredibly super totally absolutely deeply".split())
+SELF_REFERENCE = frozenset("i me my mine myself i'm i've i'd i'll".split())
+POSITIVE = frozenset("good great happy love glad proud excited better hope grateful calm safe fine enjoy joy".split())
+NEGATIVE = frozenset("bad sad angry hate scared afraid worried tired hurt lonely lost stuck pain anxious "
+                     "depressed awful worse terrible exhausted cry crying died".split())
+PAST_CUES = frozenset("was were had did went used said felt got lost died grew ago yesterday".split())
+FUTURE_CUES = frozenset("will gonna going tomorrow soon plan planning next i'll".split())
+PRESENT_CUES = frozenset("am is are do does feel have has now today currently i'm".split())
+ROLES = frozenset("mom mother dad father wife husband partner son daughter kid kids brother sister "
+                  "friend boss therapist grandma grandmother grandpa grandfather ex".split())
+STOPWORDS = frozenset("the a an and or but to of in on at for with it is was are be i me my you your "
+                      "that this so just not do have has had im its".split())
+
+_WORD = re.compile(r"[a-z][a-z']*")
+_SENTENCE_END = re.compile(r"[.!?]+")
+
+
+class RunningStat:
+    """Welford running mean and variance"""
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n, self.mean, self.m2 = n, mean, m2
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other: "RunningStat"):
+        """Fold in another stream's statistics (Chan et al.)"""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def to_list(self) -> list:
+        return [self.n, self.mean, self.m2]
+
+
+class TopK:
+    """
+    Space-saving heavy hitters: at most k counters, never grows. Counters are
+    grouped in buckets by count (stream-summary), so add() is O(1).
+    """
+
+    def __init__(self, k: int = TOP_WORDS, counts: Optional[dict] = None):
+        self.k = k
+        self.counts = {}
+        self._buckets = {}  # count -> {item: None}, oldest first
+        for item, count in sorted((counts or {}).items(), key=lambda kv: -kv[1])[:k]:
+            self._place(item, count)
+        self._min = min(self._buckets, default=0)
+
+    def _place(self, item: str, count: int):
+        self.counts[item] = count
+        self._buckets.setdefault(count, {})[item] = None
+
+    def _remove(self, item: str) -> int:
+        count = self.counts.pop(item)
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+        return count
+
+    def add(self, item: str):
+        if item in self.counts:
+            count = self._remove(item)
+        elif len(self.counts) < self.k:
+            count = self._min = 0
+        else:
+            count = self._remove(next(iter(self._buckets[self._min])))
+        self._place(item, count + 1)
+        if count == self._min and count not in self._buckets:
+            self._min = count + 1
+
+    def merge(self, other: "TopK"):
+        """Sum both sketches' counters and keep the k largest"""
+        counts = dict(self.counts)
+        for item, count in other.counts.items():
+            counts[item] = counts.get(item, 0) + count
+        merged = TopK(self.k, counts)
+        self.counts, self._buckets, self._min = merged.counts, merged._buckets, merged._min
+
+    def top(self, n: int = 20) -> list:
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])[:n]
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def message_sentiment(words: list[str]) -> float:
+    """Lexicon polarity in [-1, 1]; 0.0 when no sentiment words appear"""
+    pos = sum(w in POSITIVE for w in words)
+    neg = sum(w in NEGATIVE for w in words)
+    return (pos - neg) / (pos + neg) if pos + neg else 0.0
+
+
+class SyntacticProfile:
+    COUNTERS = ("messages", "words", "sentences", "questions", "hedges", "absolutist",
+                "intensifiers", "self_reference", "past", "present", "future")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.word_freq = TopK()
+        self.sentiment_by_topic = {c: RunningStat() for c in CATEGORIES}
+        self.people = {}  # role -> RunningStat of sentiment when mentioned (bounded by ROLES)
+
+    def update(self, message: str, topic: Optional[str] = None):
+        """Fold one message into the profile: O(len(message))"""
+        words = tokenize(message)
+        c = self.counts
+        c["messages"] += 1
+        c["words"] += len(words)
+        # An unterminated tail still counts as a sentence
+        c["sentences"] += max(1, len(_SENTENCE_END.findall(message)) + (message.rstrip()[-1:] not in ".!?"))
+        c["questions"] += message.count("?")
+        sentiment = message_sentiment(words)
+        for w in words:
+            if w in HEDGES:
+                c["hedges"] += 1
+            if w in ABSOLUTIST:
+                c["absolutist"] += 1
+            if w in INTENSIFIERS:
+                c["intensifiers"] += 1
+            if w in SELF_REFERENCE:
+                c["self_reference"] += 1
+            if w in PAST_CUES or (w.endswith("ed") and len(w) > 4):
+                c["past"] += 1
+            elif w in FUTURE_CUES:
+                c["future"] += 1
+            elif w in PRESENT_CUES:
+                c["present"] += 1
+            if w in ROLES:
+                self.people.setdefault(w, RunningStat()).add(sentiment)
+            if w not in STOPWORDS and len(w) > 2:
+                self.word_freq.add(w)
+        self.sentiment_by_topic[topic or categorize(message)].add(sentiment)
+
+    def snapshot(self) -> dict:
+        """The architecture doc's profile structure, from counters only"""
+        c = self.counts
+        words = max(c["words"], 1)
+        tenses = max(c["past"] + c["present"] + c["future"], 1)
+        return {
+            "messages": c["messages"],
+            "word_freq": dict(self.word_freq.top(TOP_WORDS)),
+            "hedge_ratio": c["hedges"] / words,
+            "absolutist_ratio": c["absolutist"] / words,
+            "avg_sentence_length": c["words"] / max(c["sentences"], 1),
+            "question_ratio": c["questions"] / max(c["sentences"], 1),
+            "self_reference_ratio": c["self_reference"] / words,
+            "tense_distribution": {t: c[t] / tenses for t in ("past", "present", "future")},
+            "sentiment_by_topic": {t: s.mean for t, s in self.sentiment_by_topic.items() if s.n},
+            "sentiment_variance_by_topic": {t: s.variance for t, s in self.sentiment_by_topic.items() if s.n},
+            "intensity_ratio": c["intensifiers"] / words,
+            "people_reference": {r: s.n for r, s in self.people.items()},
+            "attachment_valence": {r: ("pos" if s.mean > 0.2 else "neg" if s.mean < -0.2 else "ambiv")
+                                   for r, s in self.people.items()},
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "counts": self.counts,
+            "word_freq": self.word_freq.counts,
+            "sentiment_by_topic": {t: s.to_list() for t, s in self.sentiment_by_topic.items()},
+            "people": {r: s.to_list() for r, s in self.people.items()},
+        }
+
+    def merge(self, other: "SyntacticProfile"):
+        """Fold in a profile built from other messages of the same user"""
+        for key, value in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        self.word_freq.merge(other.word_freq)
+        for topic, stat in other.sentiment_by_topic.items():
+            self.sentiment_by_topic.setdefault(topic, RunningStat()).merge(stat)
+        for role, stat in other.people.items():
+            self.people.setdefault(role, RunningStat()).merge(stat)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SyntacticProfile":
+        profile = cls()
+        profile.counts.update(data.get("counts", {}))
+        profile.word_freq = TopK(TOP_WORDS, data.get("word_freq"))
+        for t, stat in data.get("sentiment_by_topic", {}).items():
+            profile.sentiment_by_topic[t] = RunningStat(*stat)
+        profile.people = {r: RunningStat(*stat) for r, stat in data.get("people", {}).items()}
+        return profile
+
+
+class ProfileStore:
+    """
+    Per-user profiles on disk. update() folds messages into in-memory deltas;
+    a background thread merges them into the files every flush_interval
+    seconds, and once more at exit, each under room2_store.locked, so
+    several processes can update one user without losing counts.
+    """
+
+    def __init__(self, directory: Path = PROFILE_DIR, max_pending: int = MAX_PENDING_PROFILES,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.directory = Path(directory)
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._pending = {}  # user -> SyntacticProfile of messages since the last flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        threading.Thread(target=self._run_flusher, daemon=True).start()
+        atexit.register(self.close)
+
+    def _path(self, user: str) -> Path:
+        return self.directory / f"{hashlib.sha1(user.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def _read(self, user: str) -> SyntacticProfile:
+        path = self._path(user)
+        return SyntacticProfile.from_dict(json.loads(path.read_text())) if path.exists() else SyntacticProfile()
+
+    def _merge_into_file(self, user: str, delta: SyntacticProfile):
+        path = self._path(user)
+        with room2_store.locked(path):
+            profile = self._read(user)
+            profile.merge(delta)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(profile.to_dict()))
+            os.replace(tmp, path)
+
+    def _run_flusher(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Flushing profiles to {self.directory} failed: {e}")
+
+    def update(self, user: str, message: str, topic: Optional[str] = None):
+        """O(len(message)); never touches the disk"""
+        topic = topic or categorize(message)
+        with self._lock:
+            delta = self._pending.get(user)
+            if delta is None:
+                delta = self._pending[user] = SyntacticProfile()
+            delta.update(message, topic)
+            crowded = len(self._pending) >= self.max_pending
+        if crowded:
+            self._wake.set()  # flush early rather than grow
+
+    def get(self, user: str) -> dict:
+        """Snapshot of the stored profile with this process's unflushed messages"""
+        with self._lock:
+            delta = self._pending.get(user)
+            delta = SyntacticProfile.from_dict(delta.to_dict()) if delta is not None else None
+        profile = self._read(user)
+        if delta is not None:
+            profile.merge(delta)
+        return profile.snapshot()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = list(self._pending.items()), {}
+            if not pending:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for i, (user, delta) in enumerate(pending):
+                try:
+                    self._merge_into_file(user, delta)
+                except Exception:
+                    # Put back what was not written, ahead of anything newer
+                    with self._lock:
+                        for user, delta in pending[i:]:
+                            newer = self._pending.get(user)
+                            if newer is not None:
+                                delta.merge(newer)
+                            self._pending[user] = delta
+                    raise
+
+    def close(self):
+        """Stop the background flusher and flush what is left"""
+        self._closed.set()
+        self._wake.set()
+        self.flush()
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def store_for(directory: Path = PROFILE_DIR) -> ProfileStore:
+    """The process's one store for a profile directory"""
+    key = Path(directory).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = ProfileStore(key)
+    return store
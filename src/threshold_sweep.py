@@ -0,0 +1,212 @@
+"""
+Two-Room Memory Architecture - Threshold Sweep
+Encode every evaluation example once, then score all thresholds in one pass
+
+Reports accuracy, lost memories (should persist, got flushed), noise
+persisted (should flush, got persisted), ROC and precision-recall from the
+cached probabilities, and recommends an operating point. The point is
+fitted on CALIBRATION_SUITES only; "validation" is held out and reported
+at the chosen threshold.
+
+Run with: python threshold_sweep.py [--max-lost-rate 0.02] [--write]
+"""
+
+import numpy as np
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+OPERATING_POINT_PATH = Path(__file__).parent / "operating_point.json"
+MODEL_PATH = Path(__file__).parent / "classifier.pkl"
+FALLBACK_THRESHOLD = 0.50
+
+# Suites the operating point is fitted on; "validation" is held out for reporting
+CALIBRATION_SUITES = ("massive", "stress")
+
+
+def classifier_version(path: Path = MODEL_PATH) -> Optional[str]:
+    """Hash of the classifier artifact, matching the server's model_version"""
+    if not path.exists():
+        return None
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+
+
+def load_threshold(version: Optional[str] = None, default: float = FALLBACK_THRESHOLD) -> float:
+    """
+    Threshold from the recorded operating point, if one was written for this
+    classifier version. Falls back to default otherwise.
+    """
+    if not OPERATING_POINT_PATH.exists():
+        return default
+    point = json.loads(OPERATING_POINT_PATH.read_text())
+    if version is not None and point.get("classifier_version") != version:
+        return default
+    return float(point["threshold"])
+
+
+def load_suites() -> dict:
+    """All labeled evaluation suites, as {name: [(text, "flush"|"persist"), ...]}"""
+    from massive_stress_test import MASSIVE_TEST_CASES
+    from stress_test import STRESS_TEST_CASES
+    from validation_classifier import TEST_CASES
+    return {
+        "massive": MASSIVE_TEST_CASES,
+        "stress": STRESS_TEST_CASES,
+        "validation": TEST_CASES,
+    }
+
+
+def sweep(probs: np.ndarray, labels: np.ndarray) -> dict:
+    """
+    Confusion counts at every distinct threshold, vectorized.
+    Decision rule matches predict(): PERSIST when proba > threshold.
+    labels: 1 = persist, 0 = flush.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    thresholds = np.unique(np.concatenate([[0.0, 1.0], probs]))
+
+    pos = np.sort(probs[labels])
+    neg = np.sort(probs[~labels])
+    # Count of each class strictly above every threshold
+    tp = len(pos) - np.searchsorted(pos, thresholds, side="right")
+    fp = len(neg) - np.searchsorted(neg, thresholds, side="right")
+    fn = len(pos) - tp
+    tn = len(neg) - fp
+
+    total = len(probs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recall = np.where(len(pos) > 0, tp / max(len(pos), 1), 0.0)
+        fpr = np.where(len(neg) > 0, fp / max(len(neg), 1), 0.0)
+        precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+
+    # Thresholds ascend, so fpr and recall descend along the arrays. Anchor
+    # the curves at "persist everything" in case some proba is exactly 0.
+    curve_fpr = np.r_[1.0, fpr]
+    curve_recall = np.r_[1.0, recall]
+    curve_precision = np.r_[len(pos) / max(total, 1), precision]
+    roc_auc = float(np.sum(-np.diff(curve_fpr) * (curve_recall[1:] + curve_recall[:-1]) / 2))
+    average_precision = float(np.sum(-np.diff(curve_recall) * curve_precision[:-1]))
+
+    return {
+        "thresholds": thresholds,
+        "accuracy": (tp + tn) / total,
+        "lost": fn,          # should persist, got flushed
+        "noise": fp,         # should flush, got persisted
+        "recall": recall,
+        "precision": precision,
+        "fpr": fpr,
+        "roc_auc": roc_auc,
+        "average_precision": average_precision,
+        "n_persist": len(pos),
+        "n_flush": len(neg),
+    }
+
+
+def recommend(result: dict, max_lost_rate: Optional[float] = None) -> dict:
+    """
+    Pick an operating point: best accuracy, optionally among thresholds whose
+    lost-memory rate stays within max_lost_rate. Ties go to the lower
+    threshold, since the gate defaults to keeping the user's information.
+    """
+    accuracy = result["accuracy"]
+    allowed = np.ones(len(accuracy), dtype=bool)
+    if max_lost_rate is not None:
+        allowed = result["lost"] <= max_lost_rate * result["n_persist"]
+        if not allowed.any():
+            allowed[0] = True  # threshold 0.0 persists everything, losing nothing
+    i = int(np.argmax(np.where(allowed, accuracy, -1.0)))
+    return {
+        "threshold": float(result["thresholds"][i]),
+        "accuracy": float(accuracy[i]),
+        "lost": int(result["lost"][i]),
+        "noise": int(result["noise"][i]),
+        "precision": float(result["precision"][i]),
+        "recall": float(result["recall"][i]),
+        "max_lost_rate": max_lost_rate,
+    }
+
+
+def at_threshold(result: dict, threshold: float) -> dict:
+    """Metrics at the largest swept threshold not above the given one"""
+    i = int(np.searchsorted(result["thresholds"], threshold, side="right") - 1)
+    return {
+        "threshold": threshold,
+        "accuracy": float(result["accuracy"][i]),
+        "lost": int(result["lost"][i]),
+        "noise": int(result["noise"][i]),
+    }
+
+
+def collect_probabilities(suites: dict) -> dict:
+    """Persist probabilities per suite, scored in one batch through the harness cache"""
+    from eval_harness import LogisticGate, cached_scores
+
+    texts = [text for cases in suites.values() for text, _ in cases]
+    probs = cached_scores(LogisticGate(), texts)
+
+    out = {}
+    start = 0
+    for name, cases in suites.items():
+        end = start + len(cases)
+        labels = np.array([expected == "persist" for _, expected in cases])
+        out[name] = (probs[start:end], labels)
+        start = end
+    return out
+
+
+def run_sweep(max_lost_rate: Optional[float] = None, write: bool = False) -> dict:
+    from classifier_gate import DEFAULT_THRESHOLD
+
+    suites = load_suites()
+    per_suite = collect_probabilities(suites)
+    probs = np.concatenate([p for p, _ in per_suite.values()])
+    labels = np.concatenate([l for _, l in per_suite.values()])
+
+    print("=" * 70)
+    print("THRESHOLD SWEEP")
+    print("=" * 70)
+    print(f"{'suite':<12}{'n':>6}{'acc@default':>14}{'lost':>7}{'noise':>7}{'ROC AUC':>10}{'AP':>8}")
+    for name, (p, l) in list(per_suite.items()) + [("all", (probs, labels))]:
+        result = sweep(p, l)
+        current = at_threshold(result, DEFAULT_THRESHOLD)
+        print(f"{name:<12}{len(p):>6}{current['accuracy']:>14.1%}{current['lost']:>7}"
+              f"{current['noise']:>7}{result['roc_auc']:>10.3f}{result['average_precision']:>8.3f}")
+
+    fit = [per_suite[n] for n in CALIBRATION_SUITES]
+    result = sweep(np.concatenate([p for p, _ in fit]), np.concatenate([l for _, l in fit]))
+    point = recommend(result, max_lost_rate)
+    point["fitted_on"] = list(CALIBRATION_SUITES)
+    held_out = {name: at_threshold(sweep(p, l), point["threshold"])
+                for name, (p, l) in per_suite.items() if name not in CALIBRATION_SUITES}
+    point["held_out"] = held_out
+    point["classifier_version"] = classifier_version()
+
+    print(f"\n{'=' * 70}")
+    print("RECOMMENDED OPERATING POINT")
+    print("=" * 70)
+    if max_lost_rate is not None:
+        print(f"Constraint: lost memories <= {max_lost_rate:.1%} of persist examples")
+    print(f"Threshold: {point['threshold']:.4f} (current default {DEFAULT_THRESHOLD:.2f}), "
+          f"fitted on {', '.join(CALIBRATION_SUITES)}")
+    print(f"Accuracy: {point['accuracy']:.1%}")
+    print(f"Lost memories: {point['lost']}  Noise persisted: {point['noise']}")
+    for name, metrics in held_out.items():
+        print(f"Held out {name}: accuracy {metrics['accuracy']:.1%}, "
+              f"lost {metrics['lost']}, noise {metrics['noise']}")
+
+    if write:
+        OPERATING_POINT_PATH.write_text(json.dumps(point, indent=2))
+        print(f"Operating point saved to {OPERATING_POINT_PATH}")
+    return point
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-lost-rate", type=float, default=None)
+    parser.add_argument("--write", action="store_true", help="save to operating_point.json")
+    args = parser.parse_args()
+    run_sweep(args.max_lost_rate, args.write)
@@ -0,0 +1,243 @@
+"""
+Two-Room Memory Architecture - Tracing
+Per-stage timing spans for the gate and the server
+
+    with tracing.span("encode", texts=1):
+        ...
+
+Spans nest through a context variable, so each request or exchange forms one
+trace. The sampling decision is made once per trace, at its root span. When
+tracing is off, span() returns a shared no-op object after one flag check.
+
+A finished trace is handed to every registered exporter as a list of span
+dicts. The default exporter appends one JSON object per span to a JSONL file.
+Summarize a trace file or convert it for a flame-chart viewer
+(chrome://tracing, Perfetto) with:
+
+    python tracing.py traces.jsonl [--chrome trace.json]
+"""
+
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+TRACE_PATH = Path(__file__).parent / "traces.jsonl"
+
+_enabled = False
+_sample_rate = 0.0
+_exporters = []
+_current = contextvars.ContextVar("two_room_span", default=None)
+_SKIPPED = object()  # marks an unsampled trace for its children
+
+
+class _NoopSpan:
+    __slots__ = ()
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _SkippedTrace(_NoopSpan):
+    """Root of an unsampled trace: keeps its children from sampling on their own"""
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current.set(_SKIPPED)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+class Span:
+    __slots__ = ("name", "attrs", "parent", "trace", "trace_id", "span_id",
+                 "wall", "start", "duration", "_token")
+    recording = True
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.trace = parent.trace if parent else []
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.append(self)
+        if self.parent is None:
+            _export(self.trace)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": self.wall,
+            "ms": round(self.duration * 1000, 4),
+            **self.attrs,
+        }
+
+
+def span(name: str, **attrs):
+    """Time a block as a span of the current trace (or start a trace)"""
+    if not _enabled:
+        return _NOOP
+    parent = _current.get()
+    if parent is _SKIPPED:
+        return _NOOP
+    if parent is None and random.random() >= _sample_rate:
+        return _SkippedTrace()
+    return Span(name, parent, attrs)
+
+
+def recording() -> bool:
+    """True inside a sampled trace, for work only worth doing when measured"""
+    current = _current.get()
+    return current is not None and current is not _SKIPPED
+
+
+def _export(spans: list):
+    records = [s.to_dict() for s in spans]
+    for exporter in _exporters:
+        try:
+            exporter(records)
+        except Exception as e:  # tracing must never break the request
+            print(f"Trace exporter failed: {e}")
+
+
+class JsonlExporter:
+    """Append spans to a JSONL file, one finished trace per write"""
+
+    def __init__(self, path: Path = TRACE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __call__(self, records: list):
+        lines = "".join(json.dumps(r, default=str) + "\n" for r in records)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def add_exporter(exporter: Callable[[list], None]):
+    _exporters.append(exporter)
+
+
+def configure(sample_rate: float = 1.0, path: Optional[Path] = TRACE_PATH,
+              exporters: Optional[list] = None):
+    """
+    Turn tracing on for a fraction of traces. Spans go to a JSONL file at
+    path unless exporters (callables taking a list of span dicts) are given.
+    """
+    global _enabled, _sample_rate
+    _exporters.clear()
+    _exporters.extend(exporters if exporters is not None else [JsonlExporter(path)])
+    _sample_rate = sample_rate
+    _enabled = sample_rate > 0
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    for exporter in _exporters:
+        if hasattr(exporter, "close"):
+            exporter.close()
+    _exporters.clear()
+
+
+def configure_from_env():
+    """TRACE_SAMPLE_RATE (0-1, default off) and TRACE_PATH"""
+    rate = float(os.environ.get("TRACE_SAMPLE_RATE", 0) or 0)
+    if rate > 0:
+        configure(rate, Path(os.environ.get("TRACE_PATH", TRACE_PATH)))
+
+
+def read_spans(path: Path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans: list) -> dict:
+    """{span name: (count, mean ms, p50 ms, p99 ms)}"""
+    import numpy as np
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["ms"])
+    stats = {}
+    for name, ms in by_name.items():
+        ms = np.asarray(ms)
+        stats[name] = (len(ms), float(ms.mean()), float(np.percentile(ms, 50)), float(np.percentile(ms, 99)))
+    return stats
+
+
+def to_chrome_trace(spans: list) -> dict:
+    """Chrome trace-event format: one complete event per span, one row per trace"""
+    rows = {}
+    events = []
+    for s in spans:
+        tid = rows.setdefault(s["trace"], len(rows) + 1)
+        args = {k: v for k, v in s.items() if k not in ("trace", "span", "parent", "name", "start", "ms")}
+        events.append({"name": s["name"], "ph": "X", "pid": 1, "tid": tid,
+                       "ts": s["start"] * 1e6, "dur": s["ms"] * 1000, "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a span JSONL file")
+    parser.add_argument("path", type=Path, nargs="?", default=TRACE_PATH)
+    parser.add_argument("--chrome", type=Path, default=None, help="write a Chrome trace-event JSON")
+    args = parser.parse_args()
+
+    spans = read_spans(args.path)
+    print("=" * 70)
+    print(f"TRACES: {len({s['trace'] for s in spans})} traces, {len(spans)} spans")
+    print("=" * 70)
+    print(f"{'span':<24}{'count':>8}{'mean ms':>12}{'p50 ms':>12}{'p99 ms':>12}")
+    for name, (count, mean, p50, p99) in sorted(summarize(spans).items(), key=lambda kv: -kv[1][1] * kv[1][0]):
+        print(f"{name:<24}{count:>8}{mean:>12.3f}{p50:>12.3f}{p99:>12.3f}")
+    if args.chrome:
+        args.chrome.write_text(json.dumps(to_chrome_trace(spans)))
+        print(f"\nChrome trace written to {args.chrome}")
@@ -0,0 +1,376 @@
+"""
+Two-Room Memory Architecture - Volatility and Tier Assignment
+Streaming tier_assignment(fact) / volatility(fact_category) from docs/architecture.md
+
+Every observed message updates, in constant time, a window of per-message
+features for its (user, category) and fast/slow moving averages of how often
+each category is mentioned. From those the user's signal per category is
+
+    w1 * hedge ratio            w4 * tense skew (future over past)
+    w2 * sentiment variance     w5 * mention frequency trend
+    w3 * change language
+
+which is blended with the population base rate as alpha * base + beta * user,
+beta growing with corpus size. The resulting tier / volatility per category
+is kept in a small table, so assignment at persist time is a lookup.
+
+recompute_user() rebuilds one user's state and table from their messages
+with vectorized NumPy and re-tags their Room 2 entries.
+
+A tracker given a path loads its users from there, and a background
+thread saves them every SAVE_INTERVAL seconds and at exit, so observe()
+never writes. ClassifierGate and the server share one tracker per Room 2
+file through tracker_for(state_path(...)). Only one process should track
+a given file: with several, the last to save wins. Windows are float16,
+about 5 KB per user with every category active.
+"""
+
+import numpy as np
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import room2_store
+from categories import CATEGORIES, categorize
+from syntactic_profile import FUTURE_CUES, HEDGES, PAST_CUES, message_sentiment, tokenize
+
+# Population probability that a fact in each category changes
+BASE_MUTABILITY = {
+    "EMPATHY": 0.10,
+    "UNDERSTANDING": 0.15,
+    "RESPECT": 0.20,
+    "COMMUNICATION": 0.35,
+    "CONTEXT": 0.50,
+    "VOLATILE": 0.85,
+}
+THETA_IMMUTABLE = 0.30
+
+# (alpha, beta) for a new user and for a mature one; interpolated by message count
+EARLY_WEIGHTS = (0.8, 0.2)
+MATURE_WEIGHTS = (0.3, 0.7)
+MATURE_MESSAGES = 500
+
+WINDOW = 64                # most recent messages kept per (user, category)
+MIN_CATEGORY_MESSAGES = 5  # fewer than this: base rate only
+MAX_USERS = 20000          # about 100 MB of windows at most
+SAVE_INTERVAL = 60.0       # seconds between background saves
+SAVE_CHUNK = 64            # users copied per hold of the tracker lock while saving
+
+# w1..w5: hedge, sentiment variance, change language, tense skew, mention trend
+SIGNAL_WEIGHTS = np.array([0.25, 0.20, 0.25, 0.15, 0.15])
+HEDGE_SCALE = 0.10   # hedge ratio that counts as fully hedged
+CHANGE_SCALE = 0.05  # change-word ratio that counts as fully in flux
+FAST_RATE, SLOW_RATE = 0.2, 0.02  # mention-frequency moving averages
+
+CHANGE_WORDS = frozenset("change changing changed quit quitting moving move switch switching leaving "
+                         "new anymore until temporarily trying considering thinking planning "
+                         "soon currently lately".split())
+
+CATEGORY_INDEX = {name: i for i, name in enumerate(CATEGORIES)}
+
+# Feature columns per message
+HEDGE, SENTIMENT, CHANGE, TENSE = range(4)
+
+
+def message_features(text: str) -> np.ndarray:
+    """hedge ratio, sentiment, change-word ratio, tense skew in [0, 1] (0.5 = none)"""
+    words = tokenize(text)
+    n = max(len(words), 1)
+    past = sum(w in PAST_CUES or (w.endswith("ed") and len(w) > 4) for w in words)
+    future = sum(w in FUTURE_CUES for w in words)
+    skew = 0.5 + 0.5 * (future - past) / (future + past) if future + past else 0.5
+    return np.array([
+        sum(w in HEDGES for w in words) / n,
+        message_sentiment(words),
+        sum(w in CHANGE_WORDS for w in words) / n,
+        skew,
+    ])
+
+
+def state_path(room2_path: Path) -> Path:
+    """Where the tracker for a Room 2 file keeps its users: room2.volatility.npz"""
+    return Path(room2_path).with_suffix(".volatility.npz")
+
+
+_TRACKERS = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def tracker_for(path: Path) -> "VolatilityTracker":
+    """The process's one tracker for a state file, loaded on first use"""
+    key = Path(path).resolve()
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(key)
+        if tracker is None:
+            tracker = _TRACKERS[key] = VolatilityTracker(path=key)
+    return tracker
+
+
+def _fixed(value: float) -> float:
+    """Snap to the Room 2 codec's u16 volatility grid so it encodes in-column"""
+    return round(value * 65534) / 65534
+
+
+def blend_weights(messages: int) -> tuple[float, float]:
+    t = min(messages / MATURE_MESSAGES, 1.0)
+    alpha = EARLY_WEIGHTS[0] + t * (MATURE_WEIGHTS[0] - EARLY_WEIGHTS[0])
+    return alpha, 1.0 - alpha
+
+
+def assignment(mutability: float) -> dict:
+    if mutability < THETA_IMMUTABLE:
+        return {"tier": 1}
+    return {"tier": 2, "volatility": _fixed(mutability)}
+
+
+BASE_TABLE = {c: assignment(m) for c, m in BASE_MUTABILITY.items()}
+
+
+class CategoryWindow:
+    """Last WINDOW feature rows with running sums, updated in O(1)"""
+    __slots__ = ("rows", "sums", "sentiment_sq", "n", "pos")
+
+    def __init__(self, rows: Optional[np.ndarray] = None, n: int = 0, pos: int = 0):
+        self.rows = np.zeros((WINDOW, 4), dtype=np.float16) if rows is None else rows.astype(np.float16)
+        # Sums of the stored (float16) rows, so a row leaves the window exactly as it came in
+        kept = self.rows[:n].astype(np.float64)
+        self.sums = kept.sum(axis=0)
+        self.sentiment_sq = float(kept[:, SENTIMENT] @ kept[:, SENTIMENT])
+        self.n = n
+        self.pos = pos
+
+    def add(self, features: np.ndarray):
+        features = features.astype(np.float16).astype(np.float64)
+        if self.n == WINDOW:
+            old = self.rows[self.pos].astype(np.float64)
+            self.sums -= old
+            self.sentiment_sq -= old[SENTIMENT] ** 2
+        else:
+            self.n += 1
+        self.rows[self.pos] = features
+        self.sums += features
+        self.sentiment_sq += features[SENTIMENT] ** 2
+        self.pos = (self.pos + 1) % WINDOW
+
+    def signals(self) -> np.ndarray:
+        """hedge, sentiment variance, change, tense skew, each in [0, 1]"""
+        mean = self.sums / self.n
+        return np.array([
+            min(mean[HEDGE] / HEDGE_SCALE, 1.0),
+            min(max(self.sentiment_sq / self.n - mean[SENTIMENT] ** 2, 0.0), 1.0),
+            min(mean[CHANGE] / CHANGE_SCALE, 1.0),
+            mean[TENSE],
+        ])
+
+
+class UserState:
+    __slots__ = ("messages", "windows", "fast", "slow", "table")
+
+    def __init__(self):
+        self.messages = 0
+        self.windows = {}  # category -> CategoryWindow
+        self.fast = np.zeros(len(CATEGORIES))
+        self.slow = np.zeros(len(CATEGORIES))
+        self.table = dict(BASE_TABLE)
+
+    def refresh(self):
+        """Recompute the whole tier table: constant work (one row per category)"""
+        alpha, beta = blend_weights(self.messages)
+        trend = np.abs(self.fast - self.slow) / np.maximum(np.maximum(self.fast, self.slow), 1e-9)
+        for category, i in CATEGORY_INDEX.items():
+            window = self.windows.get(category)
+            if window is None or window.n < MIN_CATEGORY_MESSAGES:
+                self.table[category] = BASE_TABLE[category]
+                continue
+            user_signal = float(SIGNAL_WEIGHTS @ np.append(window.signals(), trend[i]))
+            self.table[category] = assignment(alpha * BASE_MUTABILITY[category] + beta * user_signal)
+
+
+class VolatilityTracker:
+    """Per-user streaming state and tier tables, most recently active users kept"""
+
+    def __init__(self, max_users: int = MAX_USERS, path: Optional[Path] = None,
+                 save_interval: float = SAVE_INTERVAL):
+        self.max_users = max_users
+        self.path = Path(path) if path is not None else None
+        self.save_interval = save_interval
+        self.users = OrderedDict()  # user -> UserState
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        if self.path is not None:
+            self.load()
+            threading.Thread(target=self._run_saver, daemon=True).start()
+            atexit.register(self.close)
+
+    def _evict(self):
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)  # falls back to base rates until seen again
+
+    def _state(self, user) -> UserState:
+        state = self.users.get(user)
+        if state is None:
+            state = self.users[user] = UserState()
+            self._evict()
+        else:
+            self.users.move_to_end(user)
+        return state
+
+    def observe(self, user, text: str, category: Optional[str] = None):
+        """Fold one message into the user's statistics and refresh their table"""
+        category = category or categorize(text)
+        features = message_features(text)
+        mention = np.zeros(len(CATEGORIES))
+        mention[CATEGORY_INDEX[category]] = 1.0
+        with self._lock:
+            state = self._state(user)
+            state.messages += 1
+            window = state.windows.get(category)
+            if window is None:
+                window = state.windows[category] = CategoryWindow()
+            window.add(features)
+            state.fast += FAST_RATE * (mention - state.fast)
+            state.slow += SLOW_RATE * (mention - state.slow)
+            state.refresh()
+            self._dirty = True
+
+    def assign(self, user, category: Optional[str]) -> dict:
+        """Tier fields for a new Room 2 entry: {"tier": 1} or {"tier": 2, "volatility": v}"""
+        category = category if category in CATEGORY_INDEX else "CONTEXT"
+        state = self.users.get(user)
+        table = state.table if state is not None else BASE_TABLE
+        return dict(table[category])
+
+    def table(self, user) -> dict:
+        state = self.users.get(user)
+        return dict(state.table if state is not None else BASE_TABLE)
+
+    def recompute_user(self, user, messages: list[str], categories: Optional[list] = None,
+                       path: Optional[Path] = room2_store.ROOM2_PATH) -> dict:
+        """
+        Rebuild a user's state from their full message history (oldest first)
+        and re-tag their Room 2 entries. Pass path=None to skip the store.
+        """
+        categories = categories or [categorize(m) for m in messages]
+        n = len(messages)
+        state = UserState()
+        state.messages = n
+        if n:
+            features = np.array([message_features(m) for m in messages])
+            codes = np.array([CATEGORY_INDEX[c] for c in categories])
+            onehot = np.zeros((n, len(CATEGORIES)))
+            onehot[np.arange(n), codes] = 1.0
+            # Closed form of the incremental moving averages, starting from zero
+            age = np.arange(n - 1, -1, -1)
+            state.fast = (FAST_RATE * (1 - FAST_RATE) ** age) @ onehot
+            state.slow = (SLOW_RATE * (1 - SLOW_RATE) ** age) @ onehot
+            for category, i in CATEGORY_INDEX.items():
+                rows = features[codes == i][-WINDOW:]
+                if len(rows):
+                    padded = np.zeros((WINDOW, 4))
+                    padded[:len(rows)] = rows
+                    state.windows[category] = CategoryWindow(padded, len(rows), len(rows) % WINDOW)
+        state.refresh()
+        with self._lock:
+            self.users[user] = state
+            self.users.move_to_end(user)
+            self._evict()
+            self._dirty = True
+
+        if path is not None:
+            def retag(entry):
+                for key in ("tier", "volatility"):
+                    entry.pop(key, None)
+                entry.update(state.table.get(entry.get("category"), state.table["CONTEXT"]))
+
+            with room2_store.locked(path):
+                ids = [e["id"] for e in room2_store.load_entries(path) if e.get("user") == user and "id" in e]
+                room2_store.update_entries({i: retag for i in ids}, path)
+        return dict(state.table)
+
+    def _run_saver(self):
+        while not self._closed.wait(self.save_interval):
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Saving volatility state to {self.path} failed: {e}")
+
+    def close(self):
+        """Stop the background saver and save what is left"""
+        self._closed.set()
+        self.save()
+
+    def save(self):
+        """
+        Write every tracked user to path (oldest first, so a reload keeps the
+        order). Users are copied SAVE_CHUNK at a time, so observe() waits for
+        one chunk at most; a user observed mid-save is written again next time.
+        """
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                users = list(self.users)
+            n = len(users)
+            kept = np.zeros(n, dtype=bool)
+            messages = np.zeros(n, dtype=np.int64)
+            fast = np.zeros((n, len(CATEGORIES)))
+            slow = np.zeros((n, len(CATEGORIES)))
+            rows = np.zeros((n, len(CATEGORIES), WINDOW, 4), dtype=np.float16)
+            counts = np.zeros((n, len(CATEGORIES)), dtype=np.int16)
+            positions = np.zeros((n, len(CATEGORIES)), dtype=np.int16)
+            for start in range(0, n, SAVE_CHUNK):
+                with self._lock:
+                    for u in range(start, min(start + SAVE_CHUNK, n)):
+                        state = self.users.get(users[u])
+                        if state is None:
+                            continue  # evicted since the save started
+                        kept[u] = True
+                        messages[u], fast[u], slow[u] = state.messages, state.fast, state.slow
+                        for category, window in state.windows.items():
+                            i = CATEGORY_INDEX[category]
+                            rows[u, i], counts[u, i], positions[u, i] = window.rows, window.n, window.pos
+            arrays = dict(messages=messages, fast=fast, slow=slow, rows=rows, counts=counts, positions=positions)
+            if not kept.all():
+                users = [u for u, k in zip(users, kept) if k]
+                arrays = {name: array[kept] for name, array in arrays.items()}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.savez(f, users=np.array(json.dumps(users)), **arrays)
+            os.replace(tmp, self.path)
+
+    def load(self):
+        """Replace the tracked users with the ones saved at path, if any"""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                users = json.loads(str(data["users"]))
+                messages, fast, slow = data["messages"], data["fast"], data["slow"]
+                rows, counts, positions = data["rows"], data["counts"], data["positions"]
+            if rows.shape[1:] != (len(CATEGORIES), WINDOW, 4):
+                raise ValueError(f"windows of shape {rows.shape[1:]}")
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring volatility state in {self.path}: {e}")
+            return
+        loaded = OrderedDict()
+        for u, user in enumerate(users[-self.max_users:], start=max(len(users) - self.max_users, 0)):
+            state = UserState()
+            state.messages, state.fast, state.slow = int(messages[u]), fast[u].copy(), slow[u].copy()
+            for category, i in CATEGORY_INDEX.items():
+                if counts[u, i]:
+                    state.windows[category] = CategoryWindow(rows[u, i], int(counts[u, i]), int(positions[u, i]))
+            state.refresh()
+            loaded[user] = state
+        with self._lock:
+            self.users = loaded
+            self._dirty = False
@@ -0,0 +1,213 @@
+"""
+Two-Room Memory Architecture - Synthetic Workload
+Seeded multi-user, multi-session conversation streams at scale
+
+Messages come from the categorized lists in massive_stress_test
+(trivial_encyclopedic, meaningful_family, ...) with template variation
+(casing, fillers, framings), so millions of exchanges do not collapse onto
+a few thousand distinct strings. Each record keeps the list it was drawn
+from and its expected label, so a replay can score the gate as well.
+
+    users      Zipf-distributed activity: a few heavy users, a long tail
+    sessions   many open at once and interleaved; geometric lengths
+    mix        meaningful_ratio of messages persist-worthy, varied per user
+    arrivals   Poisson at rate/s, switching into bursts of burstiness x rate
+
+The stream is generated lazily and written line by line (JSONL, gzipped if
+the path ends in .gz), so memory stays flat at any size. The same seed
+always produces the same stream.
+
+Run with: python workload.py workload.jsonl.gz --exchanges 1000000
+"""
+
+import gzip
+import json
+import math
+import random
+from bisect import bisect
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Iterator
+
+MEANINGFUL_RATIO = 0.05  # the paper's real-world estimate is 95% trivial
+USERS = 10000
+MEAN_SESSION_TURNS = 12
+OPEN_SESSIONS = 200      # sessions in flight at once
+RATE = 50.0              # exchanges per second outside bursts
+BURSTINESS = 5.0         # rate multiplier inside a burst
+BURST_ENTER = 0.01       # per-exchange chance of a burst starting
+BURST_EXIT = 0.05        # per-exchange chance of it ending
+ZIPF_EXPONENT = 1.1
+USER_SPREAD = 0.5        # log-normal sigma of per-user meaningful ratios
+
+PREFIXES = ["so ", "honestly ", "ok so ", "um ", "hey, ", "btw ", "lol ", "quick question, "]
+SUFFIXES = [" lol", "...", "!", " haha", " tbh", " idk", " :)", "?"]
+MEANINGFUL_FRAMES = [
+    "I've never told anyone this but {}",
+    "{} and I don't know what to do",
+    "not sure why I'm telling you this, {}",
+    "can I be honest? {}",
+    "{}. it's been on my mind a lot",
+]
+TRIVIAL_FRAMES = [
+    "random thought: {}",
+    "{}, right?",
+    "quick one - {}",
+    "{} anyway",
+]
+
+
+def message_lists() -> dict:
+    """{'flush' | 'persist': {list name: messages}} from massive_stress_test"""
+    import massive_stress_test as m
+    lists = {"flush": {}, "persist": {}}
+    for name, value in vars(m).items():
+        if isinstance(value, list) and value and isinstance(value[0], str):
+            if name.startswith("trivial_"):
+                lists["flush"][name] = value
+            elif name.startswith("meaningful_"):
+                lists["persist"][name] = value
+    return lists
+
+
+def vary(text: str, label: str, rng: random.Random) -> str:
+    """A surface variant of text that keeps its meaning"""
+    r = rng.random()
+    if r < 0.15:
+        frames = MEANINGFUL_FRAMES if label == "persist" else TRIVIAL_FRAMES
+        text = rng.choice(frames).format(text.rstrip(".!?"))
+    elif r < 0.30:
+        text = rng.choice(PREFIXES) + text[:1].lower() + text[1:]
+    if rng.random() < 0.15:
+        text = text.rstrip(".!?") + rng.choice(SUFFIXES)
+    r = rng.random()
+    if r < 0.25:
+        text = text.lower()
+    elif r < 0.30:
+        text = text.rstrip(".!?")
+    return text
+
+
+class _Picker:
+    """Weighted choice over a fixed list in O(log n)"""
+
+    def __init__(self, items: list, weights: list):
+        self.items = items
+        self.cumulative = list(accumulate(weights))
+
+    def __call__(self, rng: random.Random):
+        return self.items[bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+def generate(n: int, seed: int = 0, users: int = USERS, meaningful_ratio: float = MEANINGFUL_RATIO,
+             rate: float = RATE, burstiness: float = BURSTINESS,
+             mean_session_turns: float = MEAN_SESSION_TURNS, open_sessions: int = OPEN_SESSIONS) -> Iterator[dict]:
+    """
+    Yield n exchange records in arrival order:
+    {seq, t (seconds from start), user, session, turn, text, label, source}
+    """
+    rng = random.Random(seed)
+    lists = message_lists()
+    sources = {label: _Picker(list(named.items()), [len(v) for v in named.values()])
+               for label, named in lists.items()}
+    pick_user = _Picker(list(range(users)), [1 / (i + 1) ** ZIPF_EXPONENT for i in range(users)])
+    # Per-user share of meaningful messages, spread around the global ratio
+    user_ratio = {}
+    end_chance = 1 / max(mean_session_turns, 1)
+
+    sessions = []  # [user, session id, turns so far]
+    next_session = 0
+    t = 0.0
+    bursting = False
+    for seq in range(n):
+        bursting = rng.random() >= BURST_EXIT if bursting else rng.random() < BURST_ENTER
+        t += rng.expovariate(rate * (burstiness if bursting else 1.0))
+
+        if len(sessions) < open_sessions:
+            sessions.append([pick_user(rng), next_session, 0])
+            next_session += 1
+        slot = rng.randrange(len(sessions))
+        session = sessions[slot]
+        user = session[0]
+
+        if user not in user_ratio:
+            # mean-preserving: E[exp(N(-s^2/2, s))] = 1
+            user_ratio[user] = min(1.0, meaningful_ratio * math.exp(rng.gauss(-USER_SPREAD ** 2 / 2, USER_SPREAD)))
+        label = "persist" if rng.random() < user_ratio[user] else "flush"
+        source, messages = sources[label](rng)
+        yield {
+            "seq": seq,
+            "t": round(t, 4),
+            "user": f"user-{user:06d}",
+            "session": f"s-{session[1]:08d}",
+            "turn": session[2],
+            "text": vary(rng.choice(messages), label, rng),
+            "label": label,
+            "source": source,
+        }
+
+        session[2] += 1
+        if rng.random() < end_chance:
+            sessions[slot] = sessions[-1]
+            sessions.pop()
+
+
+def _open(path: Path, mode: str):
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=3)
+    return open(path, mode, encoding="utf-8")
+
+
+def write_workload(path: Path, n: int, seed: int = 0, **options) -> dict:
+    """Stream n records to path; returns counts for the report"""
+    counts = {"exchanges": 0, "persist": 0, "users": set(), "sessions": 0, "seconds": 0.0}
+    with _open(path, "w") as f:
+        for record in generate(n, seed, **options):
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            counts["exchanges"] += 1
+            counts["persist"] += record["label"] == "persist"
+            counts["users"].add(record["user"])
+            counts["sessions"] += record["turn"] == 0
+            counts["seconds"] = record["t"]
+    counts["users"] = len(counts["users"])
+    return counts
+
+
+def read_workload(path: Path, limit=None) -> Iterator[dict]:
+    """Replay records from a workload file, one at a time"""
+    with _open(path, "r") as f:
+        yield from islice((json.loads(line) for line in f), limit)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Write a synthetic Two-Room workload")
+    parser.add_argument("path", type=Path, help="output .jsonl or .jsonl.gz")
+    parser.add_argument("--exchanges", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=USERS)
+    parser.add_argument("--meaningful", type=float, default=MEANINGFUL_RATIO, help="share of persist-worthy messages")
+    parser.add_argument("--rate", type=float, default=RATE, help="exchanges/s outside bursts")
+    parser.add_argument("--burstiness", type=float, default=BURSTINESS, help="rate multiplier inside bursts")
+    parser.add_argument("--session-turns", type=float, default=MEAN_SESSION_TURNS)
+    parser.add_argument("--open-sessions", type=int, default=OPEN_SESSIONS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = write_workload(args.path, args.exchanges, args.seed, users=args.users,
+                            meaningful_ratio=args.meaningful, rate=args.rate, burstiness=args.burstiness,
+                            mean_session_turns=args.session_turns, open_sessions=args.open_sessions)
+    elapsed = time.perf_counter() - start
+
+    print("=" * 70)
+    print(f"WORKLOAD: {args.path}")
+    print("=" * 70)
+    print(f"Exchanges:  {counts['exchanges']:,} ({counts['persist'] / max(counts['exchanges'], 1):.1%} persist)")
+    print(f"Users:      {counts['users']:,}")
+    print(f"Sessions:   {counts['sessions']:,}")
+    print(f"Timeline:   {counts['seconds']:,.0f} s of traffic")
+    print(f"File size:  {args.path.stat().st_size / 1e6:,.1f} MB")
+    print(f"Generated in {elapsed:.1f}s ({counts['exchanges'] / elapsed:,.0f} exchanges/s)")